@@ -6,14 +6,17 @@ from flask import Flask
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from app.db_profile import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 
 def create_app(config_name=None):
     """Application factory pattern."""
     app = Flask(__name__)
+    if config_name == 'testing':
+        app.config['TESTING'] = True
 
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -21,24 +24,66 @@ def create_app(config_name=None):
         'DATABASE_URL', 'sqlite:///weather.db'
     )
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    from app.db_profile import configure_database, install_pragmas
+    configure_database(app)
     app.config['OPENWEATHERMAP_API_KEY'] = os.environ.get('OPENWEATHERMAP_API_KEY', '')
 
+    from app.json_provider import JSON_PROVIDERS
+    app.json = JSON_PROVIDERS[os.environ.get('JSON_PROVIDER', 'fast')](app)
+
     # Initialize extensions
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     db.init_app(app)
+    with app.app_context():
+        install_pragmas(db.engines)
     migrate.init_app(app, db)
 
     # Register blueprints
-    from app.routes.weather import weather_bp
+    from app.routes.weather import weather_bp, weather_service
     from app.routes.locations import locations_bp
     from app.routes.health import health_bp
+    from app.routes.debug import debug_bp
 
     app.register_blueprint(weather_bp, url_prefix='/api/weather')
     app.register_blueprint(locations_bp, url_prefix='/api/locations')
     app.register_blueprint(health_bp, url_prefix='/api')
+    app.register_blueprint(debug_bp, url_prefix='/api/debug')
+
+    from app.instrumentation import init_instrumentation
+    init_instrumentation(app, db, weather_service)
+
+    from app.cli import cache_cli, history_cli
+    app.cli.add_command(cache_cli)
+    app.cli.add_command(history_cli)
 
-    # Create tables
+    # Create tables, and add columns/indexes missing from older databases
+    from app.schema import upgrade_schema
     with app.app_context():
         db.create_all()
+        upgrade_schema(db)
+
+    # Optional in-process warmer; prefer `flask cache warm` as a single worker
+    # so several gunicorn processes don't each warm the same entries.
+    if os.environ.get('CACHE_WARMER_ENABLED', '').lower() in ('1', 'true', 'yes'):
+        from app.services import CacheWarmer
+        app.extensions['cache_warmer'] = CacheWarmer(app, weather_service)
+        app.extensions['cache_warmer'].start()
+
+    if os.environ.get('CACHE_SWEEPER_ENABLED', '').lower() in ('1', 'true', 'yes'):
+        from app.services import CacheSweeper
+        app.extensions['cache_sweeper'] = CacheSweeper(app, weather_service)
+        app.extensions['cache_sweeper'].start()
+
+    # Batched search history ingestion (see SearchHistoryWriter)
+    if os.environ.get('SEARCH_HISTORY_WRITE_MODE', 'sync') == 'batched':
+        from app.services import SearchHistoryWriter
+        app.extensions['search_history_writer'] = SearchHistoryWriter(app)
+        app.extensions['search_history_writer'].start()
+
+    # Optional in-process compaction; `flask history compact` is the cron-friendly form.
+    if os.environ.get('SEARCH_HISTORY_COMPACTION_ENABLED', '').lower() in ('1', 'true', 'yes'):
+        from app.services import SearchHistoryCompactor
+        app.extensions['search_history_compactor'] = SearchHistoryCompactor(app)
+        app.extensions['search_history_compactor'].start()
 
     return app
@@ -0,0 +1,190 @@
+"""
+ASGI entry point.
+
+Only GET/HEAD /api/weather/current and /api/weather/forecast are served
+natively on the event loop through AsyncWeatherService. Every other route,
+including /api/weather/forecast/<view>, /batch, /geocode and /reverse-geocode,
+is handed to the Flask app through asgiref's WSGI adapter, which runs it on a
+thread pool with the synchronous upstream client.
+
+    uvicorn --factory app.asgi:create_asgi_app
+    python run.py --asgi
+"""
+import time
+from email.utils import format_datetime
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app.instrumentation import metrics_enabled
+from app.services.async_weather import AsyncWeatherService
+from app.utils.compression import COMPRESS_MIN_BYTES, choose_encoding, compress
+from app.utils.geo import INVALID_COORDINATES, valid_coordinates
+from app.utils.http_cache import make_etag
+from app.utils.metrics import HTTP_REQUEST_SECONDS
+from app.utils.tracing import TRACE_REQUEST_HEADER, current_trace, end_trace, span, start_trace, trace_settings
+from app.utils.units import CONVERTERS, needs_conversion
+
+# Native async routes -> upstream endpoint
+ASYNC_ROUTES = {
+    '/api/weather/current': 'weather',
+    '/api/weather/forecast': 'forecast',
+}
+# Flask endpoint of each native route, so both serving paths share metric labels
+ASYNC_ENDPOINTS = {
+    'weather': 'weather.get_current_weather',
+    'forecast': 'weather.get_forecast',
+}
+
+
+class WeatherASGIApp:
+    """Dispatches hot weather routes to asyncio handlers and the rest to Flask."""
+
+    def __init__(self, flask_app, service):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.weather = AsyncWeatherService(flask_app, service)
+        self.metrics = metrics_enabled()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif (scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD')
+              and scope['path'].rstrip('/') in ASYNC_ROUTES):
+            await self._weather(scope, send, ASYNC_ROUTES[scope['path'].rstrip('/')])
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.weather.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _weather(self, scope, send, kind: str):
+        """Async twin of routes.weather.get_current_weather / get_forecast."""
+        traced = trace_settings.wants(_header(scope, TRACE_REQUEST_HEADER.lower().encode()))
+        token = start_trace() if traced else None
+        started = time.perf_counter()
+        status = 500
+
+        async def send_observed(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self._weather_response(scope, send_observed if self.metrics else send, kind)
+        finally:
+            if token is not None:
+                end_trace(token)
+            if self.metrics:
+                HTTP_REQUEST_SECONDS.labels(ASYNC_ENDPOINTS[kind], scope['method'],
+                                            str(status)).observe(time.perf_counter() - started)
+
+    async def _weather_response(self, scope, send, kind: str):
+        args = parse_qs(scope['query_string'].decode('latin-1'))
+        lat, lon = _float_arg(args, 'lat'), _float_arg(args, 'lon')
+        units = args.get('units', ['metric'])[0]
+        if lat is None or lon is None:
+            await self._send_json(scope, send, 400, {'error': 'lat and lon parameters are required'})
+            return
+        if not valid_coordinates(lat, lon):
+            await self._send_json(scope, send, 400, {'error': INVALID_COORDINATES})
+            return
+
+        entry = await self.weather.get_weather_entry(kind, lat, lon)
+        encoding = choose_encoding(_header(scope, b'accept-encoding'))
+        headers = [(b'vary', b'Accept-Encoding')]
+        etag = make_etag(kind, entry.version, units) if entry.version else None
+        if etag is not None:
+            headers += [
+                (b'last-modified', format_datetime(entry.fetched_at, usegmt=True).encode()),
+                (b'cache-control', f'public, max-age={entry.max_age()}'.encode()),
+            ]
+            matched = _etag_matches(scope, etag)
+            if matched is not None:
+                # Echo the validator in the form the client holds, as compress_response does.
+                await _send(send, 304, headers + [(b'etag', f'{matched}"{etag}"'.encode())], b'')
+                return
+        encoded = False
+        with span('render'):
+            if needs_conversion(units):
+                body = self.flask_app.json.dumps(CONVERTERS[kind](entry.data, units)).encode()
+                if encoding and len(body) >= COMPRESS_MIN_BYTES:
+                    body, encoded = compress(body, encoding), True
+            elif encoding and len(entry.body) >= COMPRESS_MIN_BYTES:
+                body, encoded = entry.encoded(encoding), True
+            else:
+                body = entry.body
+        if encoded:
+            headers.append((b'content-encoding', encoding.encode()))
+        if etag is not None:
+            # Weak only when the bytes sent are an encoded representation.
+            weak = 'W/' if encoded else ''
+            headers.append((b'etag', f'{weak}"{etag}"'.encode()))
+        await self._send_body(scope, send, 200, body, headers)
+
+    async def _send_json(self, scope, send, status: int, data, headers=()):
+        await self._send_body(scope, send, status, self.flask_app.json.dumps(data).encode(), headers)
+
+    async def _send_body(self, scope, send, status: int, body: bytes, headers=()):
+        headers = list(headers) + [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+        ]
+        await _send(send, status, headers, b'' if scope['method'] == 'HEAD' else body)
+
+
+async def _send(send, status: int, headers: list, body: bytes):
+    trace = current_trace()
+    if trace is not None:
+        headers = headers + [(b'server-timing', trace.server_timing().encode())]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _float_arg(args: dict, name: str):
+    try:
+        return float(args[name][0])
+    except (KeyError, ValueError):
+        return None
+
+
+def _header(scope, name: bytes):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _etag_matches(scope, etag: str):
+    """Weak If-None-Match comparison, as conditional_response does.
+
+    Returns None when nothing matches, else the matching tag's prefix:
+    'W/' when the client only holds the weak form, '' otherwise.
+    """
+    value = _header(scope, b'if-none-match')
+    if value is None:
+        return None
+    tags = [tag.strip() for tag in value.split(',')]
+    if '*' in tags or f'"{etag}"' in tags:
+        return ''
+    if f'W/"{etag}"' in tags:
+        return 'W/'
+    return None
+
+
+def create_asgi_app(flask_app=None):
+    """Build the ASGI app around a Flask app and the routes' shared WeatherService."""
+    if flask_app is None:
+        from app import create_app
+        flask_app = create_app()
+    from app.routes.weather import weather_service
+    return WeatherASGIApp(flask_app, weather_service)
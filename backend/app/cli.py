@@ -0,0 +1,76 @@
+"""
+Flask CLI commands for cache and search history maintenance.
+
+    flask --app run.py cache warm            # loop forever
+    flask --app run.py cache warm --once     # single pass, e.g. from cron
+    flask --app run.py cache sweep --once
+    flask --app run.py history compact --once
+"""
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+cache_cli = AppGroup('cache', help='Weather cache maintenance.')
+history_cli = AppGroup('history', help='Search history maintenance.')
+
+
+@cache_cli.command('warm')
+@click.option('--once', is_flag=True, help='Run a single pass and exit.')
+@click.option('--interval', type=float, default=None, help='Seconds between passes.')
+@click.option('--rate', type=float, default=None, help='Max upstream calls per minute.')
+def warm_cache(once, interval, rate):
+    """Refresh cache entries for saved locations and popular searches before they expire."""
+    from app.routes.weather import weather_service
+    from app.services import CacheWarmer
+
+    warmer = CacheWarmer(current_app._get_current_object(), weather_service,
+                         interval_seconds=interval, rate_per_minute=rate)
+    if once:
+        click.echo(warmer.run_once())
+        return
+    click.echo(f'Warming every {warmer.interval_seconds:g}s; Ctrl+C to stop.')
+    try:
+        warmer.run_forever()
+    except KeyboardInterrupt:
+        warmer.stop()
+
+
+@cache_cli.command('sweep')
+@click.option('--once', is_flag=True, help='Run a single sweep and exit.')
+@click.option('--interval', type=float, default=None, help='Seconds between sweeps.')
+@click.option('--max-rows', type=int, default=None, help='Row limit for weather_cache (0: none).')
+def sweep_cache(once, interval, max_rows):
+    """Delete expired cache rows and evict the least recently fetched above the row limit."""
+    from app.routes.weather import weather_service
+    from app.services import CacheSweeper
+
+    sweeper = CacheSweeper(current_app._get_current_object(), weather_service,
+                           interval_seconds=interval, max_rows=max_rows)
+    if once:
+        click.echo(sweeper.run_once())
+        return
+    click.echo(f'Sweeping every {sweeper.interval_seconds:g}s; Ctrl+C to stop.')
+    try:
+        sweeper.run_forever()
+    except KeyboardInterrupt:
+        sweeper.stop()
+
+
+@history_cli.command('compact')
+@click.option('--once', is_flag=True, help='Run a single pass and exit.')
+@click.option('--interval', type=float, default=None, help='Seconds between passes.')
+@click.option('--retention-days', type=float, default=None, help='Keep raw searches this long.')
+def compact_history(once, interval, retention_days):
+    """Roll search history up into per-query popularity and prune rows past retention."""
+    from app.services import SearchHistoryCompactor
+
+    compactor = SearchHistoryCompactor(current_app._get_current_object(), retention_days=retention_days,
+                                       interval_seconds=interval)
+    if once:
+        click.echo(compactor.run_once())
+        return
+    click.echo(f'Compacting every {compactor.interval_seconds:g}s; Ctrl+C to stop.')
+    try:
+        compactor.run_forever()
+    except KeyboardInterrupt:
+        compactor.stop()
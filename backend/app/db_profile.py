@@ -0,0 +1,139 @@
+"""
+Database engine profiles.
+
+DATABASE_PROFILE=default keeps SQLAlchemy's stock engine. DATABASE_PROFILE=production
+sizes the connection pool from DB_POOL_* and, for SQLite files, switches to
+WAL journaling so cache writes no longer block readers, with a busy timeout
+so writers queue instead of failing with "database is locked".
+
+With DATABASE_REPLICA_URL set, RoutingSession sends plain SELECTs to the
+replica and everything else (and every read after a flush in the same
+session) to the primary. Reads that decide a write (read-then-upsert,
+job watermarks) run inside `db.session().using_primary()` so replica lag
+can't make an existing row look missing.
+"""
+import os
+from contextlib import contextmanager
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event
+
+DB_PROFILES = ('default', 'production')
+DB_POOL_SIZE = 10
+DB_MAX_OVERFLOW = 20
+DB_POOL_TIMEOUT = 30
+DB_POOL_RECYCLE = 1800  # seconds; below common server-side idle timeouts
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_SYNCHRONOUS = 'NORMAL'  # durable across app crashes; WAL makes FULL unnecessary
+SQLITE_BUSY_TIMEOUT_MS = 5000
+REPLICA_BIND = 'replica'
+
+
+def _profile() -> str:
+    profile = os.environ.get('DATABASE_PROFILE', 'default')
+    if profile not in DB_PROFILES:
+        raise ValueError(f"DATABASE_PROFILE must be one of {DB_PROFILES}")
+    return profile
+
+
+def _is_sqlite_memory(uri: str) -> bool:
+    return uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') in ('sqlite:', 'sqlite:/'))
+
+
+def engine_options(uri: str) -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS for the active profile."""
+    if _profile() != 'production':
+        return {}
+    env = os.environ.get
+    options = {'pool_pre_ping': True}
+    if uri.startswith('sqlite'):
+        # sqlite3's own lock wait, in seconds; the busy_timeout pragma mirrors it.
+        options['connect_args'] = {
+            'timeout': int(env('SQLITE_BUSY_TIMEOUT_MS', SQLITE_BUSY_TIMEOUT_MS)) / 1000,
+            'check_same_thread': False,
+        }
+    if not _is_sqlite_memory(uri):
+        options.update(
+            pool_size=int(env('DB_POOL_SIZE', DB_POOL_SIZE)),
+            max_overflow=int(env('DB_MAX_OVERFLOW', DB_MAX_OVERFLOW)),
+            pool_timeout=float(env('DB_POOL_TIMEOUT', DB_POOL_TIMEOUT)),
+            pool_recycle=int(env('DB_POOL_RECYCLE', DB_POOL_RECYCLE)),
+        )
+    return options
+
+
+def configure_database(app):
+    """Set engine options and the replica bind on app.config before db.init_app."""
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config['DATABASE_PROFILE'] = _profile()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri)
+    replica = os.environ.get('DATABASE_REPLICA_URL')
+    if replica:
+        app.config['SQLALCHEMY_BINDS'] = {
+            REPLICA_BIND: dict(engine_options(replica), url=replica),
+        }
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    env = os.environ.get
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={env('SQLITE_JOURNAL_MODE', SQLITE_JOURNAL_MODE)}")
+    cursor.execute(f"PRAGMA synchronous={env('SQLITE_SYNCHRONOUS', SQLITE_SYNCHRONOUS)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(env('SQLITE_BUSY_TIMEOUT_MS', SQLITE_BUSY_TIMEOUT_MS))}")
+    cursor.close()
+
+
+def install_pragmas(engines: dict):
+    """Apply the SQLite pragmas to every new connection of the production profile's engines."""
+    if _profile() != 'production':
+        return
+    for engine in engines.values():
+        if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect', _sqlite_pragmas):
+            event.listen(engine, 'connect', _sqlite_pragmas)
+
+
+def pool_stats(engines: dict) -> dict:
+    """Checked-in/out and overflow counts per engine ('primary', plus any binds)."""
+    stats = {}
+    for key, engine in engines.items():
+        pool = engine.pool
+        entry = {'pool': type(pool).__name__}
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if hasattr(pool, name):
+                entry[name] = getattr(pool, name)()
+        stats[key or 'primary'] = entry
+    return stats
+
+
+class RoutingSession(Session):
+    """Session that reads from the replica bind when one is configured.
+
+    Writes, SELECTs issued during a flush and any statement after this
+    session has flushed go to the primary, so a request reads its own writes.
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self._wrote = False
+        self._pinned = 0
+
+    @contextmanager
+    def using_primary(self):
+        """Send every statement in the block to the primary, including plain SELECTs."""
+        self._pinned += 1
+        try:
+            yield self
+        finally:
+            self._pinned -= 1
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None:
+            return primary
+        if self._flushing or (clause is not None and not isinstance(clause, Select)):
+            self._wrote = True
+        engines = self._db.engines
+        replica = engines.get(REPLICA_BIND)
+        if (self._wrote or self._pinned or replica is None or primary is not engines.get(None)
+                or clause is None):
+            return primary
+        return replica
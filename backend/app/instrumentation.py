@@ -0,0 +1,199 @@
+"""
+Request, database and service instrumentation: /api/metrics and Server-Timing.
+
+Metrics are enabled unless METRICS_ENABLED=false. Per request they cost two
+perf_counter() calls and one histogram observation; SQL statements add the
+same through SQLAlchemy cursor events. Cache, upstream, pool and background
+job figures are read from the components' stats() only when scraped.
+
+Tracing (app.utils.tracing) is off unless TRACE_MODE or /api/debug/tracing
+turns it on; traced responses carry a Server-Timing header.
+"""
+import logging
+import os
+import signal
+import threading
+import time
+import weakref
+from flask import g, request
+from sqlalchemy import event
+from app.utils.metrics import DB_QUERY_SECONDS, HTTP_REQUEST_SECONDS, registry
+from app.utils.profiler import profiler
+from app.utils.tracing import TRACE_REQUEST_HEADER, current_trace, end_trace, record, start_trace, trace_settings
+
+SQL_OPERATIONS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE'})
+
+_instrumented = weakref.WeakSet()
+
+logger = logging.getLogger(__name__)
+
+
+def metrics_enabled() -> bool:
+    return os.environ.get('METRICS_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _observe_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        HTTP_REQUEST_SECONDS.labels(request.endpoint or 'unmatched', request.method,
+                                    str(response.status_code)).observe(time.perf_counter() - started)
+    return response
+
+
+def _start_trace():
+    if trace_settings.wants(request.headers.get(TRACE_REQUEST_HEADER)):
+        g.trace_token = start_trace()
+
+
+def _server_timing(response):
+    trace = current_trace()
+    if trace is not None and 'trace_token' in g:
+        response.headers['Server-Timing'] = trace.server_timing()
+    return response
+
+
+def _end_trace(exc):
+    token = g.pop('trace_token', None)
+    if token is not None:
+        end_trace(token)
+
+
+def instrument_engine(engine, name: str, metrics: bool = True):
+    """Time every statement the engine executes, labelled by its SQL verb.
+
+    Durations also go to the current trace, if any, as the 'sql' span.
+    """
+    _instrumented.add(engine)
+    histograms = {op: DB_QUERY_SECONDS.labels(name, op.lower()) for op in SQL_OPERATIONS | {'OTHER'}}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info['metrics_started'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        record('sql', elapsed)
+        if metrics:
+            verb = statement.lstrip()[:6].upper()
+            histograms[verb if verb in SQL_OPERATIONS else 'OTHER'].observe(elapsed)
+
+
+def _counter(name: str, help_text: str, samples: list) -> tuple:
+    return name, 'counter', help_text, samples
+
+
+def _gauge(name: str, help_text: str, samples: list) -> tuple:
+    return name, 'gauge', help_text, samples
+
+
+def _service_metrics(service):
+    def collect():
+        memory = service.memory_cache.stats()
+        backend = service.cache_backend.stats()
+        flights = {mode: group.stats() for mode, group in list(service.flight_groups.items())}
+        yield _counter('weather_memory_cache_requests_total', 'In-process cache lookups by result.',
+                       [({'result': 'hit'}, memory['hits']), ({'result': 'miss'}, memory['misses'])])
+        yield _counter('weather_memory_cache_removals_total', 'In-process cache entries removed, by reason.',
+                       [({'reason': 'evicted'}, memory['evictions']),
+                        ({'reason': 'expired'}, memory['expirations'])])
+        yield _gauge('weather_memory_cache_entries', 'Entries in the in-process cache.',
+                     [({}, memory['size'])])
+        yield _counter('weather_shared_cache_operations_total', 'Shared cache backend operations, by result.',
+                       [({'backend': backend['backend'], 'result': key}, value)
+                        for key, value in backend.items() if key != 'backend'])
+        yield _counter('weather_service_events_total',
+                       'Stale serving, background refresh and geocoding cache events.',
+                       [({'event': key}, value) for key, value in sorted(service.event_counts().items())])
+        yield _counter('weather_upstream_fetches_total',
+                       'Upstream fetches made, and avoided by coalescing, by serving mode.',
+                       [({'mode': mode, 'result': result}, stats[key]) for mode, stats in flights.items()
+                        for result, key in (('fetched', 'upstream_calls'), ('coalesced', 'upstream_calls_saved'))])
+        yield _gauge('weather_upstream_in_flight', 'Upstream fetches currently in progress, by serving mode.',
+                     [({'mode': mode}, stats['in_flight']) for mode, stats in flights.items()])
+    return collect
+
+
+def _database_metrics(db):
+    from app.db_profile import pool_stats
+
+    def collect():
+        pools = pool_stats(db.engines)
+        for field, help_text in (('checkedout', 'Connections in use.'), ('checkedin', 'Idle pooled connections.'),
+                                 ('overflow', 'Connections beyond pool_size.')):
+            samples = [({'engine': engine}, stats[field]) for engine, stats in pools.items() if field in stats]
+            if samples:
+                yield _gauge(f'weather_db_pool_{field}', help_text, samples)
+    return collect
+
+
+def _job_metrics(app):
+    def collect():
+        sweeper = app.extensions.get('cache_sweeper')
+        if sweeper is not None:
+            totals = sweeper.stats()
+            yield _counter('weather_cache_sweeper_rows_total', 'weather_cache rows reclaimed, by reason.',
+                           [({'reason': 'expired'}, totals['expired']), ({'reason': 'evicted'}, totals['evicted'])])
+        writer = app.extensions.get('search_history_writer')
+        if writer is not None:
+            stats = writer.stats()
+            yield _counter('weather_search_history_rows_total', 'Batched search history rows, by outcome.',
+                           [({'outcome': 'written'}, stats['written']), ({'outcome': 'failed'}, stats['failed'])])
+            yield _gauge('weather_search_history_pending', 'Search history rows waiting for a flush.',
+                         [({}, stats['pending'])])
+    return collect
+
+
+def _toggle_profiler(signum, frame):
+    """Signal handler: start the sampling profiler, or stop it and dump its stacks."""
+    if not profiler.running:
+        profiler.clear()
+        profiler.start()
+        logger.warning('Sampling profiler started (pid %d)', os.getpid())
+        return
+    # Joining the sampler from inside a signal handler could deadlock.
+    threading.Thread(target=_dump_profile, name='profiler-dump', daemon=True).start()
+
+
+def _dump_profile():
+    profiler.stop()
+    path = os.path.join(os.environ.get('PROFILER_OUTPUT_DIR', '.'),
+                        f'profile-{os.getpid()}-{int(time.time())}.folded')
+    with open(path, 'w') as f:
+        f.write(profiler.folded())
+    logger.warning('Sampling profiler stopped; %d samples written to %s', profiler.stats()['samples'], path)
+
+
+def install_profiler_signal():
+    """Toggle the profiler on PROFILER_SIGNAL (e.g. SIGUSR2), so `kill -USR2 <pid>` profiles a live worker."""
+    name = os.environ.get('PROFILER_SIGNAL')
+    if not name or threading.current_thread() is not threading.main_thread():
+        return
+    signal.signal(getattr(signal, name), _toggle_profiler)
+
+
+def init_instrumentation(app, db, service):
+    """Install request tracing, SQL timing and, if enabled, metrics collection."""
+    metrics = metrics_enabled()
+    if metrics:
+        app.before_request(_start_timer)
+        app.after_request(_observe_request)
+    app.before_request(_start_trace)
+    app.after_request(_server_timing)
+    app.teardown_request(_end_trace)
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if engine not in _instrumented:
+                instrument_engine(engine, key or 'primary', metrics=metrics)
+    install_profiler_signal()
+    if metrics:
+        registry.add_collector(_service_metrics(service), key='service')
+        registry.add_collector(_database_metrics(db), key='database')
+        registry.add_collector(_job_metrics(app), key='jobs')
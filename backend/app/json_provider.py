@@ -0,0 +1,53 @@
+"""
+Fast JSON provider for the Flask app.
+
+Uses orjson when it is installed and otherwise the stdlib encoder with
+compact separators. Selected with JSON_PROVIDER=fast (the default) or
+JSON_PROVIDER=default for Flask's own provider.
+"""
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+_default = DefaultJSONProvider.default  # Flask's handling of dates, decimals, dataclasses, ...
+
+
+def dumps_bytes(obj) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def loads_bytes(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider that encodes straight to bytes and never sorts or indents."""
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads_bytes(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+JSON_PROVIDERS = {'fast': FastJSONProvider, 'default': DefaultJSONProvider}
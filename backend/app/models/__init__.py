@@ -1,3 +1,9 @@
-from app.models.models import SavedLocation, WeatherCache, SearchHistory
+from app.models.models import (
+    SavedLocation, WeatherCache, GeocodeCache, ReverseGeocodeCache, SearchHistory,
+    SearchPopularity, JobState,
+)
 
-__all__ = ['SavedLocation', 'WeatherCache', 'SearchHistory']
+__all__ = [
+    'SavedLocation', 'WeatherCache', 'GeocodeCache', 'ReverseGeocodeCache', 'SearchHistory',
+    'SearchPopularity', 'JobState',
+]
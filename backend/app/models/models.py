@@ -3,6 +3,17 @@ Database Models for Weather API
 """
 from datetime import datetime, timezone
 from app import db
+from typing import Optional
+from app.json_provider import loads_bytes
+from app.utils.forecast_columns import ForecastColumns
+from app.utils.geo import grid_cell
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite returns naive datetimes; treat them as UTC."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
 
 
 class SavedLocation(db.Model):
@@ -20,9 +31,9 @@ class SavedLocation(db.Model):
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
                            onupdate=lambda: datetime.now(timezone.utc))
 
-    # Relationship to cached weather data
-    weather_cache = db.relationship('WeatherCache', backref='location',
-                                    lazy=True, cascade='all, delete-orphan')
+    # Relationship to cached weather data. Rows are shared by every lookup in
+    # their grid cell, so deleting a location only unlinks them.
+    weather_cache = db.relationship('WeatherCache', backref='location', lazy=True)
 
     def to_dict(self):
         return {
@@ -46,22 +57,132 @@ class WeatherCache(db.Model):
     location_id = db.Column(db.Integer, db.ForeignKey('saved_locations.id'), nullable=True)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
-    weather_data = db.Column(db.JSON, nullable=False)
-    forecast_data = db.Column(db.JSON, nullable=True)
+    # Quantized grid cell (see app.utils.geo); one row per cell.
+    cell_key = db.Column(db.String(32), nullable=False, unique=True, index=True)
+    # Each payload is stored in one form: *_body for rows written by
+    # cache_payload(), forecast_packed in columnar mode, or these JSON
+    # columns for older rows ({} / NULL otherwise). payload() reads any of them.
+    weather_data = db.deferred(db.Column(db.JSON, nullable=False))
+    forecast_data = db.deferred(db.Column(db.JSON, nullable=True))
+    # Columnar alternative to forecast_data (ForecastColumns.pack()).
+    forecast_packed = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    # Canonical payloads as compact JSON bytes, sent as-is on cache hits.
+    weather_body = db.Column(db.LargeBinary, nullable=True)
+    forecast_body = db.Column(db.LargeBinary, nullable=True)
+    # ... and gzip-compressed once at write time for clients that accept it.
+    weather_gzip = db.Column(db.LargeBinary, nullable=True)
+    forecast_gzip = db.Column(db.LargeBinary, nullable=True)
+    # Indexed for the sweeper: expired rows by expires_at, LRU eviction by fetched_at.
+    fetched_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    @staticmethod
+    def cell_for(lat: float, lon: float) -> str:
+        return grid_cell(lat, lon)
+
+    def is_expired(self):
+        return datetime.now(timezone.utc) > _as_utc(self.expires_at)
+
+    def has_payload(self, field: str) -> bool:
+        """Whether 'weather_data' or 'forecast_data' is stored, in any format."""
+        if self.payload_body(field):
+            return True
+        return bool(getattr(self, field) or (field == 'forecast_data' and self.forecast_packed))
+
+    def payload_body(self, field: str) -> Optional[bytes]:
+        """Serialized JSON for 'weather_data' or 'forecast_data', if it was stored."""
+        return self.weather_body if field == 'weather_data' else self.forecast_body
+
+    def payload_gzip(self, field: str) -> Optional[bytes]:
+        return self.weather_gzip if field == 'weather_data' else self.forecast_gzip
+
+    def payload(self, field: str) -> Optional[dict]:
+        """Stored 'weather_data' or 'forecast_data', decoded from whichever format holds it."""
+        body = self.payload_body(field)
+        if body:
+            return loads_bytes(body)
+        if field == 'forecast_data' and self.forecast_packed:
+            return ForecastColumns.unpack(self.forecast_packed).to_payload()
+        return getattr(self, field)
+
+    def fetched_at_utc(self) -> datetime:
+        return _as_utc(self.fetched_at)
+
+    def expires_at_utc(self) -> datetime:
+        return _as_utc(self.expires_at)
+
+    def version(self) -> str:
+        """Changes whenever the row is rewritten; used to build HTTP ETags."""
+        return self.make_version(self.id, self.fetched_at)
+
+    @staticmethod
+    def make_version(row_id: int, fetched_at: datetime) -> str:
+        return f"{row_id}-{int(_as_utc(fetched_at).timestamp() * 1_000_000)}"
+
+    def seconds_until_expiry(self) -> float:
+        return (_as_utc(self.expires_at) - datetime.now(timezone.utc)).total_seconds()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'location_id': self.location_id,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'cell_key': self.cell_key,
+            'weather_data': self.payload('weather_data'),
+            'forecast_data': self.payload('forecast_data'),
+            'fetched_at': self.fetched_at.isoformat() if self.fetched_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+
+class GeocodeCache(db.Model):
+    """Cached forward-geocoding results, keyed by normalized query text."""
+    __tablename__ = 'geocode_cache'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    query_key = db.Column(db.String(255), nullable=False, unique=True, index=True)
+    results = db.Column(db.JSON, nullable=False)
     fetched_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     expires_at = db.Column(db.DateTime, nullable=False)
 
     def is_expired(self):
-        return datetime.now(timezone.utc) > self.expires_at
+        return datetime.now(timezone.utc) > _as_utc(self.expires_at)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'query_key': self.query_key,
+            'results': self.results,
+            'fetched_at': self.fetched_at.isoformat() if self.fetched_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+
+class ReverseGeocodeCache(db.Model):
+    """Cached reverse-geocoding results for previously resolved points."""
+    __tablename__ = 'reverse_geocode_cache'
+    __table_args__ = (db.Index('ix_reverse_geocode_cache_lat_lon', 'latitude', 'longitude'),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    # Radius-sized cell (NearestPointIndex.cell); one row per cell. NULL on
+    # rows written before it existed.
+    cell_key = db.Column(db.String(32), nullable=True, unique=True, index=True)
+    results = db.Column(db.JSON, nullable=False)
+    fetched_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def expires_at_utc(self) -> datetime:
+        return _as_utc(self.expires_at)
 
     def to_dict(self):
         return {
             'id': self.id,
-            'location_id': self.location_id,
             'latitude': self.latitude,
             'longitude': self.longitude,
-            'weather_data': self.weather_data,
-            'forecast_data': self.forecast_data,
+            'results': self.results,
             'fetched_at': self.fetched_at.isoformat() if self.fetched_at else None,
             'expires_at': self.expires_at.isoformat() if self.expires_at else None,
         }
@@ -70,13 +191,17 @@ class WeatherCache(db.Model):
 class SearchHistory(db.Model):
     """User search history for autocomplete."""
     __tablename__ = 'search_history'
+    # Compaction tracks progress by id; AUTOINCREMENT stops SQLite from
+    # reusing the ids of pruned rows.
+    __table_args__ = {'sqlite_autoincrement': True}
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     query = db.Column(db.String(255), nullable=False)
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
     result_name = db.Column(db.String(255), nullable=True)
-    searched_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # Indexed so "most recent N" and retention pruning don't scan the table.
+    searched_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
 
     def to_dict(self):
         return {
@@ -87,3 +212,41 @@ class SearchHistory(db.Model):
             'result_name': self.result_name,
             'searched_at': self.searched_at.isoformat() if self.searched_at else None,
         }
+
+
+class SearchPopularity(db.Model):
+    """Per-query search counts rolled up from search_history by compaction."""
+    __tablename__ = 'search_popularity'
+    __table_args__ = (db.Index('ix_search_popularity_rank', 'search_count', 'last_seen'),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    query_key = db.Column(db.String(255), nullable=False, unique=True, index=True)
+    display_query = db.Column(db.String(255), nullable=False)
+    search_count = db.Column(db.Integer, nullable=False, default=0)
+    last_seen = db.Column(db.DateTime, nullable=False)
+    # Coordinates and label of the most recent search that had them
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    result_name = db.Column(db.String(255), nullable=True)
+
+    def to_dict(self):
+        return {
+            'query': self.display_query,
+            'count': self.search_count,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'result_name': self.result_name,
+        }
+
+
+class JobState(db.Model):
+    """Progress markers for background jobs (e.g. the last compacted row id)."""
+    __tablename__ = 'job_state'
+
+    name = db.Column(db.String(64), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    # JSON list of ids at or below position that weren't visible yet, to rescan
+    pending_ids = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
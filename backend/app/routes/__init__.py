@@ -1,3 +1,4 @@
 from app.routes.weather import weather_bp
 from app.routes.locations import locations_bp
 from app.routes.health import health_bp
+from app.routes.debug import debug_bp
@@ -0,0 +1,67 @@
+"""
+Debug Routes
+
+Runtime switches for request tracing and the sampling profiler. Disabled
+(404) unless DEBUG_TOKEN is set; callers send it as the X-Debug-Token header.
+"""
+import hmac
+import os
+from flask import Blueprint, Response, abort, jsonify, request
+from app.utils.profiler import profiler
+from app.utils.tracing import TRACE_MODES, trace_settings
+
+debug_bp = Blueprint('debug', __name__)
+
+PROFILER_MAX_INTERVAL_MS = 1000
+
+
+@debug_bp.before_request
+def require_token():
+    token = os.environ.get('DEBUG_TOKEN')
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('X-Debug-Token', ''), token):
+        return jsonify({'error': 'invalid debug token'}), 403
+
+
+def _json_body() -> dict:
+    """The request's JSON object; empty for a missing, invalid or non-object body."""
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+
+@debug_bp.route('/tracing', methods=['GET', 'PUT'])
+def tracing():
+    """Show or change which requests get a Server-Timing header."""
+    if request.method == 'PUT':
+        mode = _json_body().get('mode')
+        if mode not in TRACE_MODES:
+            return jsonify({'error': f'mode must be one of {", ".join(TRACE_MODES)}'}), 400
+        trace_settings.set_mode(mode)
+    return jsonify({'mode': trace_settings.mode})
+
+
+@debug_bp.route('/profiler', methods=['GET', 'PUT'])
+def profiler_state():
+    """Start or stop the sampling profiler; starting discards earlier samples."""
+    if request.method == 'PUT':
+        data = _json_body()
+        if not isinstance(data.get('enabled'), bool):
+            return jsonify({'error': 'enabled must be true or false'}), 400
+        interval_ms = data.get('interval_ms')
+        if interval_ms is not None and (not isinstance(interval_ms, (int, float))
+                                        or not 0 < interval_ms <= PROFILER_MAX_INTERVAL_MS):
+            return jsonify({'error': f'interval_ms must be between 0 and {PROFILER_MAX_INTERVAL_MS}'}), 400
+        if data['enabled'] and not profiler.running:
+            profiler.clear()
+            profiler.start(interval_ms)
+        elif not data['enabled']:
+            profiler.stop()
+    return jsonify(profiler.stats())
+
+
+@debug_bp.route('/profiler/stacks', methods=['GET'])
+def profiler_stacks():
+    """Collected stacks in folded format, for flamegraph.pl or speedscope."""
+    limit = request.args.get('limit', type=int)
+    return Response(profiler.folded(limit), content_type='text/plain; charset=utf-8')
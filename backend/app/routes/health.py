@@ -1,16 +1,32 @@
 """
 Health Check Route
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, abort, current_app, jsonify
+from app import db
+from app.db_profile import pool_stats
+from app.instrumentation import metrics_enabled
+from app.utils.metrics import CONTENT_TYPE, registry
 
 health_bp = Blueprint('health', __name__)
 
 
 @health_bp.route('/health', methods=['GET'])
 def health_check():
-    """API health check endpoint."""
+    """API health check endpoint, with connection pool usage per database engine."""
     return jsonify({
         'status': 'healthy',
         'service': 'Weather API',
         'version': '1.0.0',
+        'database': {
+            'profile': current_app.config['DATABASE_PROFILE'],
+            'pools': pool_stats(db.engines),
+        },
     })
+
+
+@health_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of latency histograms and cache, upstream and pool counters."""
+    if not metrics_enabled():
+        abort(404)
+    return Response(registry.render(), content_type=CONTENT_TYPE)
@@ -1,21 +1,113 @@
 """
 Saved Locations API Routes
 """
-from flask import Blueprint, request, jsonify
+from datetime import timezone
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from sqlalchemy import func
 from app import db
-from app.models import SavedLocation, SearchHistory
+from app.models import SavedLocation, SearchHistory, SearchPopularity, WeatherCache
+from app.routes.weather import weather_service
+from app.services.search_history_writer import (
+    HISTORY_BULK_MAX_ENTRIES, HISTORY_COMMIT_TIMEOUT_SECONDS, history_rows, write_history_rows,
+)
+from app.services.weather_service import BATCH_KINDS, CACHE_FIELDS
+from app.utils.compression import compress_response
+from app.utils.http_cache import conditional_response, make_etag
+from app.utils.units import CONVERTERS
+
+TOP_SEARCHES_MAX_LIMIT = 100
 
 locations_bp = Blueprint('locations', __name__)
+locations_bp.after_request(compress_response)
 
 
 @locations_bp.route('/', methods=['GET'])
 def get_locations():
     """Get all saved locations."""
+    def build():
+        locations = SavedLocation.query.order_by(
+            SavedLocation.is_default.desc(),
+            SavedLocation.name.asc()
+        ).all()
+        return jsonify([loc.to_dict() for loc in locations])
+
+    version, last_modified = _locations_version()
+    return conditional_response(build, make_etag('locations', version),
+                                last_modified=last_modified, cache_control='no-cache')
+
+
+def _locations_version():
+    """Version of the saved-locations collection from one aggregate query.
+
+    Any insert, update or delete changes the row count, the highest id or the
+    newest updated_at, so the version is consistent across worker processes
+    without a separate counter table.
+    """
+    count, max_id, last_updated = db.session.query(
+        func.count(SavedLocation.id), func.max(SavedLocation.id), func.max(SavedLocation.updated_at)
+    ).one()
+    last_modified = last_updated.replace(tzinfo=timezone.utc) if last_updated else None
+    return f"{count}-{max_id}-{last_updated.isoformat() if last_updated else ''}", last_modified
+
+
+@locations_bp.route('/weather', methods=['GET'])
+def get_locations_weather():
+    """
+    Get all saved locations with their weather.
+
+    Cached weather is matched to the locations by grid cell in one query;
+    missing or expired entries are fetched concurrently. The JSON array is
+    streamed, cached entries first. Nothing is written here: the batch fetch
+    caches by cell, which the next call's query finds.
+    """
+    units = request.args.get('units', 'metric')
+    include = tuple(dict.fromkeys(request.args.get('include', 'current').split(',')))
+    if any(name not in BATCH_KINDS for name in include):
+        return jsonify({'error': 'include must list current and/or forecast'}), 400
+
     locations = SavedLocation.query.order_by(
         SavedLocation.is_default.desc(),
         SavedLocation.name.asc()
     ).all()
-    return jsonify([loc.to_dict() for loc in locations])
+    cells = [WeatherCache.cell_for(loc.latitude, loc.longitude) for loc in locations]
+    cached = {row.cell_key: row for row in
+              WeatherCache.query.filter(WeatherCache.cell_key.in_(set(cells)))} if cells else {}
+
+    def items():
+        missing = []
+        for loc, cell in zip(locations, cells):
+            item = _weather_from_cache(loc, cached.get(cell), include, units)
+            if item is None:
+                missing.append(loc)
+            else:
+                yield item
+
+        batch = [{'lat': loc.latitude, 'lon': loc.longitude, 'units': units} for loc in missing]
+        for index, result in weather_service.iter_weather_batch(batch, include):
+            item = missing[index].to_dict()
+            item.update({name: result[name] for name in include})
+            yield item
+
+    def generate():
+        yield '['
+        for position, item in enumerate(items()):
+            yield (',' if position else '') + current_app.json.dumps(item)
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def _weather_from_cache(location, entry, include, units):
+    """Location dict with its cell's weather in `units`, or None if any section is missing or expired."""
+    if entry is None or entry.is_expired():
+        return None
+    sections = {name: entry.payload(CACHE_FIELDS[BATCH_KINDS[name]]) for name in include}
+    if all(sections.values()):
+        item = location.to_dict()
+        item.update({name: CONVERTERS[BATCH_KINDS[name]](data, units)
+                     for name, data in sections.items()})
+        return item
+    return None
 
 
 @locations_bp.route('/', methods=['POST'])
@@ -80,25 +172,75 @@ def delete_location(location_id):
 def get_search_history():
     """Get recent search history."""
     limit = request.args.get('limit', 10, type=int)
-    history = SearchHistory.query.order_by(
+    # db.session.query: the model's `query` column shadows Model.query.
+    history = db.session.query(SearchHistory).order_by(
         SearchHistory.searched_at.desc()
     ).limit(limit).all()
     return jsonify([h.to_dict() for h in history])
 
 
+@locations_bp.route('/search-history/top', methods=['GET'])
+def get_top_searches():
+    """Most searched queries, as of the last search history compaction."""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), TOP_SEARCHES_MAX_LIMIT)
+    top = SearchPopularity.query.order_by(
+        SearchPopularity.search_count.desc(), SearchPopularity.last_seen.desc()
+    ).limit(limit).all()
+    return jsonify([p.to_dict() for p in top])
+
+
 @locations_bp.route('/search-history', methods=['POST'])
 def add_search_history():
-    """Record a search."""
-    data = request.get_json()
-    if not data or 'query' not in data:
-        return jsonify({'error': 'query is required'}), 400
-
-    entry = SearchHistory(
-        query=data['query'],
-        latitude=data.get('latitude'),
-        longitude=data.get('longitude'),
-        result_name=data.get('result_name'),
-    )
+    """Record a search.
+
+    With SEARCH_HISTORY_WRITE_MODE=batched the entry is queued for the next
+    batched flush and 202 is returned (after the commit when
+    SEARCH_HISTORY_DURABILITY=commit).
+    """
+    data = request.get_json(silent=True)
+    try:
+        row = history_rows([data])[0]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    writer = current_app.extensions.get('search_history_writer')
+    if writer is not None:
+        if not _submit_history(writer, [row]):
+            return jsonify({'error': 'search history is unavailable'}), 503
+        return jsonify(SearchHistory(**row).to_dict()), 202
+
+    entry = SearchHistory(**row)
     db.session.add(entry)
     db.session.commit()
     return jsonify(entry.to_dict()), 201
+
+
+@locations_bp.route('/search-history/bulk', methods=['POST'])
+def add_search_history_bulk():
+    """Record many searches in one transaction: {"entries": [{"query": ...}, ...]}."""
+    data = request.get_json(silent=True)
+    entries = data.get('entries') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'entries must be a non-empty list'}), 400
+    if len(entries) > HISTORY_BULK_MAX_ENTRIES:
+        return jsonify({'error': f'at most {HISTORY_BULK_MAX_ENTRIES} entries per request'}), 400
+    try:
+        rows = history_rows(entries)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    writer = current_app.extensions.get('search_history_writer')
+    if writer is not None:
+        if not _submit_history(writer, rows):
+            return jsonify({'error': 'search history is unavailable'}), 503
+        return jsonify({'accepted': len(rows)}), 202
+
+    write_history_rows(rows)
+    return jsonify({'accepted': len(rows)}), 201
+
+
+def _submit_history(writer, rows: list) -> bool:
+    """Queue rows on the batched writer, waiting for their commit if configured to."""
+    ticket = writer.submit(rows)
+    if writer.durability == 'commit':
+        return ticket.wait(HISTORY_COMMIT_TIMEOUT_SECONDS)
+    return True
@@ -1,10 +1,21 @@
 """
 Weather API Routes
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from app.services import WeatherService
+from app.services.weather_service import (
+    BATCH_KINDS, BATCH_MAX_LOCATIONS, FORECAST_ROLLUPS, CachedPayload,
+)
+from app.utils.compression import (
+    COMPRESS_MIN_BYTES, choose_encoding, compress_response, encoded_response,
+)
+from app.utils.geo import INVALID_COORDINATES, valid_coordinates
+from app.utils.http_cache import conditional_response, make_etag
+from app.utils.tracing import span
+from app.utils.units import CONVERTERS, needs_conversion
 
 weather_bp = Blueprint('weather', __name__)
+weather_bp.after_request(compress_response)
 weather_service = WeatherService()
 
 
@@ -41,9 +52,11 @@ def get_current_weather():
 
     if lat is None or lon is None:
         return jsonify({'error': 'lat and lon parameters are required'}), 400
+    if not valid_coordinates(lat, lon):
+        return jsonify({'error': INVALID_COORDINATES}), 400
 
-    data = weather_service.get_current_weather(lat, lon, units)
-    return jsonify(data)
+    entry = weather_service.get_weather_entry('weather', lat, lon)
+    return _cached_response('weather', entry, units)
 
 
 @weather_bp.route('/forecast', methods=['GET'])
@@ -74,9 +87,143 @@ def get_forecast():
 
     if lat is None or lon is None:
         return jsonify({'error': 'lat and lon parameters are required'}), 400
+    if not valid_coordinates(lat, lon):
+        return jsonify({'error': INVALID_COORDINATES}), 400
 
-    data = weather_service.get_forecast(lat, lon, units)
-    return jsonify(data)
+    entry = weather_service.get_weather_entry('forecast', lat, lon)
+    return _cached_response('forecast', entry, units)
+
+
+@weather_bp.route('/forecast/<view>', methods=['GET'])
+def get_forecast_rollup(view):
+    """
+    Get the forecast rolled up per day or as the next 24 hours.
+    ---
+    parameters:
+      - name: view
+        in: path
+        type: string
+        enum: [daily, hourly]
+        required: true
+      - name: lat
+        in: query
+        type: number
+        required: true
+      - name: lon
+        in: query
+        type: number
+        required: true
+      - name: units
+        in: query
+        type: string
+        default: metric
+    responses:
+      200:
+        description: Daily min/max for 5 days, or 8 three-hour slots
+      400:
+        description: Missing required parameters
+      404:
+        description: Unknown view
+    """
+    if view not in FORECAST_ROLLUPS:
+        return jsonify({'error': f"view must be one of {', '.join(FORECAST_ROLLUPS)}"}), 404
+
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    units = request.args.get('units', 'metric')
+
+    if lat is None or lon is None:
+        return jsonify({'error': 'lat and lon parameters are required'}), 400
+    if not valid_coordinates(lat, lon):
+        return jsonify({'error': INVALID_COORDINATES}), 400
+
+    entry = weather_service.get_forecast_rollup(view, lat, lon)
+    return _cached_response(view, entry, units)
+
+
+def _cached_response(kind: str, entry: CachedPayload, units: str):
+    """JSON for a cache entry with validators; 304 when the client's copy is current."""
+    etag = make_etag(kind, entry.version, units) if entry.version else None
+    return conditional_response(
+        lambda: _json_response(kind, entry, units),
+        etag,
+        last_modified=entry.fetched_at,
+        cache_control=f'public, max-age={entry.max_age()}',
+    )
+
+
+def _json_response(kind: str, entry: CachedPayload, units: str) -> Response:
+    if needs_conversion(units):
+        with span('convert'):
+            data = CONVERTERS[kind](entry.data, units)
+        with span('render'):
+            return jsonify(data)
+    # Canonical units: send the cached bytes without decoding them, using the
+    # entry's stored compressed copy when the client accepts one.
+    response = Response(mimetype='application/json')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    with span('render'):
+        if encoding is not None and len(entry.body) >= COMPRESS_MIN_BYTES:
+            return encoded_response(response, entry.encoded(encoding), encoding)
+        response.set_data(entry.body)
+    return response
+
+
+@weather_bp.route('/batch', methods=['POST'])
+def get_weather_batch():
+    """
+    Get current weather and/or forecast for many locations in one request.
+    ---
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            locations:
+              type: array
+              items:
+                type: object
+                properties:
+                  lat: {type: number}
+                  lon: {type: number}
+                  units: {type: string, default: metric}
+            include:
+              type: array
+              items: {type: string, enum: [current, forecast]}
+              default: [current]
+    responses:
+      200:
+        description: One result per requested location, in request order
+      400:
+        description: Invalid or oversized batch
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('locations'), list) or not data['locations']:
+        return jsonify({'error': 'locations must be a non-empty list'}), 400
+    if len(data['locations']) > BATCH_MAX_LOCATIONS:
+        return jsonify({'error': f'at most {BATCH_MAX_LOCATIONS} locations per batch'}), 400
+
+    include = data.get('include', ['current'])
+    if not isinstance(include, list) or not include or any(i not in BATCH_KINDS for i in include):
+        return jsonify({'error': 'include must list current and/or forecast'}), 400
+
+    locations = []
+    for loc in data['locations']:
+        try:
+            locations.append({
+                'lat': float(loc['lat']),
+                'lon': float(loc['lon']),
+                'units': loc.get('units', 'metric'),
+            })
+        except (TypeError, KeyError, ValueError):
+            return jsonify({'error': 'each location needs numeric lat and lon'}), 400
+        if not valid_coordinates(locations[-1]['lat'], locations[-1]['lon']):
+            return jsonify({'error': INVALID_COORDINATES}), 400
+
+    results = weather_service.get_weather_batch(locations, tuple(dict.fromkeys(include)))
+    return jsonify({'results': results})
 
 
 @weather_bp.route('/geocode', methods=['GET'])
@@ -118,6 +265,8 @@ def reverse_geocode():
 
     if lat is None or lon is None:
         return jsonify({'error': 'lat and lon parameters are required'}), 400
+    if not valid_coordinates(lat, lon):
+        return jsonify({'error': INVALID_COORDINATES}), 400
 
     data = weather_service.reverse_geocode(lat, lon)
     return jsonify(data)
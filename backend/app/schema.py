@@ -0,0 +1,60 @@
+"""
+In-place upgrades for databases created by an older version of the models.
+
+db.create_all() only creates missing tables. upgrade_schema() also adds
+columns and indexes that were introduced since a table was created, and
+backfills weather_cache.cell_key so the unique index on it can be built.
+"""
+import logging
+from sqlalchemy import inspect, text
+from app.utils.geo import grid_cell
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column(conn, table, column):
+    # Added as nullable: existing rows have no value yet.
+    ddl_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl_type}'))
+    logger.warning('Added column %s.%s', table.name, column.name)
+
+
+def _backfill_cell_keys(conn):
+    """Fill cell_key for old rows, keeping only the newest row per cell."""
+    rows = conn.execute(text(
+        'SELECT id, latitude, longitude FROM weather_cache WHERE cell_key IS NULL '
+        'ORDER BY fetched_at DESC, id DESC')).all()
+    taken = {key for (key,) in conn.execute(
+        text('SELECT cell_key FROM weather_cache WHERE cell_key IS NOT NULL'))}
+    duplicates = []
+    for row_id, lat, lon in rows:
+        cell = grid_cell(lat, lon)
+        if cell in taken:
+            duplicates.append(row_id)
+            continue
+        taken.add(cell)
+        conn.execute(text('UPDATE weather_cache SET cell_key = :cell WHERE id = :id'), {'cell': cell, 'id': row_id})
+    for row_id in duplicates:
+        conn.execute(text('DELETE FROM weather_cache WHERE id = :id'), {'id': row_id})
+    if rows:
+        logger.warning('Backfilled cell_key for %d weather_cache rows (%d duplicates removed)',
+                       len(rows) - len(duplicates), len(duplicates))
+
+
+def upgrade_schema(db, bind_key=None):
+    """Bring existing tables of the `bind_key` engine up to the current models."""
+    engine = db.engines[bind_key]
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in db.metadatas[bind_key].sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    _add_column(conn, table, column)
+            if table.name == 'weather_cache':
+                _backfill_cell_keys(conn)
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
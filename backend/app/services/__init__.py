@@ -1,3 +1,7 @@
 from app.services.weather_service import WeatherService
+from app.services.cache_warmer import CacheWarmer
+from app.services.cache_sweeper import CacheSweeper
+from app.services.search_history_writer import SearchHistoryWriter
+from app.services.search_history_compactor import SearchHistoryCompactor
 
-__all__ = ['WeatherService']
+__all__ = ['WeatherService', 'CacheWarmer', 'CacheSweeper', 'SearchHistoryWriter', 'SearchHistoryCompactor']
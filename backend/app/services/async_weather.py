@@ -0,0 +1,86 @@
+"""
+Async Weather Service - asyncio front end over WeatherService's caching.
+
+Upstream calls go through a non-blocking httpx client so a single process can
+hold thousands of in-flight OpenWeatherMap requests. Cache semantics (memory
+tier, grid-cell lookup, stale-while-revalidate, canonical units, fallbacks)
+are WeatherService's own; database work runs on worker threads inside an app
+context so it never blocks the event loop.
+"""
+import asyncio
+import os
+import httpx
+from app.models import WeatherCache
+from app.services.weather_service import (
+    CANONICAL_UNITS, HTTP_CONNECT_TIMEOUT, HTTP_MAX_RETRIES, HTTP_READ_TIMEOUT,
+    CachedPayload, WeatherService,
+)
+from app.utils import AsyncSingleFlight
+from app.utils.async_http_client import AsyncUpstreamClient
+from app.utils.tracing import span
+
+ASYNC_MAX_CONNECTIONS = 200
+
+
+class AsyncWeatherService:
+    """Async wrapper sharing a WeatherService's caches and counters."""
+
+    def __init__(self, app, service: WeatherService):
+        self.app = app
+        self.service = service
+        self.http = AsyncUpstreamClient(
+            max_connections=int(os.environ.get('WEATHER_ASYNC_MAX_CONNECTIONS', ASYNC_MAX_CONNECTIONS)),
+            connect_timeout=float(os.environ.get('WEATHER_HTTP_CONNECT_TIMEOUT', HTTP_CONNECT_TIMEOUT)),
+            read_timeout=float(os.environ.get('WEATHER_HTTP_READ_TIMEOUT', HTTP_READ_TIMEOUT)),
+            max_retries=int(os.environ.get('WEATHER_HTTP_MAX_RETRIES', HTTP_MAX_RETRIES)),
+        )
+        self.inflight = AsyncSingleFlight()
+        service.flight_groups['async'] = self.inflight
+
+    async def get_weather_entry(self, kind: str, lat: float, lon: float) -> CachedPayload:
+        """Async equivalent of WeatherService.get_weather_entry."""
+        service = self.service
+        entry, stale = await self._in_app(service.lookup_cached, kind, lat, lon)
+        if entry is not None:
+            return entry
+        if not service.api_key:
+            return CachedPayload(service._get_mock(kind, lat, lon))
+
+        try:
+            flight_key = (kind, WeatherCache.cell_for(lat, lon))
+            return await self.inflight.do(flight_key, self._fetch_and_cache, kind, lat, lon)
+        except (httpx.HTTPError, ValueError) as e:
+            if stale:
+                service.count('stale_on_error')
+                return stale
+            return CachedPayload({'error': str(e), 'fallback': service._get_mock(kind, lat, lon)})
+
+    async def _fetch_and_cache(self, kind: str, lat: float, lon: float) -> CachedPayload:
+        with span('upstream'):
+            response = await self.http.get(
+                f"{self.service.base_url}/{kind}",
+                params={
+                    'lat': lat,
+                    'lon': lon,
+                    'appid': self.service.api_key,
+                    'units': CANONICAL_UNITS,
+                },
+                label=kind,
+            )
+        response.raise_for_status()
+        with span('upstream.decode'):
+            data = response.json()
+        return await self._in_app(self.service.cache_payload, kind, lat, lon, data)
+
+    async def _in_app(self, fn, *args):
+        return await asyncio.to_thread(self._call_in_app, fn, *args)
+
+    def _call_in_app(self, fn, *args):
+        with self.app.app_context():
+            return fn(*args)
+
+    def upstream_stats(self) -> dict:
+        return self.inflight.stats()
+
+    async def aclose(self):
+        await self.http.aclose()
@@ -0,0 +1,126 @@
+"""
+Cache Sweeper - Deletes expired weather_cache rows and keeps the table under a row limit.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from app import db
+from app.models import WeatherCache
+
+SWEEP_INTERVAL_SECONDS = 300
+SWEEP_BATCH_SIZE = 500
+SWEEP_BATCH_PAUSE_MS = 10  # lets request writes in between batches
+CACHE_MAX_ROWS = 50000  # 0 disables the limit
+
+logger = logging.getLogger(__name__)
+
+
+class CacheSweeper:
+    """Reclaims weather_cache rows that can no longer be served.
+
+    A row is dead once it is past expires_at plus the service's
+    stale-while-revalidate grace. Dead rows are deleted `batch_size` at a
+    time, each batch in its own short transaction. If more than `max_rows`
+    remain, the least recently fetched rows are evicted the same way and
+    their memory and shared-tier entries dropped.
+    """
+
+    def __init__(self, app, service, interval_seconds: float = None, batch_size: int = None,
+                 max_rows: int = None, batch_pause_ms: float = None):
+        env = os.environ.get
+        self.app = app
+        self.service = service
+        self.interval_seconds = float(interval_seconds if interval_seconds is not None
+                                      else env('CACHE_SWEEP_INTERVAL_SECONDS', SWEEP_INTERVAL_SECONDS))
+        self.batch_size = int(batch_size if batch_size is not None
+                              else env('CACHE_SWEEP_BATCH_SIZE', SWEEP_BATCH_SIZE))
+        self.max_rows = int(max_rows if max_rows is not None
+                            else env('WEATHER_CACHE_MAX_ROWS', CACHE_MAX_ROWS))
+        self.batch_pause = float(batch_pause_ms if batch_pause_ms is not None
+                                 else env('CACHE_SWEEP_BATCH_PAUSE_MS', SWEEP_BATCH_PAUSE_MS)) / 1000
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._totals = {'sweeps': 0, 'expired': 0, 'evicted': 0, 'last': None}
+
+    def _delete(self, query, order_by, limit: int) -> list:
+        """Delete up to `limit` rows matched by `query`, first by `order_by`; returns their cells."""
+        rows = query.with_entities(WeatherCache.id, WeatherCache.cell_key).order_by(order_by).limit(limit).all()
+        if rows:
+            WeatherCache.query.filter(WeatherCache.id.in_([row.id for row in rows])).delete(
+                synchronize_session=False)
+        db.session.commit()
+        return [row.cell_key for row in rows]
+
+    def sweep_expired(self) -> int:
+        """Delete rows past expiry and stale grace; returns the number deleted."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.service.stale_grace_seconds)
+        dead = WeatherCache.query.filter(WeatherCache.expires_at < cutoff)
+        deleted = 0
+        while not self._stop.is_set():
+            count = len(self._delete(dead, WeatherCache.expires_at, self.batch_size))
+            deleted += count
+            if count < self.batch_size:
+                break
+            self._stop.wait(self.batch_pause)
+        return deleted
+
+    def enforce_limit(self) -> int:
+        """Evict least recently fetched rows above `max_rows`; returns the number evicted."""
+        if self.max_rows <= 0:
+            return 0
+        excess = WeatherCache.query.count() - self.max_rows
+        evicted = 0
+        while excess > 0 and not self._stop.is_set():
+            cells = self._delete(WeatherCache.query, WeatherCache.fetched_at, min(excess, self.batch_size))
+            if not cells:
+                break
+            for cell in cells:
+                self.service.evict_cell(cell)
+            evicted += len(cells)
+            excess -= len(cells)
+            if excess > 0:
+                self._stop.wait(self.batch_pause)
+        return evicted
+
+    def run_once(self) -> dict:
+        """Run a single sweep and return its statistics."""
+        started = time.perf_counter()
+        with self.app.app_context(), db.session().using_primary():
+            stats = {'expired': self.sweep_expired(), 'evicted': self.enforce_limit()}
+            stats['rows'] = WeatherCache.query.count()
+        stats['duration_seconds'] = round(time.perf_counter() - started, 3)
+        with self._lock:
+            self._totals['sweeps'] += 1
+            self._totals['expired'] += stats['expired']
+            self._totals['evicted'] += stats['evicted']
+            self._totals['last'] = stats
+        logger.info('Cache sweep: %s', stats)
+        return stats
+
+    def stats(self) -> dict:
+        """Rows reclaimed since start-up and the most recent sweep's statistics."""
+        with self._lock:
+            return dict(self._totals)
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('Cache sweep failed')
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        """Run sweeps on a daemon thread every `interval_seconds`."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='cache-sweeper', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
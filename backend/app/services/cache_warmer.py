@@ -0,0 +1,132 @@
+"""
+Cache Warmer - Refreshes weather_cache entries for popular coordinates before they expire.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import requests
+from sqlalchemy import func
+from app import db
+from app.models import SavedLocation, SearchHistory, WeatherCache
+from app.services.weather_service import CACHE_FIELDS
+from app.utils import TokenBucket
+
+WARM_LEAD_MINUTES = 5
+WARM_INTERVAL_SECONDS = 60
+WARM_RATE_PER_MINUTE = 50  # Free OpenWeatherMap tier allows 60 calls/minute
+WARM_SEARCH_TOP_N = 20
+WARM_SEARCH_WINDOW_HOURS = 24
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    """Keeps weather for saved locations and top recent searches warm.
+
+    Each pass collects target coordinates, finds those whose cache entry is
+    missing or expires within `lead_minutes`, and refreshes them through the
+    WeatherService, throttled by a token bucket so the warmer alone never
+    exceeds `rate_per_minute` upstream calls.
+    """
+
+    def __init__(self, app, service, lead_minutes: float = None, interval_seconds: float = None,
+                 rate_per_minute: float = None, search_top_n: int = None,
+                 search_window_hours: float = None):
+        env = os.environ.get
+        self.app = app
+        self.service = service
+        self.lead_seconds = 60 * float(lead_minutes if lead_minutes is not None
+                                       else env('CACHE_WARM_LEAD_MINUTES', WARM_LEAD_MINUTES))
+        self.interval_seconds = float(interval_seconds if interval_seconds is not None
+                                      else env('CACHE_WARM_INTERVAL_SECONDS', WARM_INTERVAL_SECONDS))
+        rate = float(rate_per_minute if rate_per_minute is not None
+                     else env('CACHE_WARM_RATE_PER_MINUTE', WARM_RATE_PER_MINUTE))
+        if not rate > 0:
+            raise ValueError('CACHE_WARM_RATE_PER_MINUTE must be greater than 0')
+        self.search_top_n = int(search_top_n if search_top_n is not None
+                                else env('CACHE_WARM_SEARCH_TOP_N', WARM_SEARCH_TOP_N))
+        self.search_window_hours = float(search_window_hours if search_window_hours is not None
+                                         else env('CACHE_WARM_SEARCH_WINDOW_HOURS', WARM_SEARCH_WINDOW_HOURS))
+        self.limiter = TokenBucket(rate=rate / 60.0, capacity=max(1.0, rate / 6))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def targets(self) -> list:
+        """Coordinates of every saved location and the most searched recent places, one per cell."""
+        points = [(lat, lon) for lat, lon in
+                  db.session.query(SavedLocation.latitude, SavedLocation.longitude).all()]
+
+        if self.search_top_n > 0:
+            cutoff = datetime.now(timezone.utc) - timedelta(hours=self.search_window_hours)
+            lat = func.round(SearchHistory.latitude, 2)
+            lon = func.round(SearchHistory.longitude, 2)
+            popular = db.session.query(
+                func.avg(SearchHistory.latitude), func.avg(SearchHistory.longitude)
+            ).filter(
+                SearchHistory.latitude.isnot(None),
+                SearchHistory.longitude.isnot(None),
+                SearchHistory.searched_at >= cutoff,
+            ).group_by(lat, lon).order_by(func.count().desc()).limit(self.search_top_n).all()
+            points.extend((row[0], row[1]) for row in popular)
+
+        unique = {}
+        for lat, lon in points:
+            unique.setdefault(WeatherCache.cell_for(lat, lon), (lat, lon))
+        return list(unique.values())
+
+    def due(self, targets: list) -> list:
+        """(kind, lat, lon) entries that are missing or expire within the lead time."""
+        rows = self.service.cached_weather_many(targets)
+        due = []
+        for lat, lon in targets:
+            row = rows.get((lat, lon))
+            for kind, field in CACHE_FIELDS.items():
+                if row is None or not row.has_payload(field) or row.seconds_until_expiry() < self.lead_seconds:
+                    due.append((kind, lat, lon))
+        return due
+
+    def run_once(self) -> dict:
+        """Run a single warming pass and return its statistics."""
+        started = time.perf_counter()
+        stats = {'targets': 0, 'due': 0, 'refreshed': 0, 'errors': 0}
+        if not self.service.api_key:
+            logger.info('Cache warm pass skipped: no OPENWEATHERMAP_API_KEY')
+            return stats
+        with self.app.app_context():
+            targets = self.targets()
+            due = self.due(targets)
+            stats.update(targets=len(targets), due=len(due))
+            for kind, lat, lon in due:
+                if not self.limiter.acquire(stop_event=self._stop):
+                    break
+                try:
+                    self.service.refresh(kind, lat, lon)
+                    stats['refreshed'] += 1
+                except requests.RequestException as e:
+                    stats['errors'] += 1
+                    logger.warning('Warming %s at (%s, %s) failed: %s', kind, lat, lon, e)
+        stats['duration_seconds'] = round(time.perf_counter() - started, 3)
+        logger.info('Cache warm pass: %s', stats)
+        return stats
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('Cache warm pass failed')
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        """Run passes on a daemon thread every `interval_seconds`."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='cache-warmer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,169 @@
+"""
+Search History Compactor - Rolls search_history rows up into search_popularity and prunes old ones.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from app import db
+from app.models import JobState, SearchHistory, SearchPopularity
+from app.utils.prefix_index import normalize_query
+
+HISTORY_RETENTION_DAYS = 30  # must cover CACHE_WARM_SEARCH_WINDOW_HOURS
+HISTORY_COMPACT_BATCH_SIZE = 5000
+HISTORY_COMPACT_OVERLAP_IDS = 1000
+HISTORY_COMPACT_INTERVAL_SECONDS = 3600
+COMPACTION_JOB = 'search_history_compaction'
+
+logger = logging.getLogger(__name__)
+
+
+class SearchHistoryCompactor:
+    """Folds raw searches into per-query counts and deletes rows past retention.
+
+    Rows are aggregated in id order, `batch_size` at a time. Each batch's
+    popularity upserts and the job_state watermark (the last aggregated id)
+    commit together, so an interrupted pass resumes where it stopped and no
+    row is ever counted twice. Ids are allocated before commit, so on a
+    concurrent database a row can become visible after a higher id was
+    aggregated: ids the watermark skipped are kept as pending and rescanned
+    until it is `overlap_ids` past them. Rows committed later than that, or
+    never (rolled back), are not counted. Only aggregated rows are pruned,
+    again in `batch_size` chunks so no single DELETE holds the write lock long.
+    """
+
+    def __init__(self, app, retention_days: float = None, batch_size: int = None,
+                 interval_seconds: float = None, overlap_ids: int = None):
+        env = os.environ.get
+        self.app = app
+        self.retention_days = float(retention_days if retention_days is not None
+                                    else env('SEARCH_HISTORY_RETENTION_DAYS', HISTORY_RETENTION_DAYS))
+        self.batch_size = int(batch_size if batch_size is not None
+                              else env('SEARCH_HISTORY_COMPACT_BATCH_SIZE', HISTORY_COMPACT_BATCH_SIZE))
+        self.interval_seconds = float(interval_seconds if interval_seconds is not None
+                                      else env('SEARCH_HISTORY_COMPACT_INTERVAL_SECONDS',
+                                               HISTORY_COMPACT_INTERVAL_SECONDS))
+        self.overlap_ids = int(overlap_ids if overlap_ids is not None
+                               else env('SEARCH_HISTORY_COMPACT_OVERLAP_IDS', HISTORY_COMPACT_OVERLAP_IDS))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _watermark(self) -> JobState:
+        state = db.session.get(JobState, COMPACTION_JOB)
+        if state is None:
+            state = JobState(name=COMPACTION_JOB, position=0)
+            db.session.add(state)
+        return state
+
+    @staticmethod
+    def _pending(state: JobState) -> set:
+        return set(json.loads(state.pending_ids)) if state.pending_ids else set()
+
+    def compact_batch(self) -> int:
+        """Aggregate the next batch of uncompacted rows; returns how many were read."""
+        state = self._watermark()
+        pending = self._pending(state)
+        # Rows between the lowest pending id and the watermark were counted already
+        floor = min(pending) - 1 if pending else state.position
+        rows = db.session.query(
+            SearchHistory.id, SearchHistory.query, SearchHistory.latitude,
+            SearchHistory.longitude, SearchHistory.result_name, SearchHistory.searched_at,
+        ).filter(SearchHistory.id > floor).order_by(SearchHistory.id).limit(
+            self.batch_size + state.position - floor).all()
+        rows = [row for row in rows if row.id > state.position or row.id in pending][:self.batch_size]
+        if not rows:
+            db.session.rollback()
+            return 0
+
+        totals = {}
+        for row in rows:
+            key = normalize_query(row.query)
+            if not key:
+                continue
+            total = totals.setdefault(key, {'count': 0, 'query': row.query, 'last_seen': row.searched_at})
+            total['count'] += 1
+            if row.searched_at >= total['last_seen']:
+                total.update(query=row.query, last_seen=row.searched_at)
+            if row.latitude is not None and row.longitude is not None:
+                total['place'] = (row.latitude, row.longitude, row.result_name)
+
+        existing = {p.query_key: p for p in db.session.query(SearchPopularity).filter(
+            SearchPopularity.query_key.in_(list(totals)))}
+        for key, total in totals.items():
+            popularity = existing.get(key)
+            if popularity is None:
+                popularity = SearchPopularity(query_key=key, search_count=0, last_seen=total['last_seen'],
+                                              display_query=total['query'])
+                db.session.add(popularity)
+            popularity.search_count += total['count']
+            if total['last_seen'] >= popularity.last_seen:
+                popularity.last_seen = total['last_seen']
+                popularity.display_query = total['query'][:255]
+            if 'place' in total:
+                popularity.latitude, popularity.longitude, popularity.result_name = total['place']
+        seen = {row.id for row in rows}
+        position = max(state.position, rows[-1].id)
+        window = position - self.overlap_ids
+        pending.update(range(max(state.position, window) + 1, position + 1))
+        pending = sorted(i for i in pending - seen if i > window)
+        state.position = position
+        state.pending_ids = json.dumps(pending) if pending else None
+        db.session.commit()
+        return len(rows)
+
+    def prune_batch(self, cutoff: datetime) -> int:
+        """Delete up to `batch_size` compacted rows searched before `cutoff`."""
+        state = self._watermark()
+        pending = self._pending(state)
+        ids = [row.id for row in db.session.query(SearchHistory.id).filter(
+            SearchHistory.searched_at < cutoff, SearchHistory.id <= state.position,
+        ).limit(self.batch_size) if row.id not in pending]
+        if ids:
+            db.session.query(SearchHistory).filter(SearchHistory.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        return len(ids)
+
+    def run_once(self) -> dict:
+        """Compact every pending row, prune expired ones and return the pass statistics."""
+        started = time.perf_counter()
+        stats = {'compacted': 0, 'pruned': 0}
+        # SQLite hands back naive datetimes; searched_at is stored as UTC.
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).replace(tzinfo=None)
+        # Watermark and popularity reads decide writes: keep them off a lagging replica.
+        with self.app.app_context(), db.session().using_primary():
+            while not self._stop.is_set():
+                count = self.compact_batch()
+                stats['compacted'] += count
+                if count < self.batch_size:
+                    break
+            while not self._stop.is_set():
+                count = self.prune_batch(cutoff)
+                stats['pruned'] += count
+                if count < self.batch_size:
+                    break
+        stats['duration_seconds'] = round(time.perf_counter() - started, 3)
+        logger.info('Search history compaction: %s', stats)
+        return stats
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('Search history compaction failed')
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        """Run passes on a daemon thread every `interval_seconds`."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='search-history-compactor',
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,208 @@
+"""
+Search History Writer - Batches search_history inserts into few transactions.
+"""
+import atexit
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from app import db
+from app.models import SearchHistory
+
+HISTORY_FLUSH_INTERVAL_MS = 200
+HISTORY_BATCH_SIZE = 500
+HISTORY_MAX_QUEUE = 10000
+# 'ack': respond once queued (a crash can lose up to one interval of searches).
+# 'commit': respond once the batch holding the entry has been committed.
+HISTORY_DURABILITY_MODES = ('ack', 'commit')
+HISTORY_COLUMNS = ('query', 'latitude', 'longitude', 'result_name', 'searched_at')
+HISTORY_COMMIT_TIMEOUT_SECONDS = 5
+HISTORY_BULK_MAX_ENTRIES = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def _coordinate(entry: dict, name: str, limit: float):
+    value = entry.get(name)
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+    if not math.isfinite(value) or abs(value) > limit:
+        raise ValueError(f'{name} must be between -{limit:g} and {limit:g}')
+    return value
+
+
+def _searched_at(value, now: datetime) -> datetime:
+    if value is None:
+        return now
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except (AttributeError, ValueError):
+            raise ValueError('searched_at must be an ISO 8601 timestamp')
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+
+def history_rows(entries: list) -> list:
+    """Insert-ready dicts for search entries, timestamped now unless they carry searched_at.
+
+    Raises ValueError naming the first invalid entry, so callers can reject a
+    request before anything is queued.
+    """
+    now = datetime.now(timezone.utc)
+    rows = []
+    for position, entry in enumerate(entries):
+        try:
+            if not isinstance(entry, dict) or not entry.get('query') or not isinstance(entry['query'], str):
+                raise ValueError('query is required')
+            result_name = entry.get('result_name')
+            if result_name is not None and not isinstance(result_name, str):
+                raise ValueError('result_name must be a string')
+            rows.append({
+                'query': entry['query'],
+                'latitude': _coordinate(entry, 'latitude', 90),
+                'longitude': _coordinate(entry, 'longitude', 180),
+                'result_name': result_name,
+                'searched_at': _searched_at(entry.get('searched_at'), now),
+            })
+        except ValueError as e:
+            raise ValueError(f'entry {position}: {e}' if len(entries) > 1 else str(e))
+    return rows
+
+
+def write_history_rows(rows: list):
+    """INSERT rows with a single executemany and commit them together."""
+    try:
+        db.session.execute(db.insert(SearchHistory), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+class _Ticket:
+    """Completion handle for entries submitted together."""
+    __slots__ = ('event', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = None
+
+    def wait(self, timeout: float = None) -> bool:
+        """True once the entries are committed; False on timeout or a failed flush."""
+        return self.event.wait(timeout) and self.error is None
+
+
+class SearchHistoryWriter:
+    """Queues search history rows and writes them with one executemany per flush.
+
+    A daemon thread flushes every `flush_interval_ms`, or sooner once
+    `batch_size` rows are waiting, so concurrent searches share one INSERT
+    and one COMMIT instead of queueing on SQLite's write lock. When more than
+    `max_queue` rows are waiting the submitting request flushes inline.
+    """
+
+    def __init__(self, app, flush_interval_ms: float = None, batch_size: int = None,
+                 max_queue: int = None, durability: str = None):
+        env = os.environ.get
+        self.app = app
+        self.flush_interval = float(flush_interval_ms if flush_interval_ms is not None
+                                    else env('SEARCH_HISTORY_FLUSH_MS', HISTORY_FLUSH_INTERVAL_MS)) / 1000
+        self.batch_size = int(batch_size if batch_size is not None
+                              else env('SEARCH_HISTORY_BATCH_SIZE', HISTORY_BATCH_SIZE))
+        self.max_queue = int(max_queue if max_queue is not None
+                             else env('SEARCH_HISTORY_MAX_QUEUE', HISTORY_MAX_QUEUE))
+        self.durability = durability or env('SEARCH_HISTORY_DURABILITY', 'ack')
+        if self.durability not in HISTORY_DURABILITY_MODES:
+            raise ValueError(f"SEARCH_HISTORY_DURABILITY must be one of {HISTORY_DURABILITY_MODES}")
+        self._pending = []  # [(row, ticket)]
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'submitted': 0, 'written': 0, 'flushes': 0, 'failed': 0, 'last_flush_ms': 0.0}
+
+    def submit(self, entries: list) -> _Ticket:
+        """Queue entry dicts (keys from HISTORY_COLUMNS) and return their ticket."""
+        ticket = _Ticket()
+        rows = history_rows(entries)
+        with self._cond:
+            self._pending.extend((row, ticket) for row in rows)
+            self._stats['submitted'] += len(rows)
+            backlog = len(self._pending)
+            if backlog >= self.batch_size:
+                self._cond.notify()
+        if backlog > self.max_queue or self._thread is None or not self._thread.is_alive():
+            self.flush()
+        return ticket
+
+    def flush(self) -> int:
+        """Write every queued row in one transaction; returns the number written.
+
+        If the batch fails, its rows are retried one at a time so a single bad
+        row doesn't drop entries other requests were already told were accepted.
+        """
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            errors = {}  # id(ticket) -> first error among its rows
+            failed = 0
+            with self.app.app_context():
+                try:
+                    write_history_rows([row for row, _ in batch])
+                except Exception as e:
+                    logger.warning('Search history batch of %d failed (%s); writing rows singly', len(batch), e)
+                    for row, ticket in batch:
+                        try:
+                            write_history_rows([row])
+                        except Exception as row_error:
+                            failed += 1
+                            errors.setdefault(id(ticket), row_error)
+                            logger.exception('Dropped search history row %r', row)
+            with self._cond:
+                self._stats['flushes'] += 1
+                self._stats['written'] += len(batch) - failed
+                self._stats['failed'] += failed
+                self._stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            for ticket in {id(t): t for _, t in batch}.values():
+                ticket.error = errors.get(id(ticket))
+                ticket.event.set()
+            return len(batch) - failed
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pending) >= self.batch_size or self._stop.is_set(),
+                                    timeout=self.flush_interval)
+            self.flush()
+
+    def start(self):
+        """Flush on a daemon thread; remaining rows are flushed at interpreter exit."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='search-history-writer',
+                                            daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self._stats, pending=len(self._pending))
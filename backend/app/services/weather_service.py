@@ -1,16 +1,138 @@
 """
 Weather Service - Handles OpenWeatherMap API integration and caching.
 """
+import logging
 import os
+import struct
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from app import db
-from app.models import WeatherCache
+from app.json_provider import dumps_bytes, loads_bytes
+from app.models import GeocodeCache, ReverseGeocodeCache, WeatherCache
+from app.utils import (
+    NearestPointIndex, PrefixIndex, SingleFlight, TTLCache, UpstreamClient,
+    neighbor_cells, normalize_query,
+)
+from app.utils.cache_backends import create_cache_backend
+from app.utils.compression import compress
+from app.utils.forecast_columns import ForecastColumns
+from app.utils.geo import bounding_box, haversine_km
+from app.utils.tracing import span
+from app.utils.units import CANONICAL_UNITS, CONVERTERS, convert_forecast, convert_weather
 
 OPENWEATHERMAP_BASE_URL = "https://api.openweathermap.org/data/2.5"
 GEOCODING_BASE_URL = "https://api.openweathermap.org/geo/1.0"
 CACHE_DURATION_MINUTES = 30
+MEMORY_CACHE_MAX_ENTRIES = 4096
+STALE_GRACE_MINUTES = 10
+REFRESH_WORKERS = 4
+HTTP_POOL_SIZE = 20
+HTTP_CONNECT_TIMEOUT = 3.05
+HTTP_READ_TIMEOUT = 10
+HTTP_MAX_RETRIES = 2
+BATCH_MAX_LOCATIONS = 50
+BATCH_CONCURRENCY = 8
+GEOCODE_CACHE_DAYS = 30
+GEOCODE_MEMORY_MAX_ENTRIES = 2048
+GEOCODE_UPSTREAM_LIMIT = 5  # OpenWeatherMap's maximum; slices serve smaller limits
+GEOCODE_INDEX_MAX_PLACES = 20000
+REVERSE_GEOCODE_RADIUS_KM = 1.0
+REVERSE_GEOCODE_INDEX_MAX_POINTS = 20000
+FORECAST_STORAGE_FORMATS = ('json', 'columnar')
+FORECAST_ROLLUPS = ('daily', 'hourly')
+ROLLUP_DAYS = 5
+ROLLUP_HOURLY_SLOTS = 8  # 24 hours of 3-hour slots
+
+# Upstream endpoint -> WeatherCache column holding its payload
+CACHE_FIELDS = {'weather': 'weather_data', 'forecast': 'forecast_data'}
+# ... and the column holding the same payload pre-serialized
+BODY_FIELDS = {'weather': 'weather_body', 'forecast': 'forecast_body'}
+GZIP_FIELDS = {'weather': 'weather_gzip', 'forecast': 'forecast_gzip'}
+# Dialects whose insert() supports ON CONFLICT ... DO UPDATE
+UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+# Batch request section name -> upstream endpoint
+BATCH_KINDS = {'current': 'weather', 'forecast': 'forecast'}
+
+logger = logging.getLogger(__name__)
+
+
+class CachedPayload:
+    """A canonical payload plus the cache metadata routes use for HTTP validators.
+
+    Holds the decoded dict, its serialized JSON bytes, or both; whichever is
+    missing is derived on first use. Cache hits read from a *_body column
+    carry only bytes, so responses that need no unit conversion are sent
+    without a decode/encode round trip, or as stored gzip bytes.
+    """
+    __slots__ = ('_data', '_body', '_encoded', 'version', 'fetched_at', 'expires_at')
+
+    def __init__(self, data: Optional[dict] = None, version: Optional[str] = None,
+                 fetched_at: Optional[datetime] = None, expires_at: Optional[datetime] = None,
+                 body: Optional[bytes] = None, gzip: Optional[bytes] = None):
+        self._data = data
+        self._body = body
+        self._encoded = {'gzip': gzip} if gzip else {}
+        self.version = version  # None for mock and error-fallback payloads
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+
+    @property
+    def data(self) -> dict:
+        if self._data is None and self._body is not None:
+            self._data = loads_bytes(self._body)
+        return self._data
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            self._body = dumps_bytes(self._data)
+        return self._body
+
+    def encoded(self, encoding: str) -> bytes:
+        """`body` compressed with a content coding, computed at most once per entry."""
+        encoded = self._encoded.get(encoding)
+        if encoded is None:
+            encoded = self._encoded[encoding] = compress(self.body, encoding)
+        return encoded
+
+    def with_data(self, data: dict) -> 'CachedPayload':
+        """Same metadata, different payload."""
+        return CachedPayload(data, self.version, self.fetched_at, self.expires_at)
+
+    def max_age(self) -> int:
+        """Whole seconds until the payload expires (0 once stale)."""
+        if self.expires_at is None:
+            return 0
+        return max(0, int((self.expires_at - datetime.now(timezone.utc)).total_seconds()))
+
+    _PACKED = struct.Struct('<4sddHII')  # magic, fetched_at, expires_at, version/body/gzip lengths
+
+    def to_bytes(self) -> bytes:
+        """Serialize for a shared cache backend: metadata, JSON body and gzip body if known."""
+        version = self.version.encode()
+        gzipped = self._encoded.get('gzip') or b''
+        return b''.join((self._PACKED.pack(b'WCP1', self.fetched_at.timestamp(), self.expires_at.timestamp(),
+                                           len(version), len(self.body), len(gzipped)),
+                         version, self.body, gzipped))
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'CachedPayload':
+        magic, fetched_at, expires_at, version_len, body_len, gzip_len = cls._PACKED.unpack_from(blob)
+        if magic != b'WCP1':
+            raise ValueError('not a packed cache entry')
+        offset = cls._PACKED.size
+        version = blob[offset:offset + version_len].decode()
+        offset += version_len
+        body = blob[offset:offset + body_len]
+        gzipped = blob[offset + body_len:offset + body_len + gzip_len] or None
+        return cls(None, version, datetime.fromtimestamp(fetched_at, timezone.utc),
+                   datetime.fromtimestamp(expires_at, timezone.utc), body=body, gzip=gzipped)
 
 
 class WeatherService:
@@ -18,150 +140,681 @@ class WeatherService:
 
     def __init__(self):
         self.api_key = os.environ.get('OPENWEATHERMAP_API_KEY', '')
+        self.base_url = os.environ.get('OPENWEATHERMAP_BASE_URL', OPENWEATHERMAP_BASE_URL)
+        self.geocoding_url = os.environ.get('OPENWEATHERMAP_GEOCODING_URL', GEOCODING_BASE_URL)
+        # One keep-alive session shared by every request thread.
+        self.http = UpstreamClient(
+            pool_size=int(os.environ.get('WEATHER_HTTP_POOL_SIZE', HTTP_POOL_SIZE)),
+            connect_timeout=float(os.environ.get('WEATHER_HTTP_CONNECT_TIMEOUT', HTTP_CONNECT_TIMEOUT)),
+            read_timeout=float(os.environ.get('WEATHER_HTTP_READ_TIMEOUT', HTTP_READ_TIMEOUT)),
+            max_retries=int(os.environ.get('WEATHER_HTTP_MAX_RETRIES', HTTP_MAX_RETRIES)),
+        )
+        # In-process tier in front of the weather_cache table. Entries never
+        # outlive the database row they were read from.
+        self.memory_cache = TTLCache(
+            maxsize=int(os.environ.get('WEATHER_MEMORY_CACHE_SIZE', MEMORY_CACHE_MAX_ENTRIES)),
+            ttl=float(os.environ.get('WEATHER_MEMORY_CACHE_TTL', CACHE_DURATION_MINUTES * 60)),
+        )
+        # Optional tier shared by every worker (see app.utils.cache_backends)
+        self.cache_backend = create_cache_backend()
+        self.inflight = SingleFlight()
+        # Coalescing groups exported on /api/metrics by serving mode;
+        # AsyncWeatherService adds its own as 'async'.
+        self.flight_groups = {'sync': self.inflight}
+        # Stale-while-revalidate: rows up to this far past expires_at are served
+        # immediately while a background worker refreshes them.
+        self.stale_grace_seconds = 60 * float(
+            os.environ.get('WEATHER_STALE_GRACE_MINUTES', STALE_GRACE_MINUTES))
+        self.refresh_workers = int(os.environ.get('WEATHER_REFRESH_WORKERS', REFRESH_WORKERS))
+        self.batch_concurrency = int(os.environ.get('WEATHER_BATCH_CONCURRENCY', BATCH_CONCURRENCY))
+        # 'columnar' stores forecasts as packed arrays (WeatherCache.forecast_packed).
+        self.forecast_storage = os.environ.get('WEATHER_FORECAST_STORAGE', 'json')
+        if self.forecast_storage not in FORECAST_STORAGE_FORMATS:
+            raise ValueError(f"WEATHER_FORECAST_STORAGE must be one of {FORECAST_STORAGE_FORMATS}")
+        self._refresh_executor = None
+        self._pending_refreshes = set()
+        self._lock = threading.Lock()
+        self._counters = {'stale_served': 0, 'stale_on_error': 0,
+                          'refreshes_scheduled': 0, 'refresh_errors': 0, 'cache_write_errors': 0,
+                          'geocode_hits': 0, 'geocode_prefix_hits': 0, 'geocode_misses': 0,
+                          'reverse_geocode_hits': 0, 'reverse_geocode_misses': 0}
+        # Geocoding: exact normalized queries are cached in memory and in the
+        # geocode_cache table; places returned upstream feed a prefix index so
+        # autocomplete for partial names never leaves the process.
+        self.geocode_days = float(os.environ.get('GEOCODE_CACHE_DAYS', GEOCODE_CACHE_DAYS))
+        self.geocode_memory = TTLCache(
+            maxsize=int(os.environ.get('GEOCODE_MEMORY_CACHE_SIZE', GEOCODE_MEMORY_MAX_ENTRIES)),
+            ttl=self.geocode_days * 86400,
+        )
+        self.geocode_index = PrefixIndex(
+            int(os.environ.get('GEOCODE_INDEX_MAX_PLACES', GEOCODE_INDEX_MAX_PLACES)))
+        self._geocode_index_loaded = False
+        # Reverse geocoding: any previously resolved point within the radius
+        # answers for nearby GPS fixes.
+        self.reverse_geocode_index = NearestPointIndex(
+            float(os.environ.get('REVERSE_GEOCODE_RADIUS_KM', REVERSE_GEOCODE_RADIUS_KM)),
+            int(os.environ.get('REVERSE_GEOCODE_INDEX_MAX_POINTS', REVERSE_GEOCODE_INDEX_MAX_POINTS)))
 
     def get_current_weather(self, lat: float, lon: float, units: str = 'metric') -> dict:
         """Get current weather for coordinates, with caching."""
-        # Check cache first
-        cached = self._get_cached_weather(lat, lon)
-        if cached and cached.weather_data:
-            return cached.weather_data
+        entry = self.get_weather_entry('weather', lat, lon)
+        with span('convert'):
+            return convert_weather(entry.data, units)
 
-        # Fetch from API
+    def get_forecast(self, lat: float, lon: float, units: str = 'metric') -> dict:
+        """Get 5-day/3-hour forecast for coordinates."""
+        entry = self.get_weather_entry('forecast', lat, lon)
+        with span('convert'):
+            return convert_forecast(entry.data, units)
+
+    def get_forecast_rollup(self, view: str, lat: float, lon: float) -> CachedPayload:
+        """Canonical 'daily' or 'hourly' rollup of the forecast for a point.
+
+        Rollups sit in the memory tier next to the forecast they were computed
+        from and share its version, so they are recomputed only when the
+        forecast row is rewritten.
+        """
+        forecast = self.get_weather_entry('forecast', lat, lon)
+        key = self._memory_key(view, lat, lon)
+        if forecast.version:
+            cached = self.memory_cache.get(key)
+            if cached is not None and cached.version == forecast.version:
+                return cached
+        rollup = forecast.with_data(self._rollup(view, forecast.data))
+        if forecast.version:
+            self.memory_cache.set(key, rollup, forecast.max_age())
+        return rollup
+
+    @classmethod
+    def _rollup(cls, view: str, data: dict) -> dict:
+        if 'fallback' in data:
+            return dict(data, fallback=cls._rollup(view, data['fallback']))
+        columns = ForecastColumns.from_payload(data)
+        items = columns.daily(ROLLUP_DAYS) if view == 'daily' else columns.hourly(ROLLUP_HOURLY_SLOTS)
+        rollup = {'city': data.get('city'), 'list': items}
+        if data.get('_mock'):
+            rollup['_mock'] = True
+        return rollup
+
+    def get_weather_entry(self, kind: str, lat: float, lon: float) -> CachedPayload:
+        """Serve canonical (metric) `kind` ('weather' or 'forecast') from memory, the database or upstream."""
+        entry, stale = self.lookup_cached(kind, lat, lon)
+        if entry is not None:
+            return entry
+        return self._from_upstream(kind, lat, lon, stale)
+
+    def lookup_cached(self, kind: str, lat: float, lon: float) -> tuple:
+        """Check both cache tiers without going upstream.
+
+        Returns (entry, None) when a fresh or grace-window entry can be served,
+        otherwise (None, stale) where stale is an expired entry to fall back on
+        if the upstream fetch fails, or None.
+        """
+        with span('cache.memory'):
+            entry = self.memory_cache.get(self._memory_key(kind, lat, lon))
+        if entry is None:
+            entry = self._shared_get(kind, lat, lon)
+        if entry is not None:
+            return entry, None
+
+        with span('cache.db'):
+            cached = self._get_cached_weather(lat, lon, include_stale=True)
+        entry = self._from_cache(kind, lat, lon, cached)
+        if entry is not None:
+            return entry, None
+        stale = self._payload(kind, cached) if cached and cached.has_payload(CACHE_FIELDS[kind]) else None
+        return None, stale
+
+    def _from_cache(self, kind: str, lat: float, lon: float,
+                    cached: Optional[WeatherCache]) -> Optional[CachedPayload]:
+        """Payload from a cache row if it is fresh, or stale but within the grace window."""
+        if not cached or not cached.has_payload(CACHE_FIELDS[kind]):
+            return None
+        ttl = cached.seconds_until_expiry()
+        if ttl > 0:
+            entry = self._payload(kind, cached)
+            self._remember(kind, lat, lon, entry, ttl)
+            return entry
+        if self.api_key and -ttl <= self.stale_grace_seconds:
+            self._schedule_refresh(kind, lat, lon)
+            self.count('stale_served')
+            return self._payload(kind, cached)
+        return None
+
+    @staticmethod
+    def _payload(kind: str, cached: WeatherCache) -> CachedPayload:
+        field = CACHE_FIELDS[kind]
+        body = cached.payload_body(field)
+        return CachedPayload(None if body else cached.payload(field), cached.version(),
+                             cached.fetched_at_utc(), cached.expires_at_utc(),
+                             body=body, gzip=cached.payload_gzip(field) if body else None)
+
+    def _from_upstream(self, kind: str, lat: float, lon: float,
+                       stale: Optional[CachedPayload] = None) -> CachedPayload:
+        """Fetch from the API, falling back to stale data and then to mock data."""
         if not self.api_key:
-            return self._get_mock_weather(lat, lon)
+            return CachedPayload(self._get_mock(kind, lat, lon))
 
         try:
-            response = requests.get(
-                f"{OPENWEATHERMAP_BASE_URL}/weather",
-                params={
-                    'lat': lat,
-                    'lon': lon,
-                    'appid': self.api_key,
-                    'units': units,
-                },
-                timeout=10,
-            )
-            response.raise_for_status()
-            data = response.json()
+            # Concurrent misses for the same cell share one upstream request.
+            return self.refresh(kind, lat, lon)
+        except requests.RequestException as e:
+            if stale:
+                self.count('stale_on_error')
+                return stale
+            return CachedPayload({'error': str(e), 'fallback': self._get_mock(kind, lat, lon)})
 
-            # Cache the result
-            self._cache_weather(lat, lon, weather_data=data)
-            return data
+    def get_weather_batch(self, locations: list, include: tuple = ('current',)) -> list:
+        """Resolve many locations at once, returning results in request order."""
+        results = [None] * len(locations)
+        for index, result in self.iter_weather_batch(locations, include):
+            results[index] = result
+        return results
 
-        except requests.RequestException as e:
-            return {'error': str(e), 'fallback': self._get_mock_weather(lat, lon)}
+    def iter_weather_batch(self, locations: list, include: tuple = ('current',)):
+        """Yield (index, result) for each location as soon as it is resolved.
 
-    def get_forecast(self, lat: float, lon: float, units: str = 'metric') -> dict:
-        """Get 5-day/3-hour forecast for coordinates."""
-        cached = self._get_cached_weather(lat, lon)
-        if cached and cached.forecast_data:
-            return cached.forecast_data
+        Cache rows for every location are loaded with a single query, and those
+        results are yielded first; misses are then fetched upstream concurrently,
+        at most `batch_concurrency` at a time, and yielded as they complete.
+        """
+        kinds = [BATCH_KINDS[name] for name in include]
+        results = [{'lat': loc['lat'], 'lon': loc['lon'], 'units': loc.get('units', 'metric')}
+                   for loc in locations]
 
-        if not self.api_key:
-            return self._get_mock_forecast(lat, lon)
+        pending = []
+        for result in results:
+            for name, kind in zip(include, kinds):
+                lat, lon = result['lat'], result['lon']
+                entry = self.memory_cache.get(self._memory_key(kind, lat, lon)) or self._shared_get(kind, lat, lon)
+                if entry is None:
+                    pending.append((result, name, kind))
+                else:
+                    result[name] = CONVERTERS[kind](entry.data, result['units'])
+
+        rows = self.cached_weather_many([(r['lat'], r['lon']) for r, _, _ in pending])
+        misses = {}
+        for result, name, kind in pending:
+            lat, lon = result['lat'], result['lon']
+            cached = rows.get((lat, lon))
+            entry = self._from_cache(kind, lat, lon, cached)
+            if entry is not None:
+                result[name] = CONVERTERS[kind](entry.data, result['units'])
+                continue
+            # Requests for the same cell share one fetch, whatever their units.
+            stale = self._payload(kind, cached) if cached and cached.has_payload(CACHE_FIELDS[kind]) else None
+            flight_key = (kind, WeatherCache.cell_for(lat, lon))
+            misses.setdefault(flight_key, (kind, lat, lon, stale, []))[-1].append((result, name))
+
+        outstanding = {}
+        for _, _, _, _, targets in misses.values():
+            for result, _ in targets:
+                outstanding[id(result)] = outstanding.get(id(result), 0) + 1
+        for index, result in enumerate(results):
+            if id(result) not in outstanding:
+                yield index, result
+        if not misses:
+            return
+
+        positions = {id(result): index for index, result in enumerate(results)}
+        app = current_app._get_current_object()
+        workers = min(self.batch_concurrency, len(misses))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='weather-batch') as pool:
+            futures = {
+                pool.submit(self._from_upstream_in_context, app, kind, lat, lon, stale): (kind, targets)
+                for kind, lat, lon, stale, targets in misses.values()
+            }
+            for future in as_completed(futures):
+                data = future.result().data
+                kind, targets = futures[future]
+                for result, name in targets:
+                    result[name] = CONVERTERS[kind](data, result['units'])
+                    outstanding[id(result)] -= 1
+                    if not outstanding[id(result)]:
+                        yield positions[id(result)], result
 
+    def _from_upstream_in_context(self, app, *args) -> CachedPayload:
+        with app.app_context():
+            return self._from_upstream(*args)
+
+    def _schedule_refresh(self, kind: str, lat: float, lon: float):
+        """Refresh an expired cache row on the background pool, at most once at a time."""
+        flight_key = (kind, WeatherCache.cell_for(lat, lon))
+        with self._lock:
+            if flight_key in self._pending_refreshes or self.inflight.in_flight(flight_key):
+                return
+            self._pending_refreshes.add(flight_key)
+            self._counters['refreshes_scheduled'] += 1
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(
+                    max_workers=self.refresh_workers, thread_name_prefix='weather-refresh')
+            executor = self._refresh_executor
+        app = current_app._get_current_object()
+        executor.submit(self._refresh, app, flight_key, kind, lat, lon)
+
+    def refresh(self, kind: str, lat: float, lon: float) -> CachedPayload:
+        """Fetch canonical `kind` from upstream and rewrite its cache entry, ignoring freshness.
+
+        Concurrent calls for the same cell share one request. Raises
+        requests.RequestException on upstream failure.
+        """
+        flight_key = (kind, WeatherCache.cell_for(lat, lon))
+        return self.inflight.do(flight_key, self._fetch_and_cache, kind, lat, lon)
+
+    def _refresh(self, app, flight_key: tuple, kind: str, lat: float, lon: float):
         try:
-            response = requests.get(
-                f"{OPENWEATHERMAP_BASE_URL}/forecast",
+            with app.app_context():
+                self.refresh(kind, lat, lon)
+        except Exception as e:
+            self.count('refresh_errors')
+            logger.warning('Background refresh of %s failed: %s', flight_key, e)
+        finally:
+            with self._lock:
+                self._pending_refreshes.discard(flight_key)
+
+    def count(self, name: str):
+        """Increment one of the counters reported by cache_stats()."""
+        with self._lock:
+            self._counters[name] += 1
+
+    def _fetch_and_cache(self, kind: str, lat: float, lon: float) -> CachedPayload:
+        with span('upstream'):
+            response = self.http.get(
+                f"{self.base_url}/{kind}",
                 params={
                     'lat': lat,
                     'lon': lon,
                     'appid': self.api_key,
-                    'units': units,
+                    'units': CANONICAL_UNITS,
                 },
-                timeout=10,
+                label=kind,
             )
-            response.raise_for_status()
+        response.raise_for_status()
+        with span('upstream.decode'):
             data = response.json()
+        return self.cache_payload(kind, lat, lon, data)
+
+    def cache_payload(self, kind: str, lat: float, lon: float, data: dict) -> CachedPayload:
+        """Write a freshly fetched canonical payload to the database and memory tiers."""
+        fetched_at = datetime.now(timezone.utc)
+        expires_at = fetched_at + timedelta(minutes=CACHE_DURATION_MINUTES)
+        with span('encode'):
+            if kind == 'forecast' and self.forecast_storage == 'columnar':
+                columns = ForecastColumns.from_payload(data)
+                # Serve what a later database read would return.
+                data = columns.to_payload()
+                body = gzipped = None
+                fields = {'forecast_packed': columns.pack()}
+            else:
+                # The body is the stored form; the JSON column is left empty.
+                body = dumps_bytes(data)
+                gzipped = compress(body, 'gzip')
+                fields = {BODY_FIELDS[kind]: body, GZIP_FIELDS[kind]: gzipped}
+        with span('cache.write'):
+            version = self._cache_weather(lat, lon, fetched_at=fetched_at, **fields)
+        entry = CachedPayload(data, version, fetched_at, expires_at, body=body, gzip=gzipped)
+        self._remember(kind, lat, lon, entry, CACHE_DURATION_MINUTES * 60)
+        return entry
+
+    def _shared_get(self, kind: str, lat: float, lon: float) -> Optional[CachedPayload]:
+        """Fresh entry from the shared cache backend, copied into the memory tier."""
+        key = self._memory_key(kind, lat, lon)
+        with span('cache.shared'):
+            blob = self.cache_backend.get('%s:%s' % key)
+        if blob is None:
+            return None
+        try:
+            entry = CachedPayload.from_bytes(blob)
+        except (ValueError, struct.error):
+            return None
+        ttl = entry.max_age()
+        if ttl <= 0:
+            return None
+        self.memory_cache.set(key, entry, ttl)
+        return entry
 
-            self._cache_weather(lat, lon, forecast_data=data)
-            return data
+    def _remember(self, kind: str, lat: float, lon: float, entry: CachedPayload, ttl: float):
+        """Put a fresh entry in the memory tier and, once it has a database version, the shared one."""
+        key = self._memory_key(kind, lat, lon)
+        self.memory_cache.set(key, entry, ttl)
+        if entry.version is not None:
+            self.cache_backend.set('%s:%s' % key, entry.to_bytes(), ttl)
 
-        except requests.RequestException as e:
-            return {'error': str(e), 'fallback': self._get_mock_forecast(lat, lon)}
+    def evict_cell(self, cell: str):
+        """Drop every cached entry for a grid cell whose cache row was deleted."""
+        for kind in CACHE_FIELDS:
+            self.memory_cache.delete((kind, cell))
+            self.cache_backend.delete(f'{kind}:{cell}')
+        for view in FORECAST_ROLLUPS:
+            self.memory_cache.delete((view, cell))
 
     def geocode(self, query: str, limit: int = 5) -> list:
-        """Geocode a city name to coordinates."""
+        """Geocode a city name to coordinates.
+
+        Tries, in order: the exact normalized query (memory, then database),
+        the prefix index of places upstream has returned, and finally the
+        upstream API. The index only answers partial names (autocomplete):
+        once the query is a complete known name, upstream decides the results.
+        """
         if not self.api_key:
             return self._get_mock_geocode(query)
 
+        key = normalize_query(query)
+        cached = self._get_cached_geocode(key)
+        if cached is not None:
+            self.count('geocode_hits')
+            return cached[:limit]
+
+        self._load_geocode_index()
+        local = self.geocode_index.search(key, limit)
+        # Shortest names come first, so an exact match would be local[0]
+        if local and normalize_query(local[0]['name']) != key:
+            self.count('geocode_prefix_hits')
+            return local
+
+        self.count('geocode_misses')
         try:
-            response = requests.get(
-                f"{GEOCODING_BASE_URL}/direct",
-                params={
-                    'q': query,
-                    'limit': limit,
-                    'appid': self.api_key,
-                },
-                timeout=10,
-            )
-            response.raise_for_status()
-            return response.json()
+            return self.inflight.do(('geocode', key), self._fetch_geocode, query, key)[:limit]
         except requests.RequestException:
             return self._get_mock_geocode(query)
 
+    def _fetch_geocode(self, query: str, key: str) -> list:
+        response = self.http.get(
+            f"{self.geocoding_url}/direct",
+            params={
+                'q': query,
+                'limit': GEOCODE_UPSTREAM_LIMIT,
+                'appid': self.api_key,
+            },
+            label='geocode',
+        )
+        response.raise_for_status()
+        results = response.json()
+        self._cache_geocode(key, results)
+        self.geocode_index.add_many(results)
+        return results
+
+    def _get_cached_geocode(self, key: str) -> Optional[list]:
+        results = self.geocode_memory.get(key)
+        if results is not None:
+            return results
+        row = GeocodeCache.query.filter_by(query_key=key).first()
+        if row is None or row.is_expired():
+            return None
+        self.geocode_memory.set(key, row.results)
+        return row.results
+
+    def _cache_geocode(self, key: str, results: list):
+        """Upsert the geocode_cache row for a normalized query."""
+        fetched_at = datetime.now(timezone.utc)
+        expires_at = fetched_at + timedelta(days=self.geocode_days)
+        self.geocode_memory.set(key, results)
+        try:
+            with db.session().using_primary():
+                row = GeocodeCache.query.filter_by(query_key=key).first()
+            if row:
+                row.results = results
+                row.fetched_at = fetched_at
+                row.expires_at = expires_at
+            else:
+                db.session.add(GeocodeCache(query_key=key, results=results,
+                                            fetched_at=fetched_at, expires_at=expires_at))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+    def _load_geocode_index(self):
+        """Seed the prefix index from cached upstream results, once per process."""
+        with self._lock:
+            if self._geocode_index_loaded:
+                return
+            self._geocode_index_loaded = True
+        now = datetime.now(timezone.utc)
+        for (results,) in db.session.query(GeocodeCache.results).filter(GeocodeCache.expires_at > now):
+            self.geocode_index.add_many(results or [])
+
     def reverse_geocode(self, lat: float, lon: float) -> list:
-        """Reverse geocode coordinates to a location name."""
+        """Reverse geocode coordinates to a location name.
+
+        A point already resolved within reverse_geocode_index.radius_km is
+        answered from memory or the reverse_geocode_cache table.
+        """
         if not self.api_key:
             return [{'name': 'Unknown', 'lat': lat, 'lon': lon}]
 
+        cached = self._get_cached_reverse_geocode(lat, lon)
+        if cached is not None:
+            self.count('reverse_geocode_hits')
+            return cached
+
+        self.count('reverse_geocode_misses')
         try:
-            response = requests.get(
-                f"{GEOCODING_BASE_URL}/reverse",
-                params={
-                    'lat': lat,
-                    'lon': lon,
-                    'limit': 1,
-                    'appid': self.api_key,
-                },
-                timeout=10,
-            )
-            response.raise_for_status()
-            return response.json()
+            flight_key = ('reverse_geocode', WeatherCache.cell_for(lat, lon))
+            return self.inflight.do(flight_key, self._fetch_reverse_geocode, lat, lon)
         except requests.RequestException:
             return [{'name': 'Unknown', 'lat': lat, 'lon': lon}]
 
-    def _get_cached_weather(self, lat: float, lon: float) -> Optional[WeatherCache]:
-        """Retrieve cached weather if not expired."""
-        tolerance = 0.01  # ~1km tolerance
-        cached = WeatherCache.query.filter(
-            WeatherCache.latitude.between(lat - tolerance, lat + tolerance),
-            WeatherCache.longitude.between(lon - tolerance, lon + tolerance),
-            WeatherCache.expires_at > datetime.now(timezone.utc)
-        ).first()
-        return cached
-
-    def _cache_weather(self, lat: float, lon: float,
-                       weather_data: dict = None, forecast_data: dict = None):
-        """Store weather data in cache."""
+    def _fetch_reverse_geocode(self, lat: float, lon: float) -> list:
+        response = self.http.get(
+            f"{self.geocoding_url}/reverse",
+            params={
+                'lat': lat,
+                'lon': lon,
+                'limit': 1,
+                'appid': self.api_key,
+            },
+            label='reverse_geocode',
+        )
+        response.raise_for_status()
+        results = response.json()
+        self._cache_reverse_geocode(lat, lon, results)
+        return results
+
+    def _get_cached_reverse_geocode(self, lat: float, lon: float) -> Optional[list]:
+        """Results for the nearest resolved point within the radius: memory first, then database."""
+        now = datetime.now(timezone.utc)
+        index = self.reverse_geocode_index
+        hit = index.nearest(lat, lon, accept=lambda value: value[1] > now)
+        if hit is not None:
+            return hit[0][0]
+
+        # Rows written by other processes (or before a restart) within the radius.
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, index.radius_km)
+        rows = ReverseGeocodeCache.query.filter(
+            ReverseGeocodeCache.latitude.between(min_lat, max_lat),
+            ReverseGeocodeCache.longitude.between(min_lon, max_lon),
+            ReverseGeocodeCache.expires_at > now,
+        ).all()
+        best, best_distance = None, index.radius_km
+        for row in rows:
+            distance = haversine_km(lat, lon, row.latitude, row.longitude)
+            if distance <= best_distance:
+                best, best_distance = row, distance
+        if best is None:
+            return None
+        index.add(best.latitude, best.longitude, (best.results, best.expires_at_utc()))
+        return best.results
+
+    def _cache_reverse_geocode(self, lat: float, lon: float, results: list):
+        """Upsert the reverse_geocode_cache row for the point's radius-sized cell."""
+        fetched_at = datetime.now(timezone.utc)
+        expires_at = fetched_at + timedelta(days=self.geocode_days)
+        self.reverse_geocode_index.add(lat, lon, (results, expires_at))
+        row = {'cell_key': self.reverse_geocode_index.cell(lat, lon), 'latitude': lat, 'longitude': lon,
+               'results': results, 'fetched_at': fetched_at, 'expires_at': expires_at}
         try:
-            tolerance = 0.01
-            existing = WeatherCache.query.filter(
-                WeatherCache.latitude.between(lat - tolerance, lat + tolerance),
-                WeatherCache.longitude.between(lon - tolerance, lon + tolerance),
-            ).first()
-
-            if existing:
-                if weather_data:
-                    existing.weather_data = weather_data
-                if forecast_data:
-                    existing.forecast_data = forecast_data
-                existing.fetched_at = datetime.now(timezone.utc)
-                existing.expires_at = datetime.now(timezone.utc) + timedelta(minutes=CACHE_DURATION_MINUTES)
+            insert = UPSERT_DIALECTS.get(db.engine.dialect.name)
+            if insert is not None:
+                stmt = insert(ReverseGeocodeCache).values(**row)
+                db.session.execute(stmt.on_conflict_do_update(
+                    index_elements=['cell_key'],
+                    set_={column: stmt.excluded[column] for column in row if column != 'cell_key'},
+                ))
             else:
-                cache_entry = WeatherCache(
-                    latitude=lat,
-                    longitude=lon,
-                    weather_data=weather_data or {},
-                    forecast_data=forecast_data,
-                    expires_at=datetime.now(timezone.utc) + timedelta(minutes=CACHE_DURATION_MINUTES),
-                )
-                db.session.add(cache_entry)
-
+                with db.session().using_primary():
+                    existing = ReverseGeocodeCache.query.filter_by(cell_key=row['cell_key']).first()
+                if existing:
+                    for column, value in row.items():
+                        setattr(existing, column, value)
+                else:
+                    db.session.add(ReverseGeocodeCache(**row))
             db.session.commit()
         except Exception:
             db.session.rollback()
 
+    def cache_stats(self) -> dict:
+        """Hit/miss/eviction counters for the in-memory tier, plus stale serving."""
+        stats = self.memory_cache.stats()
+        stats.update(self.event_counts())
+        with self._lock:
+            stats['refreshes_pending'] = len(self._pending_refreshes)
+        stats['geocode_index_size'] = len(self.geocode_index)
+        stats['reverse_geocode_points'] = len(self.reverse_geocode_index)
+        stats['backend'] = self.cache_backend.stats()
+        return stats
+
+    def event_counts(self) -> dict:
+        """Snapshot of the counters incremented by count()."""
+        with self._lock:
+            return dict(self._counters)
+
+    def upstream_stats(self) -> dict:
+        """Upstream fetches made and saved by request coalescing.
+
+        Upstream latency is in the weather_upstream_request_duration_seconds
+        histogram on /api/metrics.
+        """
+        return self.inflight.stats()
+
+    @staticmethod
+    def _memory_key(kind: str, lat: float, lon: float) -> tuple:
+        """Key for the in-memory tier: the grid cell holding the point."""
+        return kind, WeatherCache.cell_for(lat, lon)
+
+    def _get_cached_weather(self, lat: float, lon: float,
+                            include_stale: bool = False) -> Optional[WeatherCache]:
+        """Retrieve the nearest unexpired cache row within ~1km.
+
+        Probes the indexed cell_key for the point's grid cell and its eight
+        neighbours instead of range-scanning latitude/longitude. With
+        include_stale, an expired row is returned when no fresh one is near.
+        """
+        tolerance = 0.01  # ~1km tolerance
+        now = datetime.now(timezone.utc)
+        query = WeatherCache.query.filter(WeatherCache.cell_key.in_(neighbor_cells(lat, lon)))
+        if not include_stale:
+            return self._nearest(query.filter(WeatherCache.expires_at > now).all(),
+                                 lat, lon, tolerance)
+
+        return self._pick(query.all(), lat, lon)
+
+    def cached_weather_many(self, points: list) -> dict:
+        """Cache rows (fresh preferred, else stale) for many points in one query, keyed by (lat, lon)."""
+        cells = {cell for lat, lon in points for cell in neighbor_cells(lat, lon)}
+        if not cells:
+            return {}
+        by_cell = {entry.cell_key: entry for entry in
+                   WeatherCache.query.filter(WeatherCache.cell_key.in_(cells)).all()}
+        found = {}
+        for lat, lon in points:
+            candidates = [by_cell[c] for c in neighbor_cells(lat, lon) if c in by_cell]
+            entry = self._pick(candidates, lat, lon)
+            if entry is not None:
+                found[(lat, lon)] = entry
+        return found
+
+    def _pick(self, candidates: list, lat: float, lon: float) -> Optional[WeatherCache]:
+        """Nearest fresh row within tolerance, else the nearest expired one."""
+        tolerance = 0.01
+        fresh = [entry for entry in candidates if not entry.is_expired()]
+        return (self._nearest(fresh, lat, lon, tolerance)
+                or self._nearest(candidates, lat, lon, tolerance))
+
+    @staticmethod
+    def _nearest(candidates: list, lat: float, lon: float,
+                 tolerance: float) -> Optional[WeatherCache]:
+        best, best_distance = None, None
+        for entry in candidates:
+            dlat, dlon = abs(entry.latitude - lat), abs(entry.longitude - lon)
+            if dlat > tolerance or dlon > tolerance:
+                continue
+            distance = dlat * dlat + dlon * dlon
+            if best is None or distance < best_distance:
+                best, best_distance = entry, distance
+        return best
+
+    def _cache_weather(self, lat: float, lon: float, weather_data: dict = None,
+                       forecast_data: dict = None, fetched_at: datetime = None,
+                       forecast_packed: bytes = None, weather_body: bytes = None,
+                       forecast_body: bytes = None, weather_gzip: bytes = None,
+                       forecast_gzip: bytes = None) -> Optional[str]:
+        """Store weather data in cache, upserting the row for the point's grid cell.
+
+        Returns the row's new version, or None if the write failed.
+        """
+        fetched_at = fetched_at or datetime.now(timezone.utc)
+        cell = WeatherCache.cell_for(lat, lon)
+        row = {
+            'latitude': lat, 'longitude': lon, 'cell_key': cell,
+            # {} rather than NULL: weather_data is NOT NULL in existing databases
+            'weather_data': weather_data or {}, 'weather_body': weather_body, 'weather_gzip': weather_gzip,
+            'forecast_data': forecast_data, 'forecast_packed': forecast_packed,
+            'forecast_body': forecast_body, 'forecast_gzip': forecast_gzip,
+            'fetched_at': fetched_at,
+            'expires_at': fetched_at + timedelta(minutes=CACHE_DURATION_MINUTES),
+        }
+        # Columns a rewrite of an existing row replaces: whichever payload was fetched.
+        changed = ['fetched_at', 'expires_at']
+        if weather_data or weather_body:
+            changed += ['weather_data', 'weather_body', 'weather_gzip']
+        if forecast_data or forecast_packed or forecast_body:
+            changed += ['forecast_data', 'forecast_packed', 'forecast_body', 'forecast_gzip']
+        try:
+            insert = UPSERT_DIALECTS.get(db.engine.dialect.name)
+            if insert is not None:
+                # One statement, so concurrent first writes for a cell can't collide.
+                stmt = insert(WeatherCache).values(**row)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['cell_key'], set_={column: stmt.excluded[column] for column in changed},
+                ).returning(WeatherCache.id)
+                row_id = db.session.execute(stmt).scalar_one()
+            else:
+                row_id = self._write_cache_row(cell, row, changed)
+            db.session.commit()
+            return WeatherCache.make_version(row_id, fetched_at)
+        except Exception as e:
+            # e.g. "database is locked" under concurrent writers; the response
+            # is still served from the fetched payload.
+            db.session.rollback()
+            self.count('cache_write_errors')
+            logger.warning('Caching weather for (%s, %s) failed: %s', lat, lon, e)
+            return None
+
+    @staticmethod
+    def _write_cache_row(cell: str, row: dict, changed: list) -> int:
+        """Read-then-write upsert for dialects without ON CONFLICT; a lost insert race is retried as an update."""
+        for attempt in range(2):
+            with db.session().using_primary():
+                entry = WeatherCache.query.filter_by(cell_key=cell).first()
+            if entry is None:
+                entry = WeatherCache(**row)
+                db.session.add(entry)
+            else:
+                for column in changed:
+                    setattr(entry, column, row[column])
+            try:
+                db.session.flush()
+                return entry.id
+            except IntegrityError:
+                db.session.rollback()
+                if attempt:
+                    raise
+
+    def _get_mock(self, kind: str, lat: float, lon: float) -> dict:
+        if kind == 'forecast':
+            return self._get_mock_forecast(lat, lon)
+        return self._get_mock_weather(lat, lon)
+
     @staticmethod
     def _get_mock_weather(lat: float, lon: float) -> dict:
         """Return mock weather data for development/demo."""
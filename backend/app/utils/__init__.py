@@ -0,0 +1,12 @@
+from app.utils.memory_cache import TTLCache
+from app.utils.singleflight import AsyncSingleFlight, SingleFlight
+from app.utils.geo import NearestPointIndex, grid_cell, haversine_km, neighbor_cells
+from app.utils.http_client import UpstreamClient
+from app.utils.rate_limit import TokenBucket
+from app.utils.prefix_index import PrefixIndex, normalize_query
+
+__all__ = [
+    'TTLCache', 'SingleFlight', 'AsyncSingleFlight', 'UpstreamClient', 'TokenBucket',
+    'PrefixIndex', 'NearestPointIndex', 'grid_cell', 'haversine_km', 'neighbor_cells',
+    'normalize_query',
+]
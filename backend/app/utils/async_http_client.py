@@ -0,0 +1,79 @@
+"""
+Non-blocking counterpart of UpstreamClient, used by the ASGI serving path.
+
+Requires httpx; only imported when the app is served through app.asgi.
+"""
+import asyncio
+import random
+import time
+
+import httpx
+
+from app.utils.http_client import RETRY_STATUSES
+from app.utils.metrics import UPSTREAM_REQUEST_SECONDS
+
+
+class AsyncUpstreamClient:
+    """Shared httpx.AsyncClient with keep-alive pooling and jittered retries.
+
+    Mirrors UpstreamClient: retryable statuses (429/5xx) and failures to
+    connect are retried with full-jitter backoff and the final response is
+    returned; read timeouts and other transport errors are raised at once.
+    """
+
+    def __init__(self, max_connections: int = 200, connect_timeout: float = 3.05,
+                 read_timeout: float = 10, max_retries: int = 2,
+                 backoff_base: float = 0.2, backoff_max: float = 3.0):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the serving event loop.
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def get(self, url: str, params: dict = None, label: str = None) -> httpx.Response:
+        label = label or url
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await self.client.get(url, params=params)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                self._record(label, time.perf_counter() - started, error=True)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            except httpx.TransportError:
+                self._record(label, time.perf_counter() - started, error=True)
+                raise
+            else:
+                self._record(label, time.perf_counter() - started, error=response.status_code >= 400)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                retry_after = response.headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    delay = min(float(retry_after), self.backoff_max)
+                else:
+                    delay = self._backoff(attempt)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _record(label: str, seconds: float, error: bool):
+        UPSTREAM_REQUEST_SECONDS.labels(label, 'error' if error else 'ok').observe(seconds)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,262 @@
+"""
+Shared cache tiers between the per-process memory cache and the weather_cache table.
+
+Backends store opaque bytes under string keys with a TTL; WeatherService
+puts serialized CachedPayloads in them. Selected with WEATHER_CACHE_BACKEND:
+
+    sql    no extra tier: workers share entries through the database (default)
+    shm    an mmap'ed file shared by every worker process on one machine
+    redis  a Redis-protocol server shared by every machine (WEATHER_REDIS_URL)
+
+Backends never raise on lookups or writes; an unavailable tier is a miss.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Optional
+from app.utils.resp import RespClient, RespError
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; slots are then only locked within a process
+    fcntl = None
+
+SHM_SLOTS = 2048
+SHM_SLOT_BYTES = 32768  # a gzip'ed and a plain forecast body fit comfortably
+REDIS_URL = 'redis://localhost:6379/0'
+REDIS_TIMEOUT_SECONDS = 0.25
+REDIS_RETRY_SECONDS = 5  # how long to treat Redis as a miss after a failure
+KEY_PREFIX = 'weather:'
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Interface for a byte store with per-key TTLs."""
+
+    name = 'base'
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'errors': 0}
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] = self._stats.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats, backend=self.name)
+
+
+class SQLCacheBackend(CacheBackend):
+    """Today's behavior: the weather_cache table is the only tier workers share.
+
+    Lookups always miss so WeatherService goes straight to the table.
+    """
+
+    name = 'sql'
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        pass
+
+    def delete(self, key: str):
+        pass
+
+
+def _default_shm_path() -> str:
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, 'weather-cache')
+
+
+class SharedMemoryCacheBackend(CacheBackend):
+    """Direct-mapped hash table in an mmap'ed file, shared by processes on one machine.
+
+    Each key hashes to one fixed-size slot; a newer key evicts whatever held
+    the slot. Writers take a per-slot fcntl range lock (plus a thread lock,
+    since fcntl locks are per process) and bump the slot's sequence number
+    before and after writing, so readers never lock: they retry a read that
+    overlapped a write, and treat a second overlap as a miss.
+    """
+
+    name = 'shm'
+    _FILE_HEADER = struct.Struct('<4sII')  # magic, slots, slot bytes
+    _FILE_HEADER_BYTES = 64
+    _SLOT_HEADER = struct.Struct('<IQdHI')  # sequence, key hash, expires (epoch), key length, value length
+    MAGIC = b'WSHM'
+
+    def __init__(self, path: str = None, slots: int = None, slot_bytes: int = None):
+        super().__init__()
+        env = os.environ.get
+        self.path = path or env('WEATHER_SHM_PATH') or _default_shm_path()
+        self.slots = int(slots if slots is not None else env('WEATHER_SHM_SLOTS', SHM_SLOTS))
+        self.slot_bytes = int(slot_bytes if slot_bytes is not None
+                              else env('WEATHER_SHM_SLOT_BYTES', SHM_SLOT_BYTES))
+        size = self._FILE_HEADER_BYTES + self.slots * self.slot_bytes
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock = threading.Lock()
+        header = self._FILE_HEADER.pack(self.MAGIC, self.slots, self.slot_bytes)
+        self._flock(fcntl.LOCK_EX if fcntl else None)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, header, 0)
+            matches = os.pread(self._fd, len(header), 0) == header
+        finally:
+            self._flock(fcntl.LOCK_UN if fcntl else None)
+        if not matches:
+            os.close(self._fd)
+            raise ValueError(f'{self.path} holds a cache with a different layout; remove it first')
+        self._map = mmap.mmap(self._fd, size)
+
+    def _flock(self, operation, offset: int = 0, length: int = 0):
+        if operation is not None:
+            fcntl.lockf(self._fd, operation, length, offset, os.SEEK_SET)
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        # Stable across processes, unlike hash()
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+    def _offset(self, digest: int) -> int:
+        return self._FILE_HEADER_BYTES + (digest % self.slots) * self.slot_bytes
+
+    def get(self, key: str) -> Optional[bytes]:
+        raw = key.encode()
+        digest = self._hash(raw)
+        offset = self._offset(digest)
+        for _ in range(2):
+            seq, slot_hash, expires, key_len, value_len = self._SLOT_HEADER.unpack_from(self._map, offset)
+            if seq % 2:
+                continue  # a write is in progress
+            if slot_hash != digest or expires <= time.time():
+                break
+            start = offset + self._SLOT_HEADER.size
+            stored_key = self._map[start:start + key_len]
+            value = self._map[start + key_len:start + key_len + value_len]
+            if self._SLOT_HEADER.unpack_from(self._map, offset)[0] != seq:
+                continue  # overwritten while we copied it
+            if stored_key == raw:
+                self._count('hits')
+                return value
+            break
+        self._count('misses')
+        return None
+
+    def _write_slot(self, offset: int, fields: tuple, data: bytes = b''):
+        with self._lock:
+            self._flock(fcntl.LOCK_EX if fcntl else None, offset, self.slot_bytes)
+            try:
+                seq = self._SLOT_HEADER.unpack_from(self._map, offset)[0]
+                struct.pack_into('<I', self._map, offset, (seq + 1) & 0xFFFFFFFF | 1)
+                start = offset + self._SLOT_HEADER.size
+                self._map[start:start + len(data)] = data
+                self._SLOT_HEADER.pack_into(self._map, offset, (seq + 2) & 0xFFFFFFFE, *fields)
+            finally:
+                self._flock(fcntl.LOCK_UN if fcntl else None, offset, self.slot_bytes)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        raw = key.encode()
+        if self._SLOT_HEADER.size + len(raw) + len(value) > self.slot_bytes:
+            self._count('too_large')
+            return
+        digest = self._hash(raw)
+        self._write_slot(self._offset(digest), (digest, time.time() + ttl, len(raw), len(value)),
+                         raw + value)
+        self._count('sets')
+
+    def delete(self, key: str):
+        raw = key.encode()
+        digest = self._hash(raw)
+        offset = self._offset(digest)
+        if self._SLOT_HEADER.unpack_from(self._map, offset)[1] == digest:
+            self._write_slot(offset, (0, 0.0, 0, 0))
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Keys in a Redis-protocol server, with expiry left to the server (SET ... PX).
+
+    After a connection error the backend reports misses for `retry_seconds`
+    instead of adding a timeout to every request while the server is down.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url: str = None, timeout: float = None, retry_seconds: float = None):
+        super().__init__()
+        env = os.environ.get
+        self.url = url or env('WEATHER_REDIS_URL', REDIS_URL)
+        self.client = RespClient(self.url, timeout=float(
+            timeout if timeout is not None else env('WEATHER_REDIS_TIMEOUT_SECONDS', REDIS_TIMEOUT_SECONDS)))
+        self.retry_seconds = float(retry_seconds if retry_seconds is not None
+                                   else env('WEATHER_REDIS_RETRY_SECONDS', REDIS_RETRY_SECONDS))
+        self._down_until = 0.0
+
+    def _execute(self, *args):
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            return self.client.execute(*args)
+        except (OSError, RespError, ValueError) as e:  # ValueError: a malformed reply
+            self._count('errors')
+            self._down_until = time.monotonic() + self.retry_seconds
+            logger.warning('Redis cache %s unavailable: %s', self.url, e)
+            return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self._execute('GET', KEY_PREFIX + key)
+        self._count('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        ttl_ms = int(ttl * 1000)
+        if ttl_ms > 0 and self._execute('SET', KEY_PREFIX + key, value, 'PX', ttl_ms) is not None:
+            self._count('sets')
+
+    def delete(self, key: str):
+        self._execute('DEL', KEY_PREFIX + key)
+
+
+CACHE_BACKENDS = {
+    'sql': SQLCacheBackend,
+    'shm': SharedMemoryCacheBackend,
+    'redis': RedisCacheBackend,
+}
+
+
+def create_cache_backend(name: str = None) -> CacheBackend:
+    """Instantiate the backend named by `name` or WEATHER_CACHE_BACKEND.
+
+    A backend that can't be opened (e.g. a shared memory file left by a
+    build with a different slot layout) is logged and replaced by the sql
+    backend, since this runs when the app is imported.
+    """
+    name = name or os.environ.get('WEATHER_CACHE_BACKEND', 'sql')
+    if name not in CACHE_BACKENDS:
+        raise ValueError(f"WEATHER_CACHE_BACKEND must be one of {tuple(CACHE_BACKENDS)}")
+    try:
+        return CACHE_BACKENDS[name]()
+    except (OSError, ValueError) as e:
+        logger.warning('Shared cache backend %r unavailable, falling back to sql: %s', name, e)
+        return SQLCacheBackend()
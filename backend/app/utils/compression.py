@@ -0,0 +1,87 @@
+"""
+Content-Encoding negotiation and compression (stdlib gzip/zlib only).
+"""
+import gzip
+import zlib
+from typing import Optional
+from flask import Response, request
+from werkzeug.http import parse_accept_header
+from app.utils.tracing import span
+
+# Server preference order; brotli would need a third-party codec.
+ENCODINGS = ('gzip', 'deflate')
+COMPRESS_MIN_BYTES = 512  # below this the headers cost more than they save
+COMPRESS_LEVEL = 6
+COMPRESSIBLE_MIMETYPES = ('application/json',)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported coding for an Accept-Encoding header value, honouring q=0."""
+    if not accept_encoding:
+        return None
+    return parse_accept_header(accept_encoding).best_match(ENCODINGS)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        # mtime=0 keeps the output deterministic for a given body.
+        return gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+    if encoding == 'deflate':
+        return zlib.compress(body, COMPRESS_LEVEL)  # zlib-wrapped, as HTTP "deflate" means
+    raise ValueError(f'unsupported content coding: {encoding}')
+
+
+def encoded_response(response: Response, body: bytes, encoding: str) -> Response:
+    """Put an already-compressed body on a response and mark it accordingly."""
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # The encoded bytes differ from the identity ones; a weak ETag keeps
+    # If-None-Match revalidation working for either representation.
+    _weaken_etag(response)
+    return response
+
+
+def _weaken_etag(response: Response):
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def _echo_weak_etag(response: Response):
+    """On a 304, repeat the validator in the form the client holds it.
+
+    There is no body to tell whether the cached copy was encoded; a client
+    revalidating with the weak tag got it from an encoded 200.
+    """
+    etag, weak = response.get_etag()
+    if etag and not weak and request.if_none_match.is_weak(etag) \
+            and not request.if_none_match.is_strong(etag):
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response: Response) -> Response:
+    """after_request hook: compress eligible JSON responses the client accepts.
+
+    Only a body that is actually sent encoded gets a weak ETag; identity
+    responses keep the strong validator.
+    """
+    if response.status_code == 304:
+        _echo_weak_etag(response)
+        return response
+    if 'Content-Encoding' in response.headers:
+        _weaken_etag(response)  # encoded by the view; validators are set after it
+        return response
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    with span('compress'):
+        body = compress(body, encoding)
+    return encoded_response(response, body, encoding)
@@ -0,0 +1,203 @@
+"""
+Columnar, array-backed representation of an OpenWeatherMap /forecast payload.
+
+A 40-slot forecast as JSON is ~18KB and decodes into ~700 Python objects.
+ForecastColumns keeps one typed array per field plus a small table of
+distinct weather conditions, packs to ~6KB and unpacks with a handful of
+array.frombytes calls. Aggregations read the arrays directly; rebuilding the
+full dict payload costs more than json.loads, so the memory tier keeps dicts.
+See benchmarks/forecast_storage.py.
+"""
+import json
+import math
+import struct
+import sys
+from array import array
+from datetime import datetime, timezone
+
+MAGIC = b'WFC1'
+_HEADER = struct.Struct('<4sIH')  # magic, slot count, metadata length
+
+# (column, typecode, path in a forecast slot); floats use NaN for "absent".
+# Float columns are doubles so values round-trip exactly.
+FORECAST_COLUMNS = (
+    ('dt', 'q', ('dt',)),
+    ('temp', 'd', ('main', 'temp')),
+    ('feels_like', 'd', ('main', 'feels_like')),
+    ('temp_min', 'd', ('main', 'temp_min')),
+    ('temp_max', 'd', ('main', 'temp_max')),
+    ('pressure', 'd', ('main', 'pressure')),
+    ('sea_level', 'd', ('main', 'sea_level')),
+    ('grnd_level', 'd', ('main', 'grnd_level')),
+    ('humidity', 'd', ('main', 'humidity')),
+    ('wind_speed', 'd', ('wind', 'speed')),
+    ('wind_deg', 'd', ('wind', 'deg')),
+    ('wind_gust', 'd', ('wind', 'gust')),
+    ('clouds', 'd', ('clouds', 'all')),
+    ('visibility', 'd', ('visibility',)),
+    ('pop', 'd', ('pop',)),
+    ('rain_3h', 'd', ('rain', '3h')),
+    ('snow_3h', 'd', ('snow', '3h')),
+    ('condition', 'H', None),  # index into ForecastColumns.conditions
+)
+# Values OpenWeatherMap reports as integers
+INT_COLUMNS = {'pressure', 'sea_level', 'grnd_level', 'humidity', 'wind_deg', 'clouds', 'visibility'}
+_CONDITION_KEYS = ('id', 'main', 'description', 'icon')
+
+
+def _get(slot: dict, path: tuple):
+    for key in path:
+        if not isinstance(slot, dict):
+            return None
+        slot = slot.get(key)
+    return slot
+
+
+def _present(column: array, start: int, end: int) -> list:
+    """Non-NaN values of column[start:end]."""
+    return [value for value in column[start:end] if value == value]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class ForecastColumns:
+    """Typed arrays for a forecast's slots, plus the payload's non-list fields."""
+
+    __slots__ = ('columns', 'conditions', 'extra')
+
+    def __init__(self, columns: dict, conditions: list, extra: dict):
+        self.columns = columns
+        self.conditions = conditions
+        self.extra = extra
+
+    def __len__(self):
+        return len(self.columns['dt'])
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> 'ForecastColumns':
+        """Build from a /forecast payload. Fields outside FORECAST_COLUMNS are dropped."""
+        columns = {name: array(code) for name, code, _ in FORECAST_COLUMNS}
+        conditions, condition_index = [], {}
+        for slot in payload.get('list') or []:
+            for name, code, path in FORECAST_COLUMNS:
+                if path is None:
+                    continue
+                value = _get(slot, path)
+                if code == 'd':
+                    columns[name].append(float(value) if _is_number(value) else math.nan)
+                else:
+                    columns[name].append(int(value) if _is_number(value) else 0)
+            weather = (slot.get('weather') or [{}])[0]
+            condition = tuple(weather.get(key) for key in _CONDITION_KEYS) + (_get(slot, ('sys', 'pod')),)
+            if condition not in condition_index:
+                condition_index[condition] = len(conditions)
+                conditions.append(condition)
+            columns['condition'].append(condition_index[condition])
+        extra = {key: value for key, value in payload.items() if key not in ('list', 'cnt')}
+        return cls(columns, [list(c) for c in conditions], extra)
+
+    def to_payload(self) -> dict:
+        """Rebuild the OpenWeatherMap-shaped payload."""
+        count = len(self)
+        slots = [{'dt': dt, 'dt_txt': datetime.fromtimestamp(dt, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')}
+                 for dt in self.columns['dt']]
+        # Column-at-a-time: one pass per field over plain Python lists.
+        for name, code, path in FORECAST_COLUMNS[1:-1]:
+            values = self.columns[name].tolist()
+            as_int = name in INT_COLUMNS
+            parent, leaf = path[:-1], path[-1]
+            for i in range(count):
+                value = values[i]
+                if value != value:  # NaN: absent upstream
+                    continue
+                target = slots[i]
+                for key in parent:
+                    target = target.get(key) or target.setdefault(key, {})
+                target[leaf] = int(value) if as_int else value
+        weather = [{key: value for key, value in zip(_CONDITION_KEYS, c) if value is not None}
+                   for c in self.conditions]
+        for slot, index in zip(slots, self.columns['condition']):
+            slot['weather'] = [dict(weather[index])] if weather[index] else []
+            pod = self.conditions[index][-1]
+            if pod is not None:
+                slot['sys'] = {'pod': pod}
+        return dict(self.extra, cnt=count, list=slots)
+
+    def pack(self) -> bytes:
+        meta = json.dumps({'conditions': self.conditions, 'extra': self.extra},
+                          separators=(',', ':')).encode()
+        parts = [_HEADER.pack(MAGIC, len(self), len(meta)), meta]
+        for name, _, _ in FORECAST_COLUMNS:
+            column = self.columns[name]
+            if sys.byteorder == 'big':
+                column = array(column.typecode, column)
+                column.byteswap()
+            parts.append(column.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def unpack(cls, blob: bytes) -> 'ForecastColumns':
+        magic, count, meta_len = _HEADER.unpack_from(blob)
+        if magic != MAGIC:
+            raise ValueError('not a packed forecast')
+        offset = _HEADER.size
+        meta = json.loads(blob[offset:offset + meta_len])
+        offset += meta_len
+        columns = {}
+        for name, code, _ in FORECAST_COLUMNS:
+            column = array(code)
+            size = column.itemsize * count
+            column.frombytes(blob[offset:offset + size])
+            if sys.byteorder == 'big':
+                column.byteswap()
+            columns[name] = column
+            offset += size
+        return cls(columns, meta['conditions'], meta['extra'])
+
+    def condition(self, i: int) -> dict:
+        values = self.conditions[self.columns['condition'][i]]
+        return {key: value for key, value in zip(_CONDITION_KEYS, values) if value is not None}
+
+    def daily(self, days: int = 5) -> list:
+        """Per-UTC-day min/max, as DailyForecast.tsx computes on the client.
+
+        The condition shown for a day is its middle slot's, matching the client.
+        """
+        dt, tmin, tmax = self.columns['dt'], self.columns['temp_min'], self.columns['temp_max']
+        humidity, pop = self.columns['humidity'], self.columns['pop']
+        out, start = [], 0
+        for end in range(1, len(self) + 1):
+            if end < len(self) and dt[end] // 86400 == dt[start] // 86400:
+                continue
+            mid = start + (end - start) // 2
+            lows, highs = _present(tmin, start, end), _present(tmax, start, end)
+            hums, pops = _present(humidity, start, end), _present(pop, start, end)
+            out.append({
+                'date': datetime.fromtimestamp(dt[start], timezone.utc).strftime('%Y-%m-%d'),
+                'dt': dt[mid],
+                'temp_min': round(min(lows), 2) if lows else None,
+                'temp_max': round(max(highs), 2) if highs else None,
+                'humidity': round(sum(hums) / len(hums)) if hums else None,
+                'pop': round(max(pops), 2) if pops else None,
+                'weather': self.condition(mid),
+            })
+            if len(out) == days:
+                break
+            start = end
+        return out
+
+    def hourly(self, slots: int = 8) -> list:
+        """The next `slots` 3-hour slots with only the fields HourlyForecast.tsx shows."""
+        count = min(slots, len(self))
+        columns = {name: self.columns[name][:count].tolist()
+                   for name in ('dt', 'temp', 'feels_like', 'humidity', 'pop', 'wind_speed')}
+        out = []
+        for i in range(count):
+            item = {name: values[i] for name, values in columns.items() if values[i] == values[i]}
+            if 'humidity' in item:
+                item['humidity'] = int(item['humidity'])
+            item['weather'] = self.condition(i)
+            out.append(item)
+        return out
@@ -0,0 +1,124 @@
+"""
+Spatial helpers for bucketing coordinates into a fixed-size lat/lon grid.
+"""
+import collections
+import math
+import threading
+
+GRID_CELL_DEGREES = 0.01  # ~1km at the equator
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180  # along a meridian
+INVALID_COORDINATES = 'lat must be between -90 and 90 and lon between -180 and 180'
+
+
+def valid_coordinates(lat: float, lon: float) -> bool:
+    """Finite and on the globe; NaN or inf would break grid bucketing."""
+    return (math.isfinite(lat) and math.isfinite(lon)
+            and -90 <= lat <= 90 and -180 <= lon <= 180)
+
+
+def grid_index(lat: float, lon: float, size: float = GRID_CELL_DEGREES) -> tuple:
+    """Integer (row, col) of the grid cell containing the point."""
+    # Round before flooring so 40.71 / 0.01 lands in cell 4071, not 4070.
+    return math.floor(round(lat / size, 9)), math.floor(round(lon / size, 9))
+
+
+def cell_key(row: int, col: int) -> str:
+    return f"{row}:{col}"
+
+
+def grid_cell(lat: float, lon: float, size: float = GRID_CELL_DEGREES) -> str:
+    """String key of the grid cell containing the point, suitable for indexing."""
+    return cell_key(*grid_index(lat, lon, size))
+
+
+def neighbor_cells(lat: float, lon: float, size: float = GRID_CELL_DEGREES) -> list:
+    """Keys of the containing cell and its eight neighbours.
+
+    Any point within `size` degrees on both axes lies in one of these cells.
+    """
+    row, col = grid_index(lat, lon, size)
+    return [cell_key(row + dr, col + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> tuple:
+    """(min_lat, max_lat, min_lon, max_lon) enclosing a circle of radius_km around the point."""
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = min(180.0, dlat / max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+class NearestPointIndex:
+    """Grid-bucketed points supporting nearest-neighbour lookup within a fixed radius.
+
+    Cells are radius-sized along latitude, so a lookup only scans the cells
+    overlapping the query's bounding box (3 rows; more columns near the poles
+    where longitude degrees shrink). Points on the far side of the
+    antimeridian are not matched. Past `maxsize` points the oldest is dropped.
+    """
+
+    def __init__(self, radius_km: float = 1.0, maxsize: int = None):
+        self.radius_km = radius_km
+        self.maxsize = maxsize
+        self.cell_degrees = radius_km / KM_PER_DEGREE
+        self._cells = {}
+        self._order = collections.deque()  # (cell, point), oldest first
+        self._lock = threading.Lock()
+
+    def cell(self, lat: float, lon: float) -> str:
+        """Key of the radius-sized cell containing the point."""
+        return grid_cell(lat, lon, self.cell_degrees)
+
+    def add(self, lat: float, lon: float, value):
+        cell = grid_index(lat, lon, self.cell_degrees)
+        point = (lat, lon, value)
+        with self._lock:
+            self._cells.setdefault(cell, []).append(point)
+            self._order.append((cell, point))
+            if self.maxsize is not None and len(self._order) > self.maxsize:
+                old_cell, old_point = self._order.popleft()
+                points = self._cells[old_cell]
+                points.remove(old_point)
+                if not points:
+                    del self._cells[old_cell]
+
+    def nearest(self, lat: float, lon: float, accept=None):
+        """(value, distance_km) of the closest point within the radius, or None.
+
+        `accept(value)` can veto candidates, e.g. ones that have expired.
+        """
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, self.radius_km)
+        row_lo, col_lo = grid_index(min_lat, min_lon, self.cell_degrees)
+        row_hi, col_hi = grid_index(max_lat, max_lon, self.cell_degrees)
+        best = None
+        with self._lock:
+            if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self._cells):
+                # Near the poles the box spans more columns than there are buckets.
+                cells = [points for (row, _), points in self._cells.items() if row_lo <= row <= row_hi]
+            else:
+                cells = [self._cells.get((row, col), ())
+                         for row in range(row_lo, row_hi + 1) for col in range(col_lo, col_hi + 1)]
+            for points in cells:
+                for p_lat, p_lon, value in points:
+                    distance = haversine_km(lat, lon, p_lat, p_lon)
+                    if distance <= self.radius_km and (best is None or distance < best[1]) \
+                            and (accept is None or accept(value)):
+                        best = (value, distance)
+        return best
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._order.clear()
+
+    def __len__(self):
+        return len(self._order)
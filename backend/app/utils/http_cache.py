@@ -0,0 +1,40 @@
+"""
+HTTP validator helpers: strong ETags, Last-Modified and 304 responses.
+"""
+import hashlib
+from datetime import datetime
+from typing import Callable, Optional
+from flask import Response, request
+
+
+def make_etag(*parts) -> str:
+    """Compact strong ETag value derived from the identifying parts."""
+    return hashlib.blake2b('|'.join(map(str, parts)).encode(), digest_size=12).hexdigest()
+
+
+def conditional_response(build: Callable[[], Response], etag: Optional[str],
+                         last_modified: Optional[datetime] = None,
+                         cache_control: Optional[str] = None) -> Response:
+    """Answer 304 when the request's validators match, else call `build`.
+
+    The body is only serialized when it will actually be sent. If-None-Match
+    takes precedence over If-Modified-Since, as in RFC 9110.
+    """
+    if etag is None:
+        return build()
+
+    if request.if_none_match:
+        # Weak comparison (RFC 9110 13.1.2): compressed responses carry W/ tags.
+        not_modified = request.if_none_match.contains_weak(etag)
+    elif last_modified is not None and request.if_modified_since is not None:
+        not_modified = last_modified.replace(microsecond=0) <= request.if_modified_since
+    else:
+        not_modified = False
+
+    response = Response(status=304) if not_modified else build()
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
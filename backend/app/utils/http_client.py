@@ -0,0 +1,75 @@
+"""
+Pooled, keep-alive HTTP client for upstream APIs.
+"""
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.metrics import UPSTREAM_REQUEST_SECONDS
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class UpstreamClient:
+    """Shared requests.Session with per-host connection pooling and retries.
+
+    Responses with a retryable status (429/5xx) and failures to connect are
+    retried with full-jitter exponential backoff; the final response is
+    returned as-is so callers keep using raise_for_status(). A read timeout
+    is raised at once: retrying it would hold the request for several more
+    read timeouts, when the caller can fall back to stale data instead.
+    """
+
+    def __init__(self, pool_size: int = 20, connect_timeout: float = 3.05,
+                 read_timeout: float = 10, max_retries: int = 2,
+                 backoff_base: float = 0.2, backoff_max: float = 3.0):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url: str, params: dict = None, label: str = None) -> requests.Response:
+        """GET url, retrying transient failures. Each attempt's latency is observed
+        in UPSTREAM_REQUEST_SECONDS under `label`."""
+        label = label or url
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.ConnectionError:  # includes ConnectTimeout, not ReadTimeout
+                self._record(label, time.perf_counter() - started, error=True)
+                if attempt >= self.max_retries:
+                    raise
+            except requests.Timeout:
+                self._record(label, time.perf_counter() - started, error=True)
+                raise
+            else:
+                retryable = response.status_code in RETRY_STATUSES
+                self._record(label, time.perf_counter() - started, error=response.status_code >= 400)
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                retry_after = response.headers.get('Retry-After')
+                response.close()
+                if retry_after and retry_after.isdigit():
+                    time.sleep(min(float(retry_after), self.backoff_max))
+                    attempt += 1
+                    continue
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _record(label: str, seconds: float, error: bool):
+        UPSTREAM_REQUEST_SECONDS.labels(label, 'error' if error else 'ok').observe(seconds)
+
+    def close(self):
+        self.session.close()
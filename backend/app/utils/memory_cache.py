@@ -0,0 +1,74 @@
+"""
+In-process LRU cache with per-entry TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded, thread-safe LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Return the live value for key, refreshing its LRU position."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """Store value under key; ttl is capped at the cache-wide TTL."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,144 @@
+"""
+Prometheus text-format metrics without a client library.
+
+Histograms are recorded on the hot path (one bisect and three additions
+under a per-series lock); everything else is read from the existing stats()
+methods by collectors only when /api/metrics is scraped.
+"""
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value) -> str:
+    if isinstance(value, float):
+        return repr(value) if value == value and abs(value) != float('inf') else ('+Inf' if value > 0 else 'NaN')
+    return str(value)
+
+
+class Histogram:
+    """Bucketed observations for one label set."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot: above the highest bound
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> tuple:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class HistogramFamily:
+    """A named histogram with one series per combination of label values."""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> Histogram:
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, Histogram(self.buckets))
+        return series
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for values, histogram in series:
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                le = 'le="%s"' % ('+Inf' if bound == float('inf') else repr(bound))
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, values)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, values)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Histogram families plus collectors that report counters and gauges at scrape time.
+
+    A collector is a callable returning (name, type, help, samples) tuples,
+    where samples is a list of ({label: value}, number) pairs.
+    """
+
+    def __init__(self):
+        self._families = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple,
+                  buckets: tuple = LATENCY_BUCKETS) -> HistogramFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = HistogramFamily(name, help_text, labelnames, buckets)
+            return family
+
+    def add_collector(self, collector, key=None):
+        """Register a collector; one registered under the same key is replaced."""
+        with self._lock:
+            self._collectors = [(k, c) for k, c in self._collectors if key is None or k != key]
+            self._collectors.append((key, collector))
+
+    def render(self) -> str:
+        with self._lock:
+            families = list(self._families.values())
+            collectors = [collector for _, collector in self._collectors]
+        lines = []
+        for family in families:
+            lines.extend(family.render())
+        for collector in collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'weather_http_request_duration_seconds', 'Time spent handling API requests, by route.',
+    ('endpoint', 'method', 'status'))
+UPSTREAM_REQUEST_SECONDS = registry.histogram(
+    'weather_upstream_request_duration_seconds', 'OpenWeatherMap call latency, by endpoint.',
+    ('endpoint', 'outcome'))
+DB_QUERY_SECONDS = registry.histogram(
+    'weather_db_query_duration_seconds', 'SQL statement execution time, by statement type.',
+    ('engine', 'operation'), DB_BUCKETS)
+
@@ -0,0 +1,85 @@
+"""
+In-memory prefix index for place-name autocomplete.
+"""
+import bisect
+import collections
+import re
+import threading
+import unicodedata
+
+_SEPARATORS = re.compile(r'[\s,]+')
+
+
+def normalize_query(text: str) -> str:
+    """Case-, accent- and whitespace-insensitive form of a place query."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _SEPARATORS.sub(' ', text.casefold()).strip()
+
+
+class PrefixIndex:
+    """Sorted array of (normalized name, place) pairs searched with bisect.
+
+    A prefix lookup is two binary searches plus a slice, so autocomplete for
+    a few thousand known places costs microseconds. Places are deduplicated
+    by name and coordinates (rounded to ~1km); past `maxsize` the place
+    indexed longest ago is dropped.
+    """
+
+    def __init__(self, maxsize: int = None):
+        self.maxsize = maxsize
+        self._keys = []
+        self._places = []
+        self._seen = collections.OrderedDict()  # ident -> place, oldest first
+        self._lock = threading.Lock()
+
+    def add(self, place: dict) -> bool:
+        """Index a geocoding result ({'name', 'lat', 'lon', ...}); False if already known."""
+        try:
+            key = normalize_query(place['name'])
+            ident = (key, round(float(place['lat']), 2), round(float(place['lon']), 2))
+        except (KeyError, TypeError, ValueError):
+            return False
+        if not key:
+            return False
+        with self._lock:
+            if ident in self._seen:
+                return False
+            self._seen[ident] = place
+            pos = bisect.bisect_right(self._keys, key)
+            self._keys.insert(pos, key)
+            self._places.insert(pos, place)
+            if self.maxsize is not None and len(self._seen) > self.maxsize:
+                self._evict_oldest()
+        return True
+
+    def _evict_oldest(self):
+        (key, _, _), place = self._seen.popitem(last=False)
+        lo = bisect.bisect_left(self._keys, key)
+        hi = bisect.bisect_right(self._keys, key, lo)
+        pos = next(i for i in range(lo, hi) if self._places[i] is place)
+        del self._keys[pos]
+        del self._places[pos]
+
+    def add_many(self, places) -> int:
+        return sum(self.add(place) for place in places)
+
+    def search(self, prefix: str, limit: int = 5) -> list:
+        """Known places whose normalized name starts with `prefix`, shortest names first."""
+        prefix = normalize_query(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            lo = bisect.bisect_left(self._keys, prefix)
+            hi = bisect.bisect_left(self._keys, prefix + '\uffff', lo)
+            matches = sorted(range(lo, hi), key=lambda i: len(self._keys[i]))[:limit]
+            return [self._places[i] for i in matches]
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._places.clear()
+            self._seen.clear()
+
+    def __len__(self):
+        return len(self._keys)
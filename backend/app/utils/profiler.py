@@ -0,0 +1,107 @@
+"""
+Statistical (sampling) profiler that can be switched on in a running worker.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+
+PROFILER_INTERVAL_MS = 10
+PROFILER_MAX_DEPTH = 64
+PROFILER_MAX_STACKS = 20000
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class SamplingProfiler:
+    """Samples every thread's Python stack each `interval_ms` from a daemon thread.
+
+    Nothing is installed into the interpreter (no sys.setprofile), so the
+    profiled code runs at full speed; the cost is one sys._current_frames()
+    walk per interval. Stacks are kept in folded form ("a;b;c count"), the
+    input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval_ms: float = None, max_depth: int = PROFILER_MAX_DEPTH,
+                 max_stacks: int = PROFILER_MAX_STACKS):
+        self.interval = float(interval_ms if interval_ms is not None
+                              else os.environ.get('PROFILER_INTERVAL_MS', PROFILER_INTERVAL_MS)) / 1000
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self._stacks = collections.Counter()
+        self._samples = 0
+        self._started_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = None):
+        if interval_ms is not None:
+            self.interval = float(interval_ms) / 1000
+        if self.running:
+            return
+        self._stop.clear()
+        self._started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def clear(self):
+        with self._lock:
+            self._stacks.clear()
+            self._samples = 0
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(skip=own)
+
+    def sample(self, skip: int = None):
+        """Record the current stack of every thread except `skip`."""
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == skip:
+                continue
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            stacks.append(';'.join(reversed(names)))
+        with self._lock:
+            self._samples += 1
+            for stack in stacks:
+                if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                    self._stacks[stack] += 1
+                else:
+                    self._stacks['[other]'] += 1
+
+    def folded(self, limit: int = None) -> str:
+        """Collected stacks, most frequent first, one 'frame;frame;... count' line each."""
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'running': self.running,
+                'interval_ms': self.interval * 1000,
+                'samples': self._samples,
+                'stacks': len(self._stacks),
+                'started_at': self._started_at,
+            }
+
+
+profiler = SamplingProfiler()
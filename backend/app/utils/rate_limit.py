@@ -0,0 +1,46 @@
+"""
+Token-bucket rate limiter.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """Allow `rate` operations per second on average, with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1, stop_event: threading.Event = None) -> bool:
+        """Block until tokens are available; returns False if stop_event is set first."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                self._sleep(wait)
@@ -0,0 +1,120 @@
+"""
+Minimal Redis protocol (RESP2) client.
+
+Covers the handful of commands the cache backend needs, so a
+Redis-compatible server (Redis, Valkey, KeyDB, ...) can be used without a
+client library.
+"""
+import queue
+import socket
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    """An error reply from the server."""
+
+
+def encode_command(*args) -> bytes:
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, (int, float)):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    """Read one reply from a buffered binary stream."""
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError('connection closed by server')
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode()
+    if kind == b'-':
+        raise RespError(rest.decode())
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        length = int(rest)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError('connection closed by server')
+        return data[:-2]
+    if kind == b'*':
+        length = int(rest)
+        return None if length < 0 else [read_reply(stream) for _ in range(length)]
+    raise RespError(f'unexpected reply type {kind!r}')
+
+
+class RespClient:
+    """Thread-safe client keeping up to `pool_size` idle connections."""
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', timeout: float = 0.25, pool_size: int = 8):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        conn = (sock, sock.makefile('rb'))
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.password:
+                self._roundtrip(conn, 'AUTH', self.password)
+            if self.db:
+                self._roundtrip(conn, 'SELECT', self.db)
+        except BaseException:
+            self._close(conn)
+            raise
+        return conn
+
+    @staticmethod
+    def _roundtrip(conn, *args):
+        sock, stream = conn
+        sock.sendall(encode_command(*args))
+        return read_reply(stream)
+
+    def execute(self, *args):
+        """Send one command and return its reply; raises OSError or RespError."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            reply = self._roundtrip(conn, *args)
+        except RespError:
+            self._release(conn)
+            raise
+        except Exception:
+            self._close(conn)
+            raise
+        self._release(conn)
+        return reply
+
+    def _release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        sock, stream = conn
+        stream.close()
+        sock.close()
+
+    def close(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
@@ -0,0 +1,106 @@
+"""
+Single-flight call deduplication.
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls sharing a key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight wait and receive the leader's result or
+    exception instead of running it again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def in_flight(self, key) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'upstream_calls': self.leaders,
+                'upstream_calls_saved': self.coalesced,
+            }
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight for coroutines on one event loop."""
+
+    def __init__(self):
+        self._futures = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        future = self._futures.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = self._futures[key] = asyncio.get_running_loop().create_future()
+        self.leaders += 1
+        try:
+            result = await fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody was waiting
+            raise
+        finally:
+            del self._futures[key]
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': len(self._futures),
+            'upstream_calls': self.leaders,
+            'upstream_calls_saved': self.coalesced,
+        }
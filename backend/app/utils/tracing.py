@@ -0,0 +1,120 @@
+"""
+Per-request timing spans, reported as a Server-Timing header.
+
+Spans only record while a trace is active for the current context (see
+app.instrumentation for which requests get one). Outside a trace span()
+returns a shared no-op, so instrumented code costs one ContextVar lookup.
+"""
+import os
+import time
+from contextvars import ContextVar
+
+TRACE_MODES = ('off', 'header', 'all')  # 'header': only requests sending TRACE_REQUEST_HEADER
+TRACE_REQUEST_HEADER = 'X-Debug-Timing'
+
+_current = ContextVar('weather_trace', default=None)
+
+
+class Trace:
+    """Accumulated duration and count per span name for one request."""
+
+    __slots__ = ('started', 'totals')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = {}  # name -> [seconds, count]
+
+    def add(self, name: str, seconds: float):
+        total = self.totals.get(name)
+        if total is None:
+            self.totals[name] = [seconds, 1]
+        else:
+            total[0] += seconds
+            total[1] += 1
+
+    def server_timing(self) -> str:
+        """Header value, e.g. 'cache.db;dur=1.2;desc="x2", total;dur=4.8'."""
+        parts = []
+        for name, (seconds, count) in self.totals.items():
+            part = f'{name};dur={seconds * 1000:.3f}'
+            parts.append(part + f';desc="x{count}"' if count > 1 else part)
+        parts.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.3f}')
+        return ', '.join(parts)
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'started')
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str):
+    """Context manager timing a stage of the current request, if it is traced."""
+    trace = _current.get()
+    return _NOOP if trace is None else _Span(trace, name)
+
+
+def record(name: str, seconds: float):
+    """Add an externally measured duration (e.g. from SQLAlchemy events) to the current trace."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+def current_trace():
+    return _current.get()
+
+
+def start_trace():
+    """Begin a trace for the current context; returns the token for end_trace()."""
+    return _current.set(Trace())
+
+
+def end_trace(token):
+    _current.reset(token)
+
+
+class TraceSettings:
+    """Which requests are traced; changed at runtime through /api/debug/tracing."""
+
+    def __init__(self):
+        self.mode = os.environ.get('TRACE_MODE', 'off')
+        if self.mode not in TRACE_MODES:
+            raise ValueError(f"TRACE_MODE must be one of {TRACE_MODES}")
+
+    def set_mode(self, mode: str):
+        if mode not in TRACE_MODES:
+            raise ValueError(f"mode must be one of {TRACE_MODES}")
+        self.mode = mode
+
+    def wants(self, header_value) -> bool:
+        """Whether to trace a request whose TRACE_REQUEST_HEADER is `header_value`."""
+        if self.mode == 'all':
+            return True
+        return self.mode == 'header' and header_value == '1'
+
+
+trace_settings = TraceSettings()
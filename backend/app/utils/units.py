@@ -0,0 +1,94 @@
+"""
+Unit conversion for OpenWeatherMap payloads.
+
+The cache stores one canonical (metric) payload per location; responses for
+other unit systems are converted on the way out, so a location needs a single
+upstream fetch whichever units clients ask for.
+"""
+CANONICAL_UNITS = 'metric'
+UNIT_SYSTEMS = ('metric', 'imperial', 'standard')
+
+TEMPERATURE_FIELDS = ('temp', 'feels_like', 'temp_min', 'temp_max')
+SPEED_FIELDS = ('speed', 'gust')
+MPS_TO_MPH = 2.2369362920544
+
+
+def needs_conversion(units: str) -> bool:
+    """Whether a canonical payload must be converted before it is sent in `units`."""
+    return units in UNIT_SYSTEMS and units != CANONICAL_UNITS
+
+
+def _temperature(celsius: float, units: str) -> float:
+    if units == 'imperial':
+        return round(celsius * 9 / 5 + 32, 2)
+    return round(celsius + 273.15, 2)
+
+
+def _speed(mps: float, units: str) -> float:
+    if units == 'imperial':
+        return round(mps * MPS_TO_MPH, 2)
+    return mps
+
+
+def _convert_entry(entry: dict, units: str) -> dict:
+    """Copy of a current-weather or forecast-slot dict with `main` and `wind` converted."""
+    converted = dict(entry)
+    main = entry.get('main')
+    if isinstance(main, dict):
+        converted['main'] = {
+            key: _temperature(value, units) if key in TEMPERATURE_FIELDS and value is not None else value
+            for key, value in main.items()
+        }
+    wind = entry.get('wind')
+    if isinstance(wind, dict):
+        converted['wind'] = {
+            key: _speed(value, units) if key in SPEED_FIELDS and value is not None else value
+            for key, value in wind.items()
+        }
+    return converted
+
+
+def convert_weather(payload: dict, units: str) -> dict:
+    """Convert a metric /weather payload to `units`. Unknown units are left metric."""
+    if units not in UNIT_SYSTEMS or units == CANONICAL_UNITS or not isinstance(payload, dict):
+        return payload
+    if 'fallback' in payload:
+        return dict(payload, fallback=convert_weather(payload['fallback'], units))
+    return _convert_entry(payload, units)
+
+
+def convert_forecast(payload: dict, units: str) -> dict:
+    """Convert a metric /forecast payload to `units`. Unknown units are left metric."""
+    if units not in UNIT_SYSTEMS or units == CANONICAL_UNITS or not isinstance(payload, dict):
+        return payload
+    if 'fallback' in payload:
+        return dict(payload, fallback=convert_forecast(payload['fallback'], units))
+    converted = dict(payload)
+    if isinstance(payload.get('list'), list):
+        converted['list'] = [_convert_entry(entry, units) for entry in payload['list']]
+    return converted
+
+
+def convert_rollup(payload: dict, units: str) -> dict:
+    """Convert a metric daily/hourly rollup (flat list items) to `units`."""
+    if units not in UNIT_SYSTEMS or units == CANONICAL_UNITS or not isinstance(payload, dict):
+        return payload
+    if 'fallback' in payload:
+        return dict(payload, fallback=convert_rollup(payload['fallback'], units))
+    converted = dict(payload)
+    if isinstance(payload.get('list'), list):
+        converted['list'] = [{
+            key: _temperature(value, units) if key in TEMPERATURE_FIELDS and value is not None
+            else _speed(value, units) if key == 'wind_speed' and value is not None
+            else value
+            for key, value in item.items()
+        } for item in payload['list']]
+    return converted
+
+
+CONVERTERS = {
+    'weather': convert_weather,
+    'forecast': convert_forecast,
+    'daily': convert_rollup,
+    'hourly': convert_rollup,
+}
@@ -0,0 +1,11 @@
+"""
+Micro-benchmarks for the Weather API backend. Run from backend/:
+
+    python -m benchmarks.forecast_storage
+    python -m benchmarks.response_build
+
+and an end-to-end load test against a local OpenWeatherMap stub:
+
+    python -m benchmarks.load_test
+    python -m benchmarks.owm_stub
+"""
@@ -0,0 +1,111 @@
+"""
+Forecast storage: JSON blob (WeatherCache.forecast_data) vs columnar arrays
+(WeatherCache.forecast_packed). Reports stored size, CPU per read and peak
+memory allocated per read, for full-payload reads and daily rollups.
+
+    python -m benchmarks.forecast_storage [--slots 40] [--number 2000]
+"""
+import argparse
+import json
+import random
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+
+from app.utils.forecast_columns import ForecastColumns
+
+CONDITIONS = [
+    (800, 'Clear', 'clear sky', '01'),
+    (801, 'Clouds', 'few clouds', '02'),
+    (803, 'Clouds', 'broken clouds', '04'),
+    (500, 'Rain', 'light rain', '10'),
+]
+
+
+def sample_forecast(slots: int = 40, seed: int = 7) -> dict:
+    """A forecast shaped like OpenWeatherMap's, with every field it sends."""
+    rng = random.Random(seed)
+    start = int(datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp())
+    entries = []
+    for i in range(slots):
+        dt = start + i * 10800
+        temp = round(15 + 8 * rng.random(), 2)
+        code, main, description, icon = rng.choice(CONDITIONS)
+        pod = 'd' if 6 <= (i * 3) % 24 < 18 else 'n'
+        entry = {
+            'dt': dt,
+            'main': {
+                'temp': temp, 'feels_like': round(temp - 0.8, 2),
+                'temp_min': round(temp - 1.3, 2), 'temp_max': round(temp + 1.1, 2),
+                'pressure': 1013, 'sea_level': 1013, 'grnd_level': 1008,
+                'humidity': rng.randint(40, 95), 'temp_kf': 0.4,
+            },
+            'weather': [{'id': code, 'main': main, 'description': description, 'icon': icon + pod}],
+            'clouds': {'all': rng.randint(0, 100)},
+            'wind': {'speed': round(rng.random() * 9, 2), 'deg': rng.randint(0, 359),
+                     'gust': round(rng.random() * 14, 2)},
+            'visibility': 10000,
+            'pop': round(rng.random(), 2),
+            'sys': {'pod': pod},
+            'dt_txt': datetime.fromtimestamp(dt, timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        if main == 'Rain':
+            entry['rain'] = {'3h': round(rng.random() * 3, 2)}
+        entries.append(entry)
+    return {
+        'cod': '200', 'message': 0, 'cnt': slots, 'list': entries,
+        'city': {'id': 2643743, 'name': 'London', 'coord': {'lat': 51.5074, 'lon': -0.1278},
+                 'country': 'GB', 'population': 1000000, 'timezone': 0,
+                 'sunrise': start + 28000, 'sunset': start + 58000},
+    }
+
+
+def daily_from_dicts(payload: dict) -> list:
+    """Today's path: group the decoded slots by day, as DailyForecast.tsx does."""
+    days = {}
+    for item in payload['list']:
+        days.setdefault(item['dt_txt'][:10], []).append(item)
+    return [{
+        'date': day,
+        'temp_min': min(i['main']['temp_min'] for i in items),
+        'temp_max': max(i['main']['temp_max'] for i in items),
+        'weather': items[len(items) // 2]['weather'][0],
+    } for day, items in list(days.items())[:5]]
+
+
+def peak_bytes(fn) -> int:
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--slots', type=int, default=40)
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    payload = sample_forecast(args.slots)
+    stored_json = json.dumps(payload)  # what the JSON column holds
+    stored_packed = ForecastColumns.from_payload(payload).pack()
+
+    cases = [
+        ('json: full payload', lambda: json.loads(stored_json)),
+        ('columnar: full payload', lambda: ForecastColumns.unpack(stored_packed).to_payload()),
+        ('json: daily rollup', lambda: daily_from_dicts(json.loads(stored_json))),
+        ('columnar: daily rollup', lambda: ForecastColumns.unpack(stored_packed).daily()),
+        ('columnar: unpack only', lambda: ForecastColumns.unpack(stored_packed)),
+    ]
+
+    print(f"stored size: json {len(stored_json.encode())} B, columnar {len(stored_packed)} B "
+          f"({args.slots} slots)\n")
+    print(f"{'case':<26}{'us/read':>10}{'peak KiB/read':>16}")
+    for name, fn in cases:
+        seconds = min(timeit.repeat(fn, number=args.number, repeat=3)) / args.number
+        print(f"{name:<26}{seconds * 1e6:>10.1f}{peak_bytes(fn) / 1024:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
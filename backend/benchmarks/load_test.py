@@ -0,0 +1,272 @@
+"""
+Load test: drive the API at fixed concurrency against a local OpenWeatherMap
+stub, reporting throughput, latency percentiles, upstream calls and cache
+hit ratios per scenario:
+
+    cold          every request is for a place nothing has cached yet
+    warm          requests spread over a hot set of places cached beforehand
+    expiry-storm  the same hot set right after every cache entry expired at
+                  once (past the stale grace window), all clients arriving
+                  together; upstream calls show how well misses coalesce
+
+    python -m benchmarks.load_test [--scenario all] [--requests 2000] [--concurrency 16]
+                                   [--latency-ms 80] [--error-rate 0] [--json]
+
+The app runs in this process on a threaded werkzeug server with its own
+SQLite file (DATABASE_PROFILE=production unless set), so figures are for
+comparing builds on one machine rather than for capacity planning.
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+
+import requests
+
+from benchmarks.owm_stub import OWMStub
+
+SCENARIOS = ('cold', 'warm', 'expiry-storm')
+# Share of requests per route
+ROUTE_MIX = (('current', 0.5), ('forecast', 0.3), ('geocode', 0.1), ('reverse-geocode', 0.1))
+WEATHER_ROUTES = ('current', 'forecast')
+HOT_SET = 50
+PERCENTILES = (50, 95, 99)
+
+
+def place(i: int) -> tuple:
+    """The i-th test location; distinct indexes never share a cache cell or its neighbours."""
+    return round(-50 + (i % 1000) * 0.1, 4), round(-170 + (i // 1000) * 0.1, 4)
+
+
+def route_url(route: str, i: int) -> str:
+    if route == 'geocode':
+        return '/api/weather/geocode?' + urlencode({'q': f'loadtown {i:06d}'})
+    lat, lon = place(i)
+    return f'/api/weather/{route}?lat={lat}&lon={lon}'
+
+
+def workload(scenario: str, count: int, hot_set: int = HOT_SET, seed: int = 1) -> list:
+    """(route, url) pairs: unique places when cold, the hot set otherwise."""
+    rng = random.Random(seed)
+    routes, weights = zip(*ROUTE_MIX)
+    picks = rng.choices(routes, weights, k=count)
+    if scenario == 'cold':
+        return [(route, route_url(route, i)) for i, route in enumerate(picks)]
+    return [(route, route_url(route, rng.randrange(hot_set))) for route in picks]
+
+
+def warm_urls(hot_set: int) -> list:
+    return [(route, route_url(route, i)) for i in range(hot_set) for route, _ in ROUTE_MIX]
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def drive(base_url: str, urls: list, concurrency: int) -> dict:
+    """Issue every request from `concurrency` keep-alive clients released together."""
+    latencies = [None] * len(urls)
+    failures = [0] * len(urls)
+    positions = itertools.count()
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker():
+        with requests.Session() as http:
+            barrier.wait()
+            for i in iter(positions.__next__, None):
+                if i >= len(urls):
+                    return
+                started = time.perf_counter()
+                try:
+                    response = http.get(base_url + urls[i][1], timeout=30)
+                    response.content
+                    failures[i] = response.status_code >= 400
+                except requests.RequestException:
+                    failures[i] = 1
+                latencies[i] = time.perf_counter() - started
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return {'seconds': time.perf_counter() - started, 'latencies': latencies, 'errors': sum(failures)}
+
+
+def reset_caches(service):
+    """Forget every cached weather and geocoding result, in memory and in the database."""
+    from app import db
+    from app.models import GeocodeCache, ReverseGeocodeCache, WeatherCache
+
+    for (cell,) in db.session.query(WeatherCache.cell_key).all():
+        service.evict_cell(cell)
+    for model in (WeatherCache, GeocodeCache, ReverseGeocodeCache):
+        db.session.query(model).delete()
+    db.session.commit()
+    service.memory_cache.clear()
+    service.geocode_memory.clear()
+    service.geocode_index.clear()
+    service.reverse_geocode_index.clear()
+
+
+def expire_weather(service):
+    """Push every weather_cache row past the stale grace window and drop its cached copies."""
+    from app import db
+    from app.models import WeatherCache
+
+    expired = datetime.now(timezone.utc) - timedelta(seconds=service.stale_grace_seconds + 60)
+    for (cell,) in db.session.query(WeatherCache.cell_key).all():
+        service.evict_cell(cell)
+    db.session.query(WeatherCache).update({WeatherCache.expires_at: expired})
+    db.session.commit()
+
+
+def _counters(service, stub) -> dict:
+    return {'memory': service.memory_cache.stats(), 'events': service.event_counts(),
+            'flights': service.inflight.stats(), 'stub': stub.snapshot()}
+
+
+def _ratio(hits: int, total: int):
+    return round(hits / total, 4) if total else None
+
+
+def run_scenario(scenario: str, app, service, stub, base_url: str, count: int = 2000,
+                 concurrency: int = 16, hot_set: int = HOT_SET, seed: int = 1) -> dict:
+    """Prepare the caches for `scenario`, drive `count` requests and summarize."""
+    if scenario not in SCENARIOS:
+        raise ValueError(f'scenario must be one of {SCENARIOS}')
+    with app.app_context():
+        reset_caches(service)
+    if scenario != 'cold':
+        drive(base_url, warm_urls(hot_set), min(concurrency, 4))
+    if scenario == 'expiry-storm':
+        with app.app_context():
+            expire_weather(service)
+
+    urls = workload(scenario, count, hot_set, seed)
+    before = _counters(service, stub)
+    result = drive(base_url, urls, concurrency)
+    after = _counters(service, stub)
+
+    def delta(section, key):
+        return after[section].get(key, 0) - before[section].get(key, 0)
+
+    calls = {endpoint: after['stub']['calls'].get(endpoint, 0) - before['stub']['calls'].get(endpoint, 0)
+             for endpoint in ('weather', 'forecast', 'geocode', 'reverse_geocode')}
+    upstream_errors = sum(after['stub']['errors'].values()) - sum(before['stub']['errors'].values())
+    weather_requests = sum(1 for route, _ in urls if route in WEATHER_ROUTES)
+    geocode_lookups = {key: delta('events', key) for key in
+                       ('geocode_hits', 'geocode_prefix_hits', 'geocode_misses',
+                        'reverse_geocode_hits', 'reverse_geocode_misses')}
+    latencies = sorted(result['latencies'])
+    return {
+        'scenario': scenario,
+        'requests': count,
+        'concurrency': concurrency,
+        'errors': result['errors'],
+        'seconds': round(result['seconds'], 3),
+        'requests_per_second': round(count / result['seconds'], 1) if result['seconds'] else None,
+        'latency_ms': dict(
+            {f'p{p}': round(percentile(latencies, p) * 1000, 2) for p in PERCENTILES},
+            mean=round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            max=round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        ),
+        'upstream': dict(calls, total=sum(calls.values()), errors=upstream_errors,
+                         coalesced=delta('flights', 'upstream_calls_saved')),
+        'cache': {
+            # Weather/forecast requests answered without their own upstream call
+            'weather_hit_ratio': _ratio(max(0, weather_requests - calls['weather'] - calls['forecast']),
+                                        weather_requests),
+            'memory_hit_ratio': _ratio(delta('memory', 'hits'), delta('memory', 'hits') + delta('memory', 'misses')),
+            'geocode_hit_ratio': _ratio(geocode_lookups['geocode_hits'] + geocode_lookups['geocode_prefix_hits'],
+                                        geocode_lookups['geocode_hits'] + geocode_lookups['geocode_prefix_hits']
+                                        + geocode_lookups['geocode_misses']),
+            'reverse_geocode_hit_ratio': _ratio(geocode_lookups['reverse_geocode_hits'],
+                                                geocode_lookups['reverse_geocode_hits']
+                                                + geocode_lookups['reverse_geocode_misses']),
+            'stale_served': delta('events', 'stale_served'),
+        },
+    }
+
+
+def _percent(ratio) -> str:
+    return '-' if ratio is None else f'{ratio * 100:.1f}%'
+
+
+def print_report(results: list):
+    print(f"{'scenario':<14}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+          f"{'upstream':>10}{'coalesced':>11}{'weather hit':>13}{'memory hit':>12}{'geocode hit':>13}")
+    for r in results:
+        latency, upstream, cache = r['latency_ms'], r['upstream'], r['cache']
+        print(f"{r['scenario']:<14}{r['requests_per_second']:>9}{latency['p50']:>9}{latency['p95']:>9}"
+              f"{latency['p99']:>9}{r['errors']:>8}{upstream['total']:>10}{upstream['coalesced']:>11}"
+              f"{_percent(cache['weather_hit_ratio']):>13}{_percent(cache['memory_hit_ratio']):>12}"
+              f"{_percent(cache['geocode_hit_ratio']):>13}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenario', choices=SCENARIOS + ('all',), default='all')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--hot-set', type=int, default=HOT_SET, help='places in the warm/storm working set')
+    parser.add_argument('--latency-ms', type=float, default=80, help='stub latency per upstream call')
+    parser.add_argument('--jitter-ms', type=float, default=40)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of upstream calls failing with 503')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    stub = OWMStub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                   seed=args.seed).start()
+    workdir = tempfile.mkdtemp(prefix='weather-load-')
+    # Read when the app and its WeatherService are created below.
+    os.environ.update({
+        'OPENWEATHERMAP_API_KEY': 'load-test',
+        'OPENWEATHERMAP_BASE_URL': stub.base_url,
+        'OPENWEATHERMAP_GEOCODING_URL': stub.geocoding_url,
+        'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'weather.db'),
+    })
+    os.environ.setdefault('DATABASE_PROFILE', 'production')
+
+    from werkzeug.serving import make_server
+    from app import create_app
+    from app.routes.weather import weather_service
+
+    app = create_app()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    scenarios = SCENARIOS if args.scenario == 'all' else (args.scenario,)
+    try:
+        results = [run_scenario(name, app, weather_service, stub, base_url, args.requests,
+                                args.concurrency, args.hot_set, args.seed) for name in scenarios]
+    finally:
+        server.shutdown()
+        stub.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{args.requests} requests per scenario, concurrency {args.concurrency}, "
+              f"upstream {args.latency_ms:g}+{args.jitter_ms:g} ms, error rate {args.error_rate:g}\n")
+        print_report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Local stand-in for the OpenWeatherMap endpoints the backend calls, with
+injectable latency and errors, counting every call it receives.
+
+    python -m benchmarks.owm_stub [--port 8089] [--latency-ms 80] [--error-rate 0.01]
+
+then point the app at it:
+
+    OPENWEATHERMAP_API_KEY=stub \\
+    OPENWEATHERMAP_BASE_URL=http://127.0.0.1:8089/data/2.5 \\
+    OPENWEATHERMAP_GEOCODING_URL=http://127.0.0.1:8089/geo/1.0 flask run
+"""
+import argparse
+import collections
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from app.services.weather_service import WeatherService
+
+ENDPOINTS = {
+    '/data/2.5/weather': 'weather',
+    '/data/2.5/forecast': 'forecast',
+    '/geo/1.0/direct': 'geocode',
+    '/geo/1.0/reverse': 'reverse_geocode',
+}
+
+
+def _payload(endpoint: str, params: dict):
+    if endpoint in ('weather', 'forecast', 'reverse_geocode'):
+        lat, lon = float(params['lat']), float(params['lon'])
+        if endpoint == 'weather':
+            return WeatherService._get_mock_weather(lat, lon)
+        if endpoint == 'forecast':
+            return WeatherService._get_mock_forecast(lat, lon)
+        return [{'name': f'Place {lat:.2f},{lon:.2f}', 'lat': lat, 'lon': lon, 'country': 'XX'}]
+    return WeatherService._get_mock_geocode(params.get('q', ''))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlsplit(self.path)
+        endpoint = ENDPOINTS.get(url.path)
+        if endpoint is None:
+            return self._send(404, {'cod': '404', 'message': 'not found'})
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if stub.api_key is not None and params.get('appid') != stub.api_key:
+            return self._send(401, {'cod': 401, 'message': 'Invalid API key'})
+        failed = stub.begin(endpoint)
+        time.sleep(stub.delay())
+        if failed:
+            return self._send(503, {'cod': '503', 'message': 'injected failure'})
+        try:
+            self._send(200, _payload(endpoint, params))
+        except (KeyError, ValueError):
+            self._send(400, {'cod': '400', 'message': 'bad query'})
+
+    def _send(self, status: int, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OWMStub:
+    """Threaded HTTP server answering /data/2.5 and /geo/1.0 with mock payloads.
+
+    Each call sleeps `latency_ms` plus up to `jitter_ms`, and fails with a 503
+    with probability `error_rate`. `calls` and `errors` count requests per
+    endpoint ('weather', 'forecast', 'geocode', 'reverse_geocode').
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0,
+                 jitter_ms: float = 0, error_rate: float = 0, api_key: str = None, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.api_key = api_key
+        self.calls = collections.Counter()
+        self.errors = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def base_url(self) -> str:
+        return self.url + '/data/2.5'
+
+    @property
+    def geocoding_url(self) -> str:
+        return self.url + '/geo/1.0'
+
+    def begin(self, endpoint: str) -> bool:
+        """Count a call; returns whether it should fail."""
+        with self._lock:
+            self.calls[endpoint] += 1
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            if failed:
+                self.errors[endpoint] += 1
+        return failed
+
+    def delay(self) -> float:
+        with self._lock:
+            jitter = self._random.random() * self.jitter_ms if self.jitter_ms else 0.0
+        return (self.latency_ms + jitter) / 1000
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'calls': dict(self.calls), 'errors': dict(self.errors)}
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+
+    def start(self) -> 'OWMStub':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='owm-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--jitter-ms', type=float, default=40)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    stub = OWMStub(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f'OpenWeatherMap stub on {stub.url} (Ctrl-C prints call counts)')
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(stub.snapshot(), indent=2))
+    finally:
+        stub._server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Response build time for current-weather and forecast payloads.
+
+Compares, per response: Flask's default provider (jsonify), the fast
+provider, and sending pre-serialized bytes. The "db hit" rows add decoding
+the stored JSON first, which is what a cache hit used to cost.
+
+    python -m benchmarks.response_build [--number 2000]
+"""
+import argparse
+import json
+import timeit
+
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
+
+from app.json_provider import FastJSONProvider, dumps_bytes, orjson
+from app.services.weather_service import WeatherService
+from benchmarks.forecast_storage import sample_forecast
+
+
+def build_cases(app_default: Flask, app_fast: Flask, payload: dict) -> list:
+    stored = json.dumps(payload)
+    body = dumps_bytes(payload)
+    return [
+        ('jsonify (default provider)', app_default, lambda: app_default.json.response(payload)),
+        ('jsonify (fast provider)', app_fast, lambda: app_fast.json.response(payload)),
+        ('pre-serialized bytes', app_fast, lambda: Response(body, mimetype='application/json')),
+        ('db hit: decode + jsonify', app_default,
+         lambda: app_default.json.response(json.loads(stored))),
+        ('db hit: stored bytes', app_fast, lambda: Response(body, mimetype='application/json')),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    app_default, app_fast = Flask('default'), Flask('fast')
+    app_default.json = DefaultJSONProvider(app_default)
+    app_fast.json = FastJSONProvider(app_fast)
+    payloads = {
+        'current': WeatherService._get_mock_weather(51.5, -0.12),
+        'forecast': sample_forecast(),
+    }
+
+    print(f"fast provider backend: {'orjson' if orjson else 'stdlib json'}\n")
+    print(f"{'payload':<10}{'case':<30}{'us/response':>12}")
+    for name, payload in payloads.items():
+        for case, app, fn in build_cases(app_default, app_fast, payload):
+            with app.app_context():
+                seconds = min(timeit.repeat(fn, number=args.number, repeat=3)) / args.number
+            print(f"{name:<10}{case:<30}{seconds * 1e6:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
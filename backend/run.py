@@ -1,9 +1,19 @@
 """
 Run the Weather API server.
+
+    python run.py           # Flask development server (WSGI)
+    python run.py --asgi    # uvicorn; current/forecast served natively async
 """
+import os
+import sys
 from app import create_app
 
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    if '--asgi' in sys.argv or os.environ.get('SERVER_MODE') == 'asgi':
+        import uvicorn
+        from app.asgi import create_asgi_app
+        uvicorn.run(create_asgi_app(app), host='0.0.0.0', port=5000)
+    else:
+        app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,105 @@
+"""
+In-process Redis protocol server for the cache backend tests.
+
+Answers the commands RespClient sends from a dict shared by every database.
+"""
+import socketserver
+import threading
+import time
+
+from app.utils.resp import RespError, read_reply
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except (ConnectionError, OSError, ValueError, RespError):
+                return
+            try:
+                reply = self.server.dispatch(command)
+            except (RespError, IndexError) as e:
+                self.wfile.write(b'-ERR %s\r\n' % str(e).encode())
+                continue
+            self.wfile.write(_encode_reply(reply))
+
+
+def _encode_reply(reply) -> bytes:
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, str):
+        return b'+%s\r\n' % reply.encode()
+    return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    """In-memory server for PING, GET, SET [EX|PX], DEL, EXISTS, DBSIZE, FLUSHDB, SELECT and AUTH."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, password: str = None):
+        super().__init__((host, port), _RespHandler)
+        self.password = password
+        self._data = {}  # key -> (value, expires_at or None), shared by every db
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'redis://{host}:{port}/0'
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return item
+
+    def dispatch(self, command: list):
+        name, args = command[0].decode().upper(), command[1:]
+        with self._lock:
+            if name == 'PING':
+                return 'PONG'
+            if name == 'AUTH' and self.password is not None and args[0].decode() != self.password:
+                raise RespError('WRONGPASS invalid password')
+            if name in ('SELECT', 'AUTH'):
+                return 'OK'
+            if name == 'GET':
+                item = self._live(args[0])
+                return item[0] if item else None
+            if name == 'SET':
+                expires_at = None
+                options = [a.decode().upper() for a in args[2::2]]
+                for option, value in zip(options, args[3::2]):
+                    scale = {'EX': 1, 'PX': 0.001}.get(option)
+                    if scale is None:
+                        raise RespError(f'unsupported SET option {option}')
+                    expires_at = time.monotonic() + int(value) * scale
+                self._data[args[0]] = (bytes(args[1]), expires_at)
+                return 'OK'
+            if name in ('DEL', 'EXISTS'):
+                found = [key for key in args if self._live(key) is not None]
+                if name == 'DEL':
+                    for key in found:
+                        del self._data[key]
+                return len(found)
+            if name == 'DBSIZE':
+                return sum(self._live(key) is not None for key in list(self._data))
+            if name == 'FLUSHDB':
+                self._data.clear()
+                return 'OK'
+        raise RespError(f"unknown command '{name}'")
+
+    def start(self) -> 'RespServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='resp-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -7,17 +7,18 @@ from app import create_app, db
 
 
 @pytest.fixture
-def app():
-    """Create test application."""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+def app(tmp_path, monkeypatch):
+    """Create test application on its own database file."""
+    # Set before create_app(), which creates the schema in DATABASE_URL.
+    # A file rather than :memory: so worker threads get their own connections.
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    app = create_app('testing')
 
     with app.app_context():
-        db.create_all()
         yield app
         db.session.remove()
         db.drop_all()
+        db.engine.dispose()
 
 
 @pytest.fixture
@@ -57,6 +58,15 @@ class TestWeatherRoutes:
         data = json.loads(response.data)
         assert 'list' in data
 
+    @pytest.mark.parametrize('coords', ['lat=nan&lon=1', 'lat=1&lon=inf', 'lat=-inf&lon=1', 'lat=91&lon=1',
+                                        'lat=1&lon=180.5'])
+    def test_rejects_invalid_coordinates(self, client, coords):
+        for path in ('current', 'forecast', 'forecast/daily', 'reverse-geocode'):
+            assert client.get(f'/api/weather/{path}?{coords}').status_code == 400, path
+        lat, lon = (float(part.split('=')[1]) for part in coords.split('&'))
+        response = client.post('/api/weather/batch', json={'locations': [{'lat': lat, 'lon': lon}]})
+        assert response.status_code == 400
+
     def test_geocode_requires_query(self, client):
         response = client.get('/api/weather/geocode')
         assert response.status_code == 400
@@ -142,3 +152,1665 @@ class TestLocationRoutes:
         defaults = [loc for loc in data if loc['is_default']]
         assert len(defaults) == 1
         assert defaults[0]['name'] == 'City 2'
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Replace OpenWeatherMap with a call-counting fake."""
+    from app.services import weather_service as module
+
+    calls = []
+
+    def fake_get(client, url, params=None, label=None):
+        calls.append((url, params))
+        if url.endswith('/forecast'):
+            return FakeResponse(module.WeatherService._get_mock_forecast(params['lat'], params['lon']))
+        return FakeResponse(module.WeatherService._get_mock_weather(params['lat'], params['lon']))
+
+    monkeypatch.setattr(module.UpstreamClient, 'get', fake_get)
+    return calls
+
+
+@pytest.fixture
+def service(app):
+    from app.services import WeatherService
+
+    svc = WeatherService()
+    svc.api_key = 'test-key'
+    return svc
+
+
+class TestMemoryCache:
+    def test_lru_eviction(self):
+        from app.utils import TTLCache
+
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.stats()['evictions'] == 1
+
+    def test_entry_ttl(self):
+        from app.utils import TTLCache
+
+        now = [0.0]
+        cache = TTLCache(maxsize=10, ttl=60, clock=lambda: now[0])
+        cache.set('short', 1, ttl=5)
+        cache.set('long', 2, ttl=600)
+        now[0] = 10
+        assert cache.get('short') is None
+        assert cache.get('long') == 2
+        now[0] = 61
+        assert cache.get('long') is None
+        stats = cache.stats()
+        assert stats['expirations'] == 2
+        assert stats['hits'] == 1
+
+    def test_hit_skips_database(self, service, upstream, monkeypatch):
+        service.get_current_weather(40.7128, -74.006)
+        assert len(upstream) == 1
+
+        def no_db(*args, **kwargs):
+            raise AssertionError('memory hit should not query the database')
+
+        monkeypatch.setattr(service, '_get_cached_weather', no_db)
+        data = service.get_current_weather(40.7128, -74.006)
+        assert data['name'] == 'Demo City'
+        assert len(upstream) == 1
+        assert service.cache_stats()['hits'] == 1
+
+
+class TestSpatialCache:
+    def test_nearest_row_in_neighbouring_cell(self, service):
+        from app.models import WeatherCache
+
+        service._cache_weather(40.7105, -74.0105, weather_data={'name': 'near'})
+        service._cache_weather(40.7185, -74.0015, weather_data={'name': 'far'})
+        assert WeatherCache.cell_for(40.7105, -74.0105) != WeatherCache.cell_for(40.7095, -74.0095)
+
+        cached = service._get_cached_weather(40.7095, -74.0095)
+        assert cached.weather_data == {'name': 'near'}
+        assert service._get_cached_weather(40.7300, -74.0100) is None
+
+    def test_upsert_by_cell(self, service):
+        from app.models import WeatherCache
+
+        service._cache_weather(51.5074, -0.1278, weather_data={'v': 1})
+        service._cache_weather(51.5071, -0.1275, forecast_data={'list': []})
+        rows = WeatherCache.query.all()
+        assert len(rows) == 1
+        assert rows[0].weather_data == {'v': 1}
+        assert rows[0].forecast_data == {'list': []}
+
+    def test_concurrent_first_writes_for_a_cell(self, app, service):
+        import threading
+        from app.models import WeatherCache
+
+        barrier = threading.Barrier(6)
+        versions = []
+
+        def write(i):
+            with app.app_context():
+                barrier.wait()
+                kind = {'weather_data': {'v': i}} if i % 2 else {'forecast_data': {'list': [i]}}
+                versions.append(service._cache_weather(12.3401, 45.6701, **kind))
+                db.session.remove()
+
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert None not in versions and service.event_counts()['cache_write_errors'] == 0
+        row = WeatherCache.query.one()
+        assert row.weather_data['v'] % 2 and row.forecast_data['list'][0] % 2 == 0
+        assert row.version() in versions
+
+    def test_upgrade_adds_cell_key_to_old_tables(self, tmp_path, monkeypatch):
+        import sqlite3
+        from sqlalchemy import inspect
+
+        path = tmp_path / 'old.db'
+        with sqlite3.connect(path) as conn:
+            conn.execute('CREATE TABLE weather_cache (id INTEGER PRIMARY KEY, location_id INTEGER, '
+                         'latitude FLOAT NOT NULL, longitude FLOAT NOT NULL, weather_data JSON NOT NULL, '
+                         'forecast_data JSON, fetched_at DATETIME, expires_at DATETIME NOT NULL)')
+            conn.executemany('INSERT INTO weather_cache VALUES (?, NULL, ?, ?, ?, NULL, ?, ?)', [
+                (1, 10.001, 20.001, '{"v": "old"}', '2026-01-01 00:00:00', '2026-01-01 00:30:00'),
+                (2, 10.002, 20.002, '{"v": "new"}', '2026-01-01 01:00:00', '2026-01-01 01:30:00'),
+                (3, 30.0, 40.0, '{"v": "other"}', '2026-01-01 00:00:00', '2026-01-01 00:30:00'),
+            ])
+        monkeypatch.setenv('DATABASE_URL', f'sqlite:///{path}')
+        app = create_app()
+        with app.app_context():
+            from app.models import WeatherCache
+
+            columns = {column['name'] for column in inspect(db.engine).get_columns('weather_cache')}
+            assert {'cell_key', 'weather_body', 'forecast_gzip', 'forecast_packed'} <= columns
+            assert {(row.id, row.weather_data['v']) for row in WeatherCache.query} == {(2, 'new'), (3, 'other')}
+            indexes = {index['name']: index for index in inspect(db.engine).get_indexes('weather_cache')}
+            assert indexes['ix_weather_cache_cell_key']['unique']
+            db.engine.dispose()
+
+    def test_lookup_uses_index(self, app):
+        from sqlalchemy import text
+
+        plan = db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM weather_cache "
+            "WHERE cell_key IN ('1:1', '1:2') AND expires_at > '2024-01-01'"
+        )).fetchall()
+        assert any('INDEX' in str(row[-1]).upper() for row in plan)
+
+
+class TestRequestCoalescing:
+    def test_concurrent_misses_share_one_fetch(self, app, service, upstream, monkeypatch):
+        import threading
+        import time
+        from app.services import weather_service as module
+
+        release = threading.Event()
+        fake_get = module.UpstreamClient.get
+
+        def slow_get(*args, **kwargs):
+            release.wait(5)
+            return fake_get(*args, **kwargs)
+
+        monkeypatch.setattr(module.UpstreamClient, 'get', slow_get)
+        results = []
+
+        def worker():
+            with app.app_context():
+                results.append(service.get_current_weather(48.8566, 2.3522))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for t in threads:
+            t.start()
+        deadline = time.monotonic() + 5
+        while service.upstream_stats()['upstream_calls_saved'] < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert len(upstream) == 1
+        assert len(results) == 5 and all(r['name'] == 'Demo City' for r in results)
+        stats = service.upstream_stats()
+        assert stats['upstream_calls'] == 1
+        assert stats['upstream_calls_saved'] == 4
+
+    def test_waiters_receive_leader_error(self):
+        import threading
+        import time
+        from app.utils import SingleFlight
+
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        errors = []
+
+        def failing():
+            started.set()
+            release.wait(5)
+            raise ValueError('upstream down')
+
+        def call():
+            try:
+                flight.do('key', failing)
+            except ValueError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(5)
+        waiter = threading.Thread(target=call)
+        waiter.start()
+        while flight.stats()['upstream_calls_saved'] < 1:
+            time.sleep(0.01)
+        release.set()
+        leader.join()
+        waiter.join()
+        assert len(errors) == 2
+        assert not flight.in_flight('key')
+
+
+def expire_cache_rows(minutes_ago):
+    from datetime import datetime, timedelta, timezone
+    from app.models import WeatherCache
+
+    for row in WeatherCache.query.all():
+        row.expires_at = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+    db.session.commit()
+
+
+class TestStaleWhileRevalidate:
+    def test_stale_row_served_and_refreshed(self, service, upstream):
+        service._cache_weather(35.6762, 139.6503, weather_data={'name': 'stale'})
+        expire_cache_rows(1)
+
+        assert service.get_current_weather(35.6762, 139.6503) == {'name': 'stale'}
+        service._refresh_executor.shutdown(wait=True)
+
+        assert len(upstream) == 1
+        db.session.expire_all()
+        assert service._get_cached_weather(35.6762, 139.6503).payload('weather_data')['name'] == 'Demo City'
+        stats = service.cache_stats()
+        assert stats['stale_served'] == 1
+        assert stats['refreshes_scheduled'] == 1
+        assert stats['refreshes_pending'] == 0
+
+    def test_stale_served_when_upstream_fails(self, service, monkeypatch):
+        import requests
+        from app.services import weather_service as module
+
+        def failing_get(*args, **kwargs):
+            raise requests.ConnectionError('upstream down')
+
+        monkeypatch.setattr(module.UpstreamClient, 'get', failing_get)
+        service._cache_weather(35.6762, 139.6503, forecast_data={'list': ['stale']})
+        expire_cache_rows(service.stale_grace_seconds / 60 + 5)
+
+        assert service.get_forecast(35.6762, 139.6503) == {'list': ['stale']}
+        assert service.cache_stats()['stale_on_error'] == 1
+        assert 'fallback' in service.get_forecast(10.0, 10.0)
+
+
+@pytest.fixture
+def stub_server():
+    """Local HTTP/1.1 server replaying scripted status codes."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {'statuses': [], 'requests': 0, 'connections': set()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            state['requests'] += 1
+            state['connections'].add(self.client_address)
+            status = state['statuses'].pop(0) if state['statuses'] else 200
+            body = json.dumps({'status': status}).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state['url'] = f'http://127.0.0.1:{server.server_port}'
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+class TestUpstreamClient:
+    def test_connections_are_reused(self, stub_server):
+        from app.utils import UpstreamClient
+        from app.utils.metrics import UPSTREAM_REQUEST_SECONDS
+
+        observed = UPSTREAM_REQUEST_SECONDS.labels('pooled', 'ok')
+        before = observed.snapshot()[2]
+        client = UpstreamClient(pool_size=2)
+        for _ in range(5):
+            assert client.get(f"{stub_server['url']}/weather", label='pooled').status_code == 200
+        assert stub_server['requests'] == 5
+        assert len(stub_server['connections']) == 1
+        assert observed.snapshot()[2] - before == 5
+
+    def test_retries_retryable_statuses(self, stub_server):
+        from app.utils import UpstreamClient
+
+        from app.utils.metrics import UPSTREAM_REQUEST_SECONDS
+
+        errors = UPSTREAM_REQUEST_SECONDS.labels('retried', 'error')
+        before = errors.snapshot()[2]
+        stub_server['statuses'] = [503, 429]
+        client = UpstreamClient(max_retries=2, backoff_base=0.01)
+        response = client.get(f"{stub_server['url']}/forecast", label='retried')
+        assert response.status_code == 200
+        assert stub_server['requests'] == 3
+        assert errors.snapshot()[2] - before == 2
+
+    def test_gives_up_after_max_retries(self, stub_server):
+        from app.utils import UpstreamClient
+
+        stub_server['statuses'] = [500, 500, 500]
+        client = UpstreamClient(max_retries=1, backoff_base=0.01)
+        assert client.get(f"{stub_server['url']}/weather").status_code == 500
+        assert stub_server['requests'] == 2
+
+
+    def test_retries_connect_failures_but_not_read_timeouts(self, monkeypatch):
+        import requests
+        from app.utils import UpstreamClient
+
+        client = UpstreamClient(max_retries=2, backoff_base=0.001)
+        calls = []
+
+        def failing(error):
+            def get(*args, **kwargs):
+                calls.append(error)
+                raise error('upstream')
+            return get
+
+        monkeypatch.setattr(client.session, 'get', failing(requests.ConnectTimeout))
+        with pytest.raises(requests.ConnectTimeout):
+            client.get('http://upstream.invalid/weather')
+        assert len(calls) == 3
+
+        calls.clear()
+        monkeypatch.setattr(client.session, 'get', failing(requests.ReadTimeout))
+        with pytest.raises(requests.ReadTimeout):
+            client.get('http://upstream.invalid/weather')
+        assert len(calls) == 1
+
+    def test_async_client_does_not_retry_read_timeouts(self):
+        httpx = pytest.importorskip('httpx')
+        import asyncio
+        from app.utils.async_http_client import AsyncUpstreamClient
+
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                raise httpx.ConnectError('refused', request=request)
+            raise httpx.ReadTimeout('slow', request=request)
+
+        async def run():
+            client = AsyncUpstreamClient(max_retries=2, backoff_base=0.001)
+            client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            try:
+                await client.get('http://upstream.invalid/weather')
+            finally:
+                await client._client.aclose()
+
+        with pytest.raises(httpx.ReadTimeout):
+            asyncio.run(run())
+        assert len(calls) == 2  # the connect failure was retried, the read timeout was not
+
+
+class TestBatchWeather:
+    def test_batch_requires_locations(self, client):
+        assert client.post('/api/weather/batch', json={}).status_code == 400
+        for body in ([1], 'locations'):
+            response = client.post('/api/weather/batch', json=body)
+            assert response.status_code == 400
+            assert response.get_json() == {'error': 'locations must be a non-empty list'}
+        response = client.post('/api/weather/batch', json={'locations': [{'lat': 'x'}]})
+        assert response.status_code == 400
+        response = client.post('/api/weather/batch', json={
+            'locations': [{'lat': 1, 'lon': 2}], 'include': ['hourly'],
+        })
+        assert response.status_code == 400
+
+    def test_batch_returns_results_in_order(self, client):
+        response = client.post('/api/weather/batch', json={
+            'locations': [{'lat': 40.7128, 'lon': -74.006}, {'lat': 51.5074, 'lon': -0.1278}],
+            'include': ['current', 'forecast'],
+        })
+        assert response.status_code == 200
+        results = json.loads(response.data)['results']
+        assert [r['lat'] for r in results] == [40.7128, 51.5074]
+        assert all('main' in r['current'] and 'list' in r['forecast'] for r in results)
+
+    def test_batch_single_cache_query_and_deduped_fetches(self, app, service, upstream, monkeypatch):
+        from sqlalchemy import event
+
+        service._cache_weather(40.7128, -74.006, weather_data={'name': 'cached'})
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            if 'FROM weather_cache' in statement:
+                statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            results = service.get_weather_batch([
+                {'lat': 40.7128, 'lon': -74.006},
+                {'lat': 48.8566, 'lon': 2.3522},
+                {'lat': 48.8567, 'lon': 2.3523},
+                {'lat': 35.6762, 'lon': 139.6503},
+            ])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        assert results[0]['current'] == {'name': 'cached'}
+        assert all(r['current']['name'] == 'Demo City' for r in results[1:])
+        # One batch lookup; the rest are upserts issued by the two fetches.
+        assert len([s for s in statements if 'IN (' in s]) == 1
+        assert len(upstream) == 2
+
+
+@pytest.fixture
+def live_service(app, upstream, monkeypatch):
+    """The routes' shared WeatherService, pointed at the fake upstream."""
+    from app.routes.weather import weather_service
+
+    monkeypatch.setattr(weather_service, 'api_key', 'test-key')
+    weather_service.memory_cache.clear()
+    yield weather_service
+    weather_service.memory_cache.clear()
+
+
+class TestLocationsWeather:
+    def test_empty(self, client):
+        response = client.get('/api/locations/weather')
+        assert response.status_code == 200
+        assert json.loads(response.data) == []
+
+    def test_invalid_include(self, client):
+        assert client.get('/api/locations/weather?include=hourly').status_code == 400
+
+    def test_fetches_missing_then_serves_from_cell_cache(self, client, live_service, upstream):
+        from app.models import WeatherCache
+
+        for name, lat, lon in [('Paris', 48.8566, 2.3522), ('Tokyo', 35.6762, 139.6503)]:
+            client.post('/api/locations/', json={'name': name, 'latitude': lat, 'longitude': lon})
+
+        data = json.loads(client.get('/api/locations/weather').data)
+        assert sorted(item['name'] for item in data) == ['Paris', 'Tokyo']
+        assert all(item['current']['name'] == 'Demo City' for item in data)
+        assert len(upstream) == 2
+        assert all(row.location_id is None for row in WeatherCache.query.all())
+
+        live_service.memory_cache.clear()
+        data = json.loads(client.get('/api/locations/weather?units=imperial').data)
+        assert [item['name'] for item in data] == ['Paris', 'Tokyo']
+        assert data[0]['current']['main']['temp'] == 72.5
+        assert len(upstream) == 2
+
+    def test_deleting_a_location_keeps_its_cell_cached(self, client, live_service, upstream):
+        from app.models import SavedLocation, WeatherCache
+
+        loc_id = json.loads(client.post('/api/locations/', json={
+            'name': 'Paris', 'latitude': 48.8566, 'longitude': 2.3522}).data)['id']
+        client.get('/api/weather/current?lat=48.8566&lon=2.3522')
+        db.session.query(WeatherCache).update({WeatherCache.location_id: loc_id})  # linked by an older build
+        db.session.commit()
+        assert client.delete(f'/api/locations/{loc_id}').status_code == 200
+        assert db.session.get(SavedLocation, loc_id) is None
+        assert WeatherCache.query.one().location_id is None
+
+
+class TestCacheWarmer:
+    def test_warms_saved_and_popular_locations_once(self, app, service, upstream):
+        from app.models import SavedLocation, SearchHistory
+        from app.services import CacheWarmer
+
+        db.session.add(SavedLocation(name='Paris', latitude=48.8566, longitude=2.3522))
+        for _ in range(3):
+            db.session.add(SearchHistory(query='tokyo', latitude=35.6762, longitude=139.6503))
+        db.session.add(SearchHistory(query='paris', latitude=48.8566, longitude=2.3522))
+        db.session.commit()
+
+        warmer = CacheWarmer(app, service, rate_per_minute=6000)
+        assert sorted(warmer.targets()) == [(35.6762, 139.6503), (48.8566, 2.3522)]
+
+        stats = warmer.run_once()
+        assert stats['due'] == 4 and stats['refreshed'] == 4
+        assert len(upstream) == 4
+
+        assert warmer.run_once()['due'] == 0
+        assert len(upstream) == 4
+
+    def test_refreshes_entries_expiring_within_lead(self, app, service, upstream):
+        from app.models import SavedLocation
+        from app.services import CacheWarmer
+
+        db.session.add(SavedLocation(name='Paris', latitude=48.8566, longitude=2.3522))
+        db.session.commit()
+        warmer = CacheWarmer(app, service, rate_per_minute=6000, lead_minutes=60)
+        warmer.run_once()
+        assert warmer.run_once()['refreshed'] == 2
+        assert len(upstream) == 4
+
+    def test_rejects_non_positive_rate(self, app, service, monkeypatch):
+        from app.services import CacheWarmer
+
+        with pytest.raises(ValueError):
+            CacheWarmer(app, service, rate_per_minute=0)
+        monkeypatch.setenv('CACHE_WARM_RATE_PER_MINUTE', '-5')
+        with pytest.raises(ValueError):
+            CacheWarmer(app, service)
+
+    def test_token_bucket_limits_rate(self):
+        from app.utils import TokenBucket
+
+        now = [0.0]
+        slept = []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+        for _ in range(6):
+            bucket.acquire()
+        assert now[0] == pytest.approx(2.0)
+        assert not bucket.try_acquire()
+
+
+class TestCacheSweeper:
+    def test_deletes_rows_past_stale_grace(self, app, service):
+        from datetime import datetime, timedelta, timezone
+        from app.models import WeatherCache
+        from app.services import CacheSweeper
+
+        for i in range(5):
+            service._cache_weather(10 + i, 10, weather_data={'name': f'row {i}'})
+        rows = WeatherCache.query.order_by(WeatherCache.id).all()
+        now = datetime.now(timezone.utc)
+        rows[0].expires_at = rows[1].expires_at = now - timedelta(hours=2)
+        rows[2].expires_at = now - timedelta(seconds=30)  # stale but still servable
+        db.session.commit()
+
+        sweeper = CacheSweeper(app, service, batch_size=1, max_rows=0, batch_pause_ms=0)
+        stats = sweeper.run_once()
+        assert stats['expired'] == 2 and stats['evicted'] == 0 and stats['rows'] == 3
+        assert 'duration_seconds' in stats
+        assert sweeper.stats()['expired'] == 2
+
+    def test_evicts_least_recently_fetched_above_limit(self, app, service, upstream):
+        from datetime import datetime, timedelta, timezone
+        from app.models import WeatherCache
+        from app.services import CacheSweeper
+
+        points = [(20 + i, 20) for i in range(4)]
+        for lat, lon in points:
+            service.get_current_weather(lat, lon)
+        cell = WeatherCache.cell_for(*points[2])
+        oldest = WeatherCache.query.filter_by(cell_key=cell).one()
+        oldest.fetched_at = datetime.now(timezone.utc) - timedelta(minutes=20)
+        db.session.commit()
+
+        stats = CacheSweeper(app, service, max_rows=3, batch_pause_ms=0).run_once()
+        assert stats['evicted'] == 1 and stats['rows'] == 3
+        assert WeatherCache.query.filter_by(cell_key=cell).count() == 0
+        # The memory tier no longer serves the evicted cell
+        calls = len(upstream)
+        service.get_current_weather(*points[2])
+        assert len(upstream) == calls + 1
+
+
+class TestUnitConversion:
+    def test_one_fetch_serves_every_unit_system(self, service, upstream):
+        metric = service.get_current_weather(40.7128, -74.006, 'metric')
+        imperial = service.get_current_weather(40.7128, -74.006, 'imperial')
+        standard = service.get_current_weather(40.7128, -74.006, 'standard')
+
+        assert len(upstream) == 1
+        assert upstream[0][1]['units'] == 'metric'
+        assert metric['main']['temp'] == 22.5
+        assert imperial['main']['temp'] == 72.5
+        assert standard['main']['temp'] == 295.65
+        assert imperial['wind']['speed'] == pytest.approx(7.83)
+        assert standard['wind']['speed'] == 3.5
+        assert imperial['main']['humidity'] == metric['main']['humidity']
+
+    def test_forecast_conversion_does_not_mutate_cache(self, service, upstream):
+        imperial = service.get_forecast(40.7128, -74.006, 'imperial')
+        metric = service.get_forecast(40.7128, -74.006)
+        assert len(upstream) == 1
+        first = metric['list'][0]['main']['temp']
+        assert imperial['list'][0]['main']['temp'] == pytest.approx(first * 9 / 5 + 32)
+
+    def test_fallback_is_converted(self):
+        from app.utils.units import convert_weather
+
+        payload = {'error': 'boom', 'fallback': {'main': {'temp': 0}}}
+        assert convert_weather(payload, 'imperial')['fallback']['main']['temp'] == 32
+
+
+class TestConditionalResponses:
+    def test_weather_etag_and_304(self, client, live_service):
+        response = client.get('/api/weather/current?lat=40.7128&lon=-74.006')
+        etag = response.headers['ETag']
+        assert response.status_code == 200
+        assert 'max-age=' in response.headers['Cache-Control']
+        assert int(response.headers['Cache-Control'].split('max-age=')[1]) > 0
+        assert response.headers['Last-Modified']
+
+        cached = client.get('/api/weather/current?lat=40.7128&lon=-74.006',
+                            headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.data == b''
+        assert cached.headers['ETag'] == etag
+
+    def test_etag_varies_by_units_and_kind(self, client, live_service):
+        tags = {
+            client.get(url).headers['ETag'] for url in (
+                '/api/weather/current?lat=40.7128&lon=-74.006',
+                '/api/weather/current?lat=40.7128&lon=-74.006&units=imperial',
+                '/api/weather/forecast?lat=40.7128&lon=-74.006',
+            )
+        }
+        assert len(tags) == 3
+
+    def test_refresh_changes_etag(self, client, live_service):
+        first = client.get('/api/weather/current?lat=40.7128&lon=-74.006').headers['ETag']
+        live_service.refresh('weather', 40.7128, -74.006)
+        response = client.get('/api/weather/current?lat=40.7128&lon=-74.006',
+                              headers={'If-None-Match': first})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != first
+
+    def test_mock_data_has_no_etag(self, client):
+        response = client.get('/api/weather/current?lat=40.7128&lon=-74.006')
+        assert 'ETag' not in response.headers
+
+    def test_locations_etag_changes_on_write(self, client):
+        etag = client.get('/api/locations/').headers['ETag']
+        assert client.get('/api/locations/', headers={'If-None-Match': etag}).status_code == 304
+
+        resp = client.post('/api/locations/', json={'name': 'Test', 'latitude': 0, 'longitude': 0})
+        loc_id = json.loads(resp.data)['id']
+        response = client.get('/api/locations/', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+
+        client.put(f'/api/locations/{loc_id}', json={'name': 'Renamed'})
+        assert client.get('/api/locations/', headers={'If-None-Match': etag}).status_code == 200
+
+
+@pytest.fixture
+def asgi_get(app):
+    """Issue GET requests against the ASGI app from synchronous tests."""
+    httpx = pytest.importorskip('httpx')
+    import asyncio
+    from app.asgi import create_asgi_app
+
+    asgi_app = create_asgi_app(app)
+
+    def get(*urls, headers=None):
+        async def run():
+            transport = httpx.ASGITransport(app=asgi_app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://test') as http:
+                responses = [await http.get(url, headers=headers) for url in urls]
+            await asgi_app.weather.aclose()
+            return responses
+        return asyncio.run(run())
+
+    get.app = asgi_app
+    return get
+
+
+class TestAsgi:
+    def test_requires_coordinates(self, asgi_get):
+        response, = asgi_get('/api/weather/current?lat=abc')
+        assert response.status_code == 400
+
+    def test_mock_without_api_key(self, asgi_get):
+        response, = asgi_get('/api/weather/current?lat=40.7128&lon=-74.006')
+        assert response.status_code == 200
+        assert 'main' in response.json()
+        assert 'ETag' not in response.headers
+
+    def test_upstream_fetch_is_cached(self, asgi_get, stub_server, monkeypatch):
+        from app.routes.weather import weather_service
+
+        monkeypatch.setattr(weather_service, 'api_key', 'test-key')
+        monkeypatch.setattr(weather_service, 'base_url', stub_server['url'])
+        weather_service.memory_cache.clear()
+        before = weather_service.memory_cache.stats()
+        try:
+            first, second = asgi_get('/api/weather/forecast?lat=48.8566&lon=2.3522',
+                                     '/api/weather/forecast?lat=48.8566&lon=2.3522')
+            assert first.json() == second.json() == {'status': 200}
+            assert stub_server['requests'] == 1
+            after = weather_service.memory_cache.stats()
+            # One memory lookup per request
+            assert after['misses'] - before['misses'] == 1
+            assert after['hits'] - before['hits'] == 1
+            assert asgi_get.app.weather.upstream_stats()['upstream_calls'] == 1
+
+            etag = first.headers['ETag']
+            cached, = asgi_get('/api/weather/forecast?lat=48.8566&lon=2.3522',
+                               headers={'If-None-Match': etag})
+            assert cached.status_code == 304
+            assert stub_server['requests'] == 1
+
+            # Too small to compress: the validator stays strong.
+            small, = asgi_get('/api/weather/forecast?lat=48.8566&lon=2.3522',
+                              headers={'Accept-Encoding': 'gzip'})
+            assert 'Content-Encoding' not in small.headers
+            assert small.headers['ETag'] == etag and not etag.startswith('W/')
+            weak, = asgi_get('/api/weather/forecast?lat=48.8566&lon=2.3522',
+                             headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'W/{etag}'})
+            assert weak.status_code == 304
+            assert weak.headers['ETag'] == f'W/{etag}'
+        finally:
+            weather_service.memory_cache.clear()
+
+    def test_rejects_invalid_coordinates(self, asgi_get):
+        responses = asgi_get('/api/weather/current?lat=nan&lon=1', '/api/weather/forecast?lat=1&lon=-inf',
+                             '/api/weather/current?lat=90.5&lon=1')
+        assert [r.status_code for r in responses] == [400, 400, 400]
+
+    def test_other_routes_delegate_to_flask(self, asgi_get):
+        response, = asgi_get('/api/health')
+        assert response.status_code == 200
+        assert response.json()['status'] == 'healthy'
+
+
+@pytest.fixture
+def geocoder(monkeypatch):
+    """Fake geocoding upstream returning one result named after the query."""
+    from app.services import weather_service as module
+
+    calls = []
+
+    def fake_get(client, url, params=None, label=None):
+        calls.append(params['q'])
+        name = params['q'].strip().title()
+        return FakeResponse([{'name': name, 'lat': 51.5074, 'lon': -0.1278, 'country': 'GB'},
+                             {'name': name, 'lat': 42.9849, 'lon': -81.2453, 'country': 'CA'}])
+
+    monkeypatch.setattr(module.UpstreamClient, 'get', fake_get)
+    return calls
+
+
+class TestGeocodeCache:
+    def test_prefix_index(self):
+        from app.utils import PrefixIndex
+
+        index = PrefixIndex()
+        index.add_many([
+            {'name': 'São Paulo', 'lat': -23.55, 'lon': -46.63},
+            {'name': 'Sapporo', 'lat': 43.06, 'lon': 141.35},
+            {'name': 'San Francisco', 'lat': 37.77, 'lon': -122.42},
+        ])
+        assert not index.add({'name': 'sao paulo', 'lat': -23.551, 'lon': -46.632})
+        assert [p['name'] for p in index.search('SAO')] == ['São Paulo']
+        assert [p['name'] for p in index.search('sa', limit=2)] == ['Sapporo', 'São Paulo']
+        assert index.search('x') == []
+
+        capped = PrefixIndex(maxsize=2)
+        capped.add_many([{'name': name, 'lat': 0, 'lon': 0} for name in ('Lima', 'Lyon', 'Lille')])
+        assert len(capped) == 2
+        assert [p['name'] for p in capped.search('l')] == ['Lyon', 'Lille']
+
+    def test_normalized_query_cached(self, service, geocoder):
+        from app.models import GeocodeCache
+        from app.services import WeatherService
+
+        assert len(service.geocode('London')) == 2
+        assert service.geocode('  LONDON ', limit=1)[0]['country'] == 'GB'
+        assert geocoder == ['London']
+        assert GeocodeCache.query.filter_by(query_key='london').count() == 1
+
+        fresh = WeatherService()
+        fresh.api_key = 'test-key'
+        assert len(fresh.geocode('london')) == 2
+        assert geocoder == ['London']
+
+    def test_prefix_answered_locally(self, service, geocoder):
+        service.geocode('Paris')
+        assert service.geocode('par')[0]['name'] == 'Paris'
+        assert service.cache_stats()['geocode_prefix_hits'] == 1
+        service.geocode('Berlin')
+        assert geocoder == ['Paris', 'Berlin']
+
+    def test_complete_names_go_upstream(self, service, geocoder):
+        service._load_geocode_index()
+        service.geocode_index.add({'name': 'Paris', 'lat': 33.66, 'lon': -95.55, 'country': 'US'})
+        assert [p['country'] for p in service.geocode('Paris')] == ['GB', 'CA']
+        assert geocoder == ['Paris']
+        assert service.cache_stats()['geocode_prefix_hits'] == 0
+
+    def test_search_history_does_not_feed_the_index(self, client, service, geocoder):
+        client.post('/api/locations/search-history', json={
+            'query': 'tok', 'result_name': 'Tokyo, JP', 'latitude': 35.68, 'longitude': 139.65,
+        })
+        service.geocode('To')
+        assert geocoder == ['To']
+
+
+class TestReverseGeocodeCache:
+    @pytest.fixture
+    def reverse(self, monkeypatch):
+        from app.services import weather_service as module
+
+        calls = []
+
+        def fake_get(client, url, params=None, label=None):
+            calls.append((params['lat'], params['lon']))
+            return FakeResponse([{'name': f"Place {len(calls)}", 'lat': params['lat'], 'lon': params['lon']}])
+
+        monkeypatch.setattr(module.UpstreamClient, 'get', fake_get)
+        return calls
+
+    def test_nearest_point_index(self):
+        from app.utils import NearestPointIndex, haversine_km
+
+        index = NearestPointIndex(radius_km=1.0)
+        index.add(40.7128, -74.0060, 'nyc')
+        index.add(40.7200, -74.0000, 'north')
+        assert index.nearest(40.7130, -74.0062)[0] == 'nyc'
+        assert index.nearest(40.7195, -74.0001)[0] == 'north'
+        assert index.nearest(40.7500, -74.0060) is None
+        assert index.nearest(40.7130, -74.0062, accept=lambda v: v != 'nyc')[0] == 'north'
+        assert haversine_km(0, 0, 0, 1) == pytest.approx(111.19, rel=1e-3)
+
+        polar = NearestPointIndex(radius_km=5.0)
+        polar.add(89.99, 10.0, 'pole')
+        assert polar.nearest(89.99, -170.0)[0] == 'pole'
+
+        capped = NearestPointIndex(radius_km=1.0, maxsize=2)
+        for i, value in enumerate(('a', 'b', 'c')):
+            capped.add(10.0 + i, 20.0, value)
+        assert len(capped) == 2
+        assert capped.nearest(10.0, 20.0) is None and capped.nearest(12.0, 20.0)[0] == 'c'
+
+    def test_nearby_fix_resolves_locally(self, service, reverse):
+        first = service.reverse_geocode(51.5074, -0.1278)
+        assert service.reverse_geocode(51.5079, -0.1270) == first
+        assert len(reverse) == 1
+        assert service.reverse_geocode(51.6, -0.1278) != first
+        assert len(reverse) == 2
+        assert service.cache_stats()['reverse_geocode_hits'] == 1
+
+    def test_database_shared_across_processes(self, service, reverse):
+        from app.services import WeatherService
+
+        service.reverse_geocode(35.6762, 139.6503)
+        other = WeatherService()
+        other.api_key = 'test-key'
+        assert other.reverse_geocode(35.6765, 139.6500)[0]['name'] == 'Place 1'
+        assert len(reverse) == 1
+        assert len(other.reverse_geocode_index) == 1
+
+    def test_misses_in_a_cell_share_one_row(self, service, reverse):
+        from datetime import datetime, timezone
+        from app.models import ReverseGeocodeCache
+
+        for _ in range(3):
+            service.reverse_geocode_index.clear()
+            db.session.query(ReverseGeocodeCache).update({'expires_at': datetime(2000, 1, 1, tzinfo=timezone.utc)})
+            db.session.commit()
+            service.reverse_geocode(35.6762, 139.6503)
+        assert len(reverse) == 3
+        row = ReverseGeocodeCache.query.one()
+        assert row.results[0]['name'] == 'Place 3'
+
+
+class TestForecastColumns:
+    def test_round_trip(self):
+        from app.utils.forecast_columns import ForecastColumns
+        from benchmarks.forecast_storage import sample_forecast
+
+        payload = sample_forecast()
+        rebuilt = ForecastColumns.unpack(ForecastColumns.from_payload(payload).pack()).to_payload()
+        for item in payload['list']:
+            del item['main']['temp_kf']  # not stored
+        assert rebuilt == payload
+
+    def test_daily_matches_client_grouping(self):
+        from app.utils.forecast_columns import ForecastColumns
+        from benchmarks.forecast_storage import daily_from_dicts, sample_forecast
+
+        payload = sample_forecast()
+        daily = ForecastColumns.from_payload(payload).daily()
+        expected = daily_from_dicts(payload)
+        assert [d['date'] for d in daily] == [d['date'] for d in expected]
+        assert [d['temp_max'] for d in daily] == [d['temp_max'] for d in expected]
+        assert [d['weather'] for d in daily] == [d['weather'] for d in expected]
+
+    def test_columnar_storage(self, service, upstream):
+        from app.models import WeatherCache
+        from app.services import WeatherService
+
+        service.forecast_storage = 'columnar'
+        first = service.get_forecast(40.7128, -74.006)
+        row = WeatherCache.query.one()
+        assert row.forecast_data is None and row.forecast_packed
+
+        reader = WeatherService()
+        reader.api_key = 'test-key'
+        assert reader.get_forecast(40.7128, -74.006) == first
+        assert len(upstream) == 1
+
+
+class TestForecastRollups:
+    def test_daily_and_hourly(self, client, live_service, upstream):
+        full = client.get('/api/weather/forecast?lat=40.7128&lon=-74.006')
+        daily = client.get('/api/weather/forecast/daily?lat=40.7128&lon=-74.006')
+        hourly = client.get('/api/weather/forecast/hourly?lat=40.7128&lon=-74.006')
+        assert daily.status_code == hourly.status_code == 200
+        assert len(upstream) == 1
+
+        days = json.loads(daily.data)['list']
+        assert len(days) == 5
+        slots = json.loads(full.data)['list']
+        first_day = [s for s in slots if s['dt_txt'][:10] == days[0]['date']]
+        assert days[0]['temp_max'] == max(s['main']['temp_max'] for s in first_day)
+        assert len(json.loads(hourly.data)['list']) == 8
+        assert len(full.data) > 5 * max(len(daily.data), len(hourly.data))
+
+    def test_rollups_are_memoized_per_forecast_version(self, client, live_service, monkeypatch):
+        from app.utils.forecast_columns import ForecastColumns
+
+        client.get('/api/weather/forecast/daily?lat=40.7128&lon=-74.006')
+        calls = []
+        original = ForecastColumns.from_payload
+        monkeypatch.setattr(ForecastColumns, 'from_payload',
+                            classmethod(lambda cls, p: calls.append(1) or original(p)))
+        etag = client.get('/api/weather/forecast/daily?lat=40.7128&lon=-74.006').headers['ETag']
+        assert calls == []
+
+        live_service.refresh('forecast', 40.7128, -74.006)
+        response = client.get('/api/weather/forecast/daily?lat=40.7128&lon=-74.006',
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert calls == [1]
+
+    def test_units_and_validation(self, client, live_service):
+        metric = json.loads(client.get('/api/weather/forecast/hourly?lat=1&lon=1').data)
+        imperial = json.loads(client.get('/api/weather/forecast/hourly?lat=1&lon=1&units=imperial').data)
+        assert imperial['list'][0]['temp'] == pytest.approx(metric['list'][0]['temp'] * 9 / 5 + 32)
+        assert client.get('/api/weather/forecast/weekly?lat=1&lon=1').status_code == 404
+        assert client.get('/api/weather/forecast/daily?lat=1').status_code == 400
+
+
+class TestJsonFastPath:
+    def test_fast_provider(self, app):
+        from datetime import datetime, timezone
+        from app.json_provider import FastJSONProvider
+
+        assert isinstance(app.json, FastJSONProvider)
+        when = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        assert json.loads(app.json.dumps({'at': when, 1: 'x'})) == {
+            'at': 'Fri, 02 Jan 2026 03:04:05 GMT', '1': 'x'}
+        assert app.json.loads(b'{"a": [1, 2]}') == {'a': [1, 2]}
+
+    def test_cache_hit_sends_stored_bytes(self, client, live_service, monkeypatch):
+        from app.models import WeatherCache
+        from app.services import weather_service as module
+
+        first = client.get('/api/weather/forecast?lat=40.7128&lon=-74.006')
+        row = WeatherCache.query.one()
+        assert row.forecast_body == first.data
+        assert row.forecast_data is None and row.weather_data == {}  # stored once, as bytes
+
+        live_service.memory_cache.clear()
+        monkeypatch.setattr(module, 'loads_bytes', lambda data: pytest.fail('decoded'))
+        hit = client.get('/api/weather/forecast?lat=40.7128&lon=-74.006')
+        assert hit.data == first.data
+        assert hit.mimetype == 'application/json'
+
+    def test_conversion_still_decodes(self, client, live_service):
+        client.get('/api/weather/current?lat=40.7128&lon=-74.006')
+        live_service.memory_cache.clear()
+        imperial = json.loads(client.get('/api/weather/current?lat=40.7128&lon=-74.006&units=imperial').data)
+        assert imperial['main']['temp'] == pytest.approx(22.5 * 9 / 5 + 32)
+
+
+class TestCompression:
+    def test_precompressed_forecast(self, client, live_service, monkeypatch):
+        import gzip
+        from app.models import WeatherCache
+        from app.utils import compression
+
+        plain = client.get('/api/weather/forecast?lat=40.7128&lon=-74.006')
+        assert 'Content-Encoding' not in plain.headers
+        assert plain.headers['Vary'] == 'Accept-Encoding'
+        row = WeatherCache.query.one()
+        assert gzip.decompress(row.forecast_gzip) == plain.data
+
+        # Hot reads send the stored bytes; nothing is compressed per request.
+        live_service.memory_cache.clear()
+        monkeypatch.setattr(compression.gzip, 'compress', lambda *a, **k: pytest.fail('compressed'))
+        response = client.get('/api/weather/forecast?lat=40.7128&lon=-74.006',
+                              headers={'Accept-Encoding': 'br, gzip;q=0.8'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.data == row.forecast_gzip
+        assert response.headers['ETag'].startswith('W/')
+
+        cached = client.get('/api/weather/forecast?lat=40.7128&lon=-74.006',
+                            headers={'Accept-Encoding': 'gzip',
+                                     'If-None-Match': response.headers['ETag']})
+        assert cached.status_code == 304
+
+    def test_dynamic_responses_negotiated(self, client, live_service):
+        import zlib
+
+        for i in range(10):
+            client.post('/api/locations/', json={'name': f'City {i}', 'latitude': i, 'longitude': i})
+        plain = client.get('/api/locations/')
+        deflated = client.get('/api/locations/', headers={'Accept-Encoding': 'deflate, gzip;q=0.5'})
+        assert deflated.headers['Content-Encoding'] == 'deflate'
+        assert zlib.decompress(deflated.data) == plain.data
+
+        refused = client.get('/api/weather/forecast?lat=1&lon=1&units=imperial',
+                             headers={'Accept-Encoding': 'gzip;q=0, identity'})
+        assert 'Content-Encoding' not in refused.headers
+
+        small = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in small.headers
+
+    def test_etag_weak_only_when_encoded(self, client):
+        small = client.get('/api/locations/', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in small.headers
+        etag = small.headers['ETag']
+        assert not etag.startswith('W/')
+
+        # A 304 repeats the validator in the form the client sent it.
+        cached = client.get('/api/locations/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.headers['ETag'] == etag
+        cached = client.get('/api/locations/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'W/{etag}'})
+        assert cached.status_code == 304
+        assert cached.headers['ETag'] == f'W/{etag}'
+
+        for i in range(10):
+            client.post('/api/locations/', json={'name': f'City {i}', 'latitude': i, 'longitude': i})
+        large = client.get('/api/locations/', headers={'Accept-Encoding': 'gzip'})
+        assert large.headers['Content-Encoding'] == 'gzip'
+        assert large.headers['ETag'].startswith('W/')
+
+
+class TestSearchHistoryWrites:
+    @pytest.fixture
+    def writer(self, app):
+        from app.services import SearchHistoryWriter
+
+        writer = SearchHistoryWriter(app, flush_interval_ms=20, batch_size=50, durability='commit')
+        app.extensions['search_history_writer'] = writer
+        writer.start()
+        yield writer
+        writer.stop(timeout=2)
+        del app.extensions['search_history_writer']
+
+    def test_bulk_endpoint(self, client):
+        entries = [{'query': f'city {i}', 'latitude': i, 'longitude': i} for i in range(25)]
+        response = client.post('/api/locations/search-history/bulk', json={'entries': entries})
+        assert response.status_code == 201
+        assert json.loads(response.data) == {'accepted': 25}
+        history = json.loads(client.get('/api/locations/search-history?limit=100').data)
+        assert len(history) == 25
+
+        assert client.post('/api/locations/search-history/bulk', json={'entries': []}).status_code == 400
+        bad = client.post('/api/locations/search-history/bulk', json={'entries': [{'latitude': 1}]})
+        assert bad.status_code == 400
+
+    def test_batched_writes_share_transactions(self, app, client, writer):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def post(i):
+            with app.test_client() as c:
+                return c.post('/api/locations/search-history', json={'query': f'q{i}'}).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(post, range(40)))
+        assert statuses == [202] * 40  # durability=commit: rows are already written
+        assert len(json.loads(client.get('/api/locations/search-history?limit=100').data)) == 40
+        stats = writer.stats()
+        assert stats['written'] == 40 and stats['pending'] == 0
+        assert stats['flushes'] < 40
+
+    @pytest.mark.parametrize('batched', [False, True])
+    def test_invalid_entries_rejected(self, request, client, batched):
+        if batched:
+            request.getfixturevalue('writer')
+        single = '/api/locations/search-history'
+        for bad in ({'query': 'x', 'searched_at': 'yesterday'}, {'query': 'x', 'latitude': 'abc'},
+                    {'query': 'x', 'longitude': 'inf'}, {'query': 'x', 'latitude': 91}, {'query': ''}):
+            assert client.post(single, json=bad).status_code == 400, bad
+            response = client.post(single + '/bulk', json={'entries': [{'query': 'ok'}, bad]})
+            assert response.status_code == 400 and 'entry 1' in json.loads(response.data)['error']
+        for body in ([{'query': 'x'}], 'entries', []):
+            response = client.post(single + '/bulk', json=body)
+            assert response.status_code == 400
+            assert response.get_json() == {'error': 'entries must be a non-empty list'}
+            assert client.post(single, json=body).status_code == 400
+        assert json.loads(client.get(single).data) == []
+
+        response = client.post(single, json={'query': 'dated', 'latitude': '51.5',
+                                             'searched_at': '2026-01-02T03:04:05Z'})
+        assert response.status_code == (202 if batched else 201)
+        entry = json.loads(response.data)
+        assert entry['latitude'] == 51.5 and entry['searched_at'].startswith('2026-01-02T03:04:05')
+
+    def test_flush_isolates_a_bad_row(self, app, writer):
+        from app.models import SearchHistory
+
+        good = writer.submit([{'query': 'good'}])
+        with writer._cond:  # bypasses submit()'s validation
+            bad = type(good)()
+            writer._pending.append(({'query': None, 'latitude': None, 'longitude': None,
+                                     'result_name': None, 'searched_at': None}, bad))
+        later = writer.submit([{'query': 'later'}])
+        writer.flush()
+        assert good.wait(1) and later.wait(1) and not bad.wait(1)
+        assert {h.query for h in db.session.query(SearchHistory)} == {'good', 'later'}
+        assert writer.stats()['failed'] == 1
+
+    def test_ack_mode_flushes_on_interval(self, app):
+        import time
+        from app.models import SearchHistory
+        from app.services import SearchHistoryWriter
+
+        writer = SearchHistoryWriter(app, flush_interval_ms=10, batch_size=1000)
+        writer.start()
+        try:
+            writer.submit([{'query': 'later'}])
+            deadline = time.time() + 2
+            while writer.stats()['written'] < 1 and time.time() < deadline:
+                time.sleep(0.01)
+            assert db.session.query(SearchHistory).count() == 1
+        finally:
+            writer.stop(timeout=2)
+
+
+class TestSearchHistoryRetention:
+    def add_history(self, query, days_ago, **fields):
+        from datetime import datetime, timedelta, timezone
+        from app.models import SearchHistory
+
+        searched_at = datetime.now(timezone.utc) - timedelta(days=days_ago)
+        db.session.add(SearchHistory(query=query, searched_at=searched_at, **fields))
+        db.session.commit()
+
+    def test_compaction_rolls_up_and_prunes(self, app, client):
+        from app.models import SearchHistory, SearchPopularity
+        from app.services import SearchHistoryCompactor
+
+        for days_ago in (40, 35, 1):
+            self.add_history('London', days_ago, latitude=51.5, longitude=-0.12, result_name='London, GB')
+        self.add_history('  london ', 0)
+        self.add_history('Paris', 50)
+        compactor = SearchHistoryCompactor(app, retention_days=30, batch_size=2)
+
+        stats = compactor.run_once()
+        assert stats['compacted'] == 5 and stats['pruned'] == 3
+        assert db.session.query(SearchHistory).count() == 2
+
+        popular = {p.query_key: p for p in SearchPopularity.query.all()}
+        assert popular['london'].search_count == 4
+        assert popular['london'].display_query == '  london '  # latest spelling
+        assert popular['london'].result_name == 'London, GB'
+        assert popular['paris'].search_count == 1
+
+        # The watermark stops rows from being counted twice
+        self.add_history('Paris', 0)
+        assert compactor.run_once()['compacted'] == 1
+        assert SearchPopularity.query.filter_by(query_key='paris').one().search_count == 2
+        assert SearchPopularity.query.filter_by(query_key='london').one().search_count == 4
+
+        top = json.loads(client.get('/api/locations/search-history/top?limit=1').data)
+        assert [(t['query'], t['count']) for t in top] == [('  london ', 4)]
+
+    def test_rows_committed_behind_the_watermark(self, app):
+        from datetime import datetime, timezone
+        from app.models import SearchHistory, SearchPopularity
+        from app.services import SearchHistoryCompactor
+
+        def add(*ids):
+            db.session.add_all(SearchHistory(id=i, query='Oslo', searched_at=datetime.now(timezone.utc))
+                               for i in ids)
+            db.session.commit()
+
+        def count():
+            return SearchPopularity.query.filter_by(query_key='oslo').one().search_count
+
+        compactor = SearchHistoryCompactor(app, batch_size=2, overlap_ids=5)
+        add(1, 4)  # 2 and 3 are still in flight
+        assert compactor.run_once()['compacted'] == 2
+        add(3, 5)
+        assert compactor.run_once()['compacted'] == 2
+        assert compactor.run_once()['compacted'] == 0
+        assert count() == 4
+
+        add(12)  # the watermark moves more than overlap_ids past 2
+        assert compactor.run_once()['compacted'] == 1
+        add(2)
+        assert compactor.run_once()['compacted'] == 0
+        assert count() == 5
+
+    def test_history_queries_are_indexed(self, app):
+        inspector = db.inspect(db.engine)
+        indexed = {tuple(ix['column_names']) for ix in inspector.get_indexes('search_history')}
+        assert ('searched_at',) in indexed
+        ranked = {tuple(ix['column_names']) for ix in inspector.get_indexes('search_popularity')}
+        assert ('search_count', 'last_seen') in ranked
+
+
+class TestDatabaseProfile:
+    @pytest.fixture
+    def production_app(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('DATABASE_PROFILE', 'production')
+        monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'primary.db'}")
+        monkeypatch.setenv('DATABASE_REPLICA_URL', f"sqlite:///{tmp_path / 'replica.db'}")
+        app = create_app()
+        yield app
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        db.metadatas.pop('replica')  # registered on the shared extension by init_app
+
+    def test_engine_options(self, monkeypatch):
+        from app.db_profile import engine_options
+
+        assert engine_options('sqlite:///weather.db') == {}
+        monkeypatch.setenv('DATABASE_PROFILE', 'production')
+        monkeypatch.setenv('DB_POOL_SIZE', '4')
+        options = engine_options('sqlite:///weather.db')
+        assert options['pool_size'] == 4 and options['max_overflow'] == 20
+        assert options['connect_args']['timeout'] == 5
+        assert 'pool_size' not in engine_options('sqlite://')
+
+    def test_sqlite_wal_pragmas(self, production_app):
+        with production_app.app_context():
+            with db.engine.connect() as conn:
+                assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+                assert conn.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+                assert conn.exec_driver_sql('PRAGMA busy_timeout').scalar() == 5000
+
+    def test_reads_go_to_replica_until_session_writes(self, production_app):
+        from app.models import SavedLocation
+
+        with production_app.app_context():
+            read = db.select(SavedLocation)
+            assert db.session.get_bind(clause=read) is db.engines['replica']
+            db.session.add(SavedLocation(name='Oslo', latitude=59.91, longitude=10.75))
+            db.session.commit()
+            assert db.session.get_bind(clause=read) is db.engine
+            assert db.session.get_bind(clause=db.delete(SavedLocation)) is db.engine
+
+    def test_write_paths_read_the_primary(self, production_app):
+        from app.models import SearchHistory, SearchPopularity
+        from app.services import CacheSweeper, SearchHistoryCompactor
+        from app.routes.weather import weather_service
+
+        with production_app.app_context():
+            read = db.select(SearchHistory)
+            with db.session().using_primary():
+                assert db.session.get_bind(clause=read) is db.engine
+            assert db.session.get_bind(clause=read) is db.engines['replica']
+            db.session.add_all(SearchHistory(query=q) for q in ('Oslo', 'oslo', 'Rome'))
+            db.session.commit()
+
+        # The replica file has no tables, so any read routed there would fail.
+        assert SearchHistoryCompactor(production_app).run_once()['compacted'] == 3
+        assert CacheSweeper(production_app, weather_service).run_once()['rows'] == 0
+        with production_app.app_context(), db.session().using_primary():
+            counts = {p.query_key: p.search_count for p in SearchPopularity.query}
+            assert counts == {'oslo': 2, 'rome': 1}
+
+    def test_health_reports_pools(self, production_app):
+        data = json.loads(production_app.test_client().get('/api/health').data)
+        assert data['database']['profile'] == 'production'
+        assert data['database']['pools']['primary']['size'] == 10
+        assert set(data['database']['pools']) == {'primary', 'replica'}
+
+
+class TestCacheBackends:
+    @pytest.fixture
+    def resp_server(self):
+        from tests.resp_server import RespServer
+
+        server = RespServer().start()
+        yield server
+        server.stop()
+
+    def test_payload_round_trip(self):
+        from datetime import datetime, timedelta, timezone
+        from app.services.weather_service import CachedPayload
+
+        now = datetime.now(timezone.utc)
+        entry = CachedPayload({'name': 'Oslo'}, '7-123', now, now + timedelta(minutes=30), gzip=b'gz')
+        copy = CachedPayload.from_bytes(entry.to_bytes())
+        assert copy.data == {'name': 'Oslo'} and copy.body == entry.body
+        assert copy.version == '7-123' and copy.encoded('gzip') == b'gz'
+        assert copy.expires_at == pytest.approx(entry.expires_at, abs=timedelta(milliseconds=1))
+
+    def test_shared_memory_is_shared_between_processes(self, tmp_path):
+        import subprocess
+        import sys
+        import time
+        from app.utils.cache_backends import SharedMemoryCacheBackend
+
+        path = str(tmp_path / 'shm')
+        cache = SharedMemoryCacheBackend(path, slots=16, slot_bytes=1024)
+        script = ('from app.utils.cache_backends import SharedMemoryCacheBackend as B; '
+                  f'c = B({path!r}, slots=16, slot_bytes=1024); '
+                  "c.set('weather:a', b'from child', 60); print(c.get('weather:b').decode())")
+        cache.set('weather:b', b'from parent', 60)
+        child = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        assert child.stdout.strip() == 'from parent'
+        assert cache.get('weather:a') == b'from child'
+
+        cache.set('short', b'x', 0.05)
+        cache.set('huge', b'x' * 2048, 60)
+        time.sleep(0.1)
+        assert cache.get('short') is None and cache.get('huge') is None
+        cache.delete('weather:a')
+        assert cache.get('weather:a') is None
+        assert cache.stats()['too_large'] == 1
+        with pytest.raises(ValueError):
+            SharedMemoryCacheBackend(path, slots=32, slot_bytes=1024)
+
+    def test_unusable_shared_memory_falls_back_to_sql(self, tmp_path, monkeypatch, caplog):
+        from app.utils.cache_backends import (SQLCacheBackend, SharedMemoryCacheBackend,
+                                              create_cache_backend)
+
+        path = str(tmp_path / 'shm')
+        SharedMemoryCacheBackend(path, slots=16, slot_bytes=1024)
+        monkeypatch.setenv('WEATHER_SHM_PATH', path)
+        monkeypatch.setenv('WEATHER_SHM_SLOTS', '32')
+        assert isinstance(create_cache_backend('shm'), SQLCacheBackend)
+        assert 'falling back to sql' in caplog.text
+
+    def test_redis_backend_against_stand_in(self, resp_server):
+        import time
+        from app.utils.cache_backends import RedisCacheBackend
+
+        cache = RedisCacheBackend(resp_server.url)
+        cache.set('k', b'\x00binary\r\n', 60)
+        cache.set('brief', b'v', 0.05)
+        assert cache.get('k') == b'\x00binary\r\n'
+        time.sleep(0.1)
+        assert cache.get('brief') is None
+        cache.delete('k')
+        assert cache.get('k') is None
+        assert resp_server.dispatch([b'DBSIZE']) == 0
+
+    def test_failed_handshake_closes_the_socket(self, monkeypatch):
+        import socket
+        from app.utils.resp import RespClient, RespError
+        from tests.resp_server import RespServer
+
+        server = RespServer(password='secret').start()
+        opened = []
+        create_connection = socket.create_connection
+
+        def tracked(*args, **kwargs):
+            opened.append(create_connection(*args, **kwargs))
+            return opened[-1]
+
+        monkeypatch.setattr(socket, 'create_connection', tracked)
+        try:
+            host, port = server.server_address[:2]
+            with pytest.raises(RespError):
+                RespClient(f'redis://:wrong@{host}:{port}/0').execute('PING')
+            assert opened and opened[0].fileno() == -1
+            assert RespClient(f'redis://:secret@{host}:{port}/0').execute('PING') == 'PONG'
+        finally:
+            server.stop()
+
+    def test_redis_outage_is_a_miss(self, resp_server):
+        from app.utils.cache_backends import RedisCacheBackend
+
+        url = resp_server.url
+        resp_server.stop()
+        cache = RedisCacheBackend(url, retry_seconds=60)
+        assert cache.get('k') is None
+        cache.set('k', b'v', 60)
+        assert cache.stats()['errors'] == 1  # then skipped until the retry window passes
+
+    @pytest.mark.parametrize('backend', ['shm', 'redis'])
+    def test_workers_share_hot_entries(self, app, upstream, monkeypatch, tmp_path, resp_server, backend):
+        from app.models import WeatherCache
+        from app.services import WeatherService
+
+        monkeypatch.setenv('WEATHER_CACHE_BACKEND', backend)
+        monkeypatch.setenv('WEATHER_SHM_PATH', str(tmp_path / 'shm'))
+        monkeypatch.setenv('WEATHER_REDIS_URL', resp_server.url)
+        workers = [WeatherService(), WeatherService()]
+        for worker in workers:
+            worker.api_key = 'test-key'
+
+        first = workers[0].get_weather_entry('weather', 59.91, 10.75)
+        assert len(upstream) == 1
+        WeatherCache.query.delete()  # the second worker must not need the database
+        db.session.commit()
+        second = workers[1].get_weather_entry('weather', 59.91, 10.75)
+        assert len(upstream) == 1
+        assert second.version == first.version and second.body == first.body
+        assert workers[1].cache_stats()['backend']['hits'] == 1
+
+        workers[0].evict_cell(WeatherCache.cell_for(59.91, 10.75))
+        assert workers[0].cache_backend.get('weather:' + WeatherCache.cell_for(59.91, 10.75)) is None
+
+
+class TestMetrics:
+    @staticmethod
+    def sample(text, name, **labels):
+        """Value of the series `name` whose labels include `labels`, or None."""
+        for line in text.splitlines():
+            if line.startswith(name + '{') or line.startswith(name + ' '):
+                series, value = line.rsplit(' ', 1)
+                if all(f'{key}="{val}"' in series for key, val in labels.items()):
+                    return float(value)
+        return None
+
+    def test_exposes_route_histograms_and_counters(self, client):
+        client.get('/api/weather/current?lat=40.7128&lon=-74.006')
+        client.get('/api/locations/')
+        response = client.get('/api/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain; version=0.0.4')
+        text = response.get_data(as_text=True)
+
+        assert '# TYPE weather_http_request_duration_seconds histogram' in text
+        assert self.sample(text, 'weather_http_request_duration_seconds_count',
+                           endpoint='weather.get_current_weather', method='GET', status='200') >= 1
+        assert self.sample(text, 'weather_http_request_duration_seconds_bucket',
+                           endpoint='locations.get_locations', le='+Inf') >= 1
+        assert self.sample(text, 'weather_db_query_duration_seconds_count', operation='select') >= 1
+        assert self.sample(text, 'weather_memory_cache_requests_total', result='miss') is not None
+        assert self.sample(text, 'weather_service_events_total', event='stale_served') is not None
+        assert '# TYPE weather_db_pool_checkedout gauge' in text
+
+    def test_asgi_routes_are_observed(self, client, asgi_get):
+        def count(text):
+            return self.sample(text, 'weather_http_request_duration_seconds_count',
+                               endpoint='weather.get_forecast', method='GET', status='400') or 0
+
+        before = count(client.get('/api/metrics').get_data(as_text=True))
+        responses = asgi_get('/api/weather/forecast?lat=1', '/api/weather/current?lat=40.7128&lon=-74.006',
+                             '/api/metrics')
+        text = responses[-1].text
+        assert count(text) - before == 1
+        assert self.sample(text, 'weather_http_request_duration_seconds_count',
+                           endpoint='weather.get_current_weather', method='GET', status='200') >= 1
+
+    def test_asgi_coalescing_is_exported(self, asgi_get, stub_server, monkeypatch):
+        from app.routes.weather import weather_service
+
+        monkeypatch.setattr(weather_service, 'api_key', 'test-key')
+        monkeypatch.setattr(weather_service, 'base_url', stub_server['url'])
+        weather_service.memory_cache.clear()
+        try:
+            *_, metrics = asgi_get('/api/weather/current?lat=-12.0464&lon=-77.0428', '/api/metrics')
+        finally:
+            weather_service.memory_cache.clear()
+        text = metrics.text
+        assert self.sample(text, 'weather_upstream_fetches_total', mode='async', result='fetched') == 1
+        assert self.sample(text, 'weather_upstream_fetches_total', mode='sync', result='fetched') is not None
+        assert self.sample(text, 'weather_upstream_in_flight', mode='async') == 0
+
+    def test_upstream_latency_by_endpoint(self, client, monkeypatch):
+        import requests
+        from app.routes.weather import weather_service
+
+        monkeypatch.setattr(weather_service, 'api_key', 'test-key')
+
+        def fake_session_get(url, params=None, timeout=None):
+            response = requests.Response()
+            response.status_code = 503
+            return response
+
+        monkeypatch.setattr(weather_service.http.session, 'get', fake_session_get)
+        monkeypatch.setattr(weather_service.http, 'max_retries', 0)
+        client.get('/api/weather/forecast?lat=-33.86&lon=151.2')
+        text = client.get('/api/metrics').get_data(as_text=True)
+        assert self.sample(text, 'weather_upstream_request_duration_seconds_count',
+                           endpoint='forecast', outcome='error') >= 1
+
+    def test_disabled(self, client, monkeypatch):
+        monkeypatch.setenv('METRICS_ENABLED', 'false')
+        assert client.get('/api/metrics').status_code == 404
+
+
+class TestTracing:
+    @pytest.fixture(autouse=True)
+    def reset_mode(self):
+        from app.utils.tracing import trace_settings
+
+        yield
+        trace_settings.set_mode('off')
+
+    @staticmethod
+    def timings(response):
+        return {part.split(';')[0].strip() for part in response.headers['Server-Timing'].split(',')}
+
+    def test_off_by_default(self, client):
+        response = client.get('/api/weather/current?lat=40.7128&lon=-74.006', headers={'X-Debug-Timing': '1'})
+        assert 'Server-Timing' not in response.headers
+
+    def test_header_mode(self, client):
+        from app.utils.tracing import trace_settings
+
+        trace_settings.set_mode('header')
+        url = '/api/weather/current?lat=40.7128&lon=-74.006&units=imperial'
+        assert 'Server-Timing' not in client.get(url).headers
+        names = self.timings(client.get(url, headers={'X-Debug-Timing': '1'}))
+        assert {'cache.memory', 'sql', 'convert', 'render', 'total'} <= names
+
+    def test_all_mode_times_compression(self, client):
+        from app.utils.tracing import trace_settings
+
+        trace_settings.set_mode('all')
+        headers = {'Accept-Encoding': 'gzip'}
+        # Canonical units are served from the stored gzip copy; converted ones are compressed per request.
+        assert 'compress' not in self.timings(client.get('/api/weather/forecast?lat=48.85&lon=2.35', headers=headers))
+        response = client.get('/api/weather/forecast?lat=48.85&lon=2.35&units=imperial', headers=headers)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert {'convert', 'compress'} <= self.timings(response)
+        assert 'total' in self.timings(client.get('/api/locations/'))
+
+    def test_spans_are_noops_outside_a_trace(self):
+        from app.utils.tracing import current_trace, end_trace, record, span, start_trace
+
+        with span('x'):
+            record('y', 1.0)
+        assert current_trace() is None
+        token = start_trace()
+        with span('x'):
+            pass
+        record('x', 0.5)
+        header = current_trace().server_timing()
+        end_trace(token)
+        assert header.startswith('x;dur=') and 'desc="x2"' in header and current_trace() is None
+
+    def test_debug_routes_need_token(self, client, monkeypatch):
+        assert client.get('/api/debug/tracing').status_code == 404
+        monkeypatch.setenv('DEBUG_TOKEN', 'secret')
+        assert client.get('/api/debug/tracing').status_code == 403
+        assert client.get('/api/debug/tracing', headers={'X-Debug-Token': 'secret'}).get_json() == {'mode': 'off'}
+
+    def test_toggle_tracing_at_runtime(self, client, monkeypatch):
+        monkeypatch.setenv('DEBUG_TOKEN', 'secret')
+        headers = {'X-Debug-Token': 'secret'}
+        assert client.put('/api/debug/tracing', json={'mode': 'loud'}, headers=headers).status_code == 400
+        assert client.put('/api/debug/tracing', json=['all'], headers=headers).status_code == 400
+        assert client.put('/api/debug/tracing', json={'mode': 'all'}, headers=headers).get_json() == {'mode': 'all'}
+        assert 'Server-Timing' in client.get('/api/locations/').headers
+
+    def test_profiler_endpoints(self, client, monkeypatch):
+        from app.utils.profiler import profiler
+
+        monkeypatch.setenv('DEBUG_TOKEN', 'secret')
+        headers = {'X-Debug-Token': 'secret'}
+        try:
+            state = client.put('/api/debug/profiler', json={'enabled': True, 'interval_ms': 1},
+                               headers=headers).get_json()
+            assert state['running'] and state['interval_ms'] == 1
+            profiler.sample()
+            client.get('/api/weather/current?lat=40.7128&lon=-74.006')
+        finally:
+            state = client.put('/api/debug/profiler', json={'enabled': False}, headers=headers).get_json()
+        assert not state['running'] and state['samples'] >= 1
+        stacks = client.get('/api/debug/profiler/stacks?limit=5', headers=headers).get_data(as_text=True)
+        lines = stacks.splitlines()
+        assert 0 < len(lines) <= 5 and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+        assert client.put('/api/debug/profiler', json={'enabled': 'yes'}, headers=headers).status_code == 400
+        assert client.put('/api/debug/profiler', json=[True], headers=headers).status_code == 400
+
+    def test_asgi_server_timing(self, asgi_get):
+        from app.utils.tracing import trace_settings
+
+        trace_settings.set_mode('header')
+        plain, traced = asgi_get('/api/weather/current?lat=40.7128&lon=-74.006',
+                                 '/api/weather/current?lat=40.7128&lon=-74.006')
+        assert 'server-timing' not in plain.headers
+        traced, = asgi_get('/api/weather/current?lat=40.7128&lon=-74.006', headers={'X-Debug-Timing': '1'})
+        assert 'cache.memory' in traced.headers['server-timing']
+        assert 'total;dur=' in traced.headers['server-timing']
+
+
+class TestLoadTest:
+    @pytest.fixture
+    def stub(self):
+        from benchmarks.owm_stub import OWMStub
+
+        stub = OWMStub(api_key='stub-key', seed=3).start()
+        yield stub
+        stub.stop()
+
+    def test_stub_counts_and_injects_errors(self, stub):
+        import requests
+
+        response = requests.get(stub.base_url + '/forecast', params={'lat': 1, 'lon': 2, 'appid': 'stub-key'})
+        assert response.status_code == 200 and len(response.json()['list']) == 40
+        assert requests.get(stub.geocoding_url + '/direct', params={'q': 'x'}).status_code == 401
+        stub.error_rate = 1.0
+        assert requests.get(stub.base_url + '/weather',
+                            params={'lat': 1, 'lon': 2, 'appid': 'stub-key'}).status_code == 503
+        assert stub.snapshot() == {'calls': {'forecast': 1, 'weather': 1}, 'errors': {'weather': 1}}
+
+    def test_scenarios_against_the_app(self, app, stub, monkeypatch):
+        import threading
+        from werkzeug.serving import make_server
+        from app.routes.weather import weather_service
+        from benchmarks.load_test import percentile, run_scenario
+
+        monkeypatch.setattr(weather_service, 'api_key', 'stub-key')
+        monkeypatch.setattr(weather_service, 'base_url', stub.base_url)
+        monkeypatch.setattr(weather_service, 'geocoding_url', stub.geocoding_url)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        try:
+            warm = run_scenario('warm', app, weather_service, stub, base_url, count=60, concurrency=4, hot_set=5)
+            storm = run_scenario('expiry-storm', app, weather_service, stub, base_url,
+                                 count=60, concurrency=8, hot_set=5)
+        finally:
+            server.shutdown()
+
+        assert warm['errors'] == 0 and warm['upstream']['total'] == 0
+        assert warm['cache']['weather_hit_ratio'] == 1.0
+        assert warm['latency_ms']['p50'] <= warm['latency_ms']['p99']
+        # At most one fetch per expired cell and kind, however many clients asked
+        assert 0 < storm['upstream']['weather'] + storm['upstream']['forecast'] <= 10
+        assert storm['upstream']['geocode'] == 0
+        assert percentile([1, 2, 3, 4], 50) == 2 and percentile([1, 2, 3, 4], 99) == 4
@@ -3,10 +3,15 @@
  */
 import axios, { AxiosInstance } from 'axios';
 import {
+  BatchLocation,
+  BatchSection,
+  BatchWeatherResult,
   CurrentWeather,
   ForecastResponse,
+  ForecastRollup,
   GeoLocation,
   SavedLocation,
+  SavedLocationWeather,
 } from '../types/weather';
 
 const API_BASE_URL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:5000/api';
@@ -46,6 +51,26 @@ class WeatherApiService {
     return data;
   }
 
+  async getForecastRollup(
+    view: 'daily' | 'hourly',
+    lat: number,
+    lon: number,
+    units: string = 'metric'
+  ): Promise<ForecastRollup> {
+    const { data } = await this.client.get(`/weather/forecast/${view}`, {
+      params: { lat, lon, units },
+    });
+    return data;
+  }
+
+  async getWeatherBatch(
+    locations: BatchLocation[],
+    include: BatchSection[] = ['current']
+  ): Promise<BatchWeatherResult[]> {
+    const { data } = await this.client.post('/weather/batch', { locations, include });
+    return data.results;
+  }
+
   async geocode(query: string, limit: number = 5): Promise<GeoLocation[]> {
     const { data } = await this.client.get('/weather/geocode', {
       params: { q: query, limit },
@@ -67,6 +92,16 @@ class WeatherApiService {
     return data;
   }
 
+  async getSavedLocationsWeather(
+    units: string = 'metric',
+    include: BatchSection[] = ['current']
+  ): Promise<SavedLocationWeather[]> {
+    const { data } = await this.client.get('/locations/weather', {
+      params: { units, include: include.join(',') },
+    });
+    return data;
+  }
+
   async addLocation(location: Omit<SavedLocation, 'id'>): Promise<SavedLocation> {
     const { data } = await this.client.post('/locations/', location);
     return data;
@@ -70,6 +70,40 @@ export interface ForecastResponse {
   };
 }
 
+export interface ForecastRollupItem {
+  date?: string;
+  dt: number;
+  temp?: number;
+  feels_like?: number;
+  temp_min?: number;
+  temp_max?: number;
+  humidity?: number;
+  pop?: number;
+  wind_speed?: number;
+  weather: WeatherCondition;
+}
+
+export interface ForecastRollup {
+  list: ForecastRollupItem[];
+  city?: ForecastResponse['city'];
+}
+
+export type BatchSection = 'current' | 'forecast';
+
+export interface BatchLocation {
+  lat: number;
+  lon: number;
+  units?: string;
+}
+
+export interface BatchWeatherResult {
+  lat: number;
+  lon: number;
+  units: string;
+  current?: CurrentWeather;
+  forecast?: ForecastResponse;
+}
+
 export interface GeoLocation {
   name: string;
   lat: number;
@@ -89,6 +123,11 @@ export interface SavedLocation {
   created_at?: string;
 }
 
+export interface SavedLocationWeather extends SavedLocation {
+  current?: CurrentWeather;
+  forecast?: ForecastResponse;
+}
+
 export type UnitSystem = 'metric' | 'imperial';
 
 export interface WeatherState {